@@ -0,0 +1,381 @@
+import os
+import time
+import shutil
+import tempfile
+import traceback
+import numpy as np
+from astropy.table import Table, Column
+from concurrent.futures import ProcessPoolExecutor
+from aos import dataDir
+from aos.catalog import GaiaCatalog
+from aos.control import GainController
+from aos.estimator import WavefrontEstimator
+from aos.focal_plane import WavefrontSensors
+from aos.metric import SumOfSquares
+from aos.mirror import M1M3Residual, M2Residual
+from aos.projection import Pointing
+from aos.simulator import WavefrontSimulator
+from aos.solver import SensitivityGrid, SensitivitySolver, MultiFieldSensitivitySolver
+from aos.state import BendingState
+from aos.survey import Survey
+from aos.telemetry import TelemetryLog
+from aos.telescope import Telescope, BendingTelescope
+
+
+class SurveyRunner:
+    """
+    Runs the closed loop (simulate -> estimate -> solve -> control) over many observations.
+
+    Notes
+    -----
+    For every observation, the sources its GaiaCatalog labels intra-focal are projected to field
+    angles with the focal plane rotation the catalog was queried with (GaiaCatalog.rotation), so
+    that they land on the sensors they were selected for; the shipped catalogs predate rotated
+    sensors, so their observations are simulated with the rotator at 0. Each source is assigned
+    to the nearest intra-focal wavefront sensor, and the loop is run from a random initial state
+    with one wavefront of the brightest star per sensor and iteration. Sensors without a star
+    are treated as missing by the solver. Every observation gets a fresh telescope, with its own
+    mirror residuals, and the metric is evaluated on the state applied to it.
+
+    Observations are spread over a process pool. Each finished observation is checkpointed to
+    checkpoints/{observationId}.npy, written atomically, and observations with a checkpoint are
+    skipped, so an interrupted run can simply be restarted. Every iteration is also recorded in
+    telemetry/{observationId}.tlm (see aos.telemetry.TelemetryLog). summarize collects the
+    checkpoints into a directory of per-column .npy files.
+
+    Parameters
+    ----------
+    outputDir: string
+        Where to write checkpoints, telemetry and results; defaults to data/runs.
+    iterations: int
+        The number of closed loop iterations per observation; defaults to 5.
+    gain: float
+        The gain of the GainController; defaults to 0.3.
+    perturbation: float | numpy.ndarray
+        The standard deviation of each degree of freedom of the initial state; defaults to 1e-7.
+    nZern: int
+        The number of zernike coefficients to fit; defaults to 22.
+    magnitude: string
+        The catalog column used to pick the brightest star; defaults to 'lsst_r_mag'.
+    grid: aos.solver.SensitivityGrid
+        The tabulated sensitivity matrices; defaults to data/sensitivity_grid_20dof.npy (see
+        data/build_sensitivity_grid.py).
+    processes: int
+        The number of worker processes; defaults to the number of cpus. 1 runs in process.
+    seed: int
+        Seeds the initial state of each observation together with its id; defaults to 0.
+
+    Attributes
+    ----------
+    outputDir: string
+        Where to write checkpoints, telemetry and results.
+    iterations: int
+        The number of closed loop iterations per observation.
+    gain: float
+        The gain of the GainController.
+    perturbation: float | numpy.ndarray
+        The standard deviation of each degree of freedom of the initial state.
+    nZern: int
+        The number of zernike coefficients to fit.
+    magnitude: string
+        The catalog column used to pick the brightest star.
+    grid: aos.solver.SensitivityGrid
+        The tabulated sensitivity matrices.
+    processes: int | None
+        The number of worker processes.
+    seed: int
+        Seeds the initial state of each observation.
+    dtype: numpy.dtype
+        The result record dtype.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no grid is given and data/sensitivity_grid_20dof.npy does not exist.
+    """
+    def __init__(self, outputDir=os.path.join(dataDir, 'runs'), iterations=5, gain=0.3, perturbation=1e-7,
+                 nZern=22, magnitude='lsst_r_mag', grid=None, processes=None, seed=0):
+        self.outputDir = outputDir
+        self.iterations = iterations
+        self.gain = gain
+        self.perturbation = perturbation
+        self.nZern = nZern
+        self.magnitude = magnitude
+        if grid is None:
+            if not os.path.exists(SensitivitySolver.gridPath):
+                raise FileNotFoundError('the corner wavefront sensors require the sensitivity grid {}, which does not '
+                                        'exist; build it with data/build_sensitivity_grid.py.'
+                                        .format(SensitivitySolver.gridPath))
+            grid = SensitivityGrid.load(SensitivitySolver.gridPath)
+        self.grid = grid
+        self.processes = processes
+        self.seed = seed
+        self.dtype = SurveyRunner.recordDtype(iterations)
+
+    @staticmethod
+    def recordDtype(iterations=5, length=BendingState.LENGTH, nSensor=4):
+        """
+        Parameters
+        ----------
+        iterations: int
+            The number of closed loop iterations per observation; defaults to 5.
+        length: int
+            The number of degrees of freedom per state; defaults to BendingState.LENGTH.
+        nSensor: int
+            The number of wavefront sensors; defaults to 4.
+
+        Returns
+        -------
+        numpy.dtype
+            The per-observation result record dtype.
+        """
+        return np.dtype([
+            ('observationId', 'i8'),
+            ('ra', 'f8'),
+            ('dec', 'f8'),
+            ('rotation', 'f8'),
+            ('band', 'U1'),
+            ('fields', 'f8', (nSensor, 2)),
+            ('metric', 'f8', (iterations + 1,)),
+            ('x0', 'f8', (length,)),
+            ('x', 'f8', (length,)),
+            ('xest', 'f8', (length,)),
+            ('simulate', 'f8'),
+            ('estimate', 'f8'),
+            ('solve', 'f8'),
+            ('control', 'f8'),
+        ])
+
+    def checkpoint(self, observationId):
+        """
+        Parameters
+        ----------
+        observationId: int
+            The observation id.
+
+        Returns
+        -------
+        string
+            The checkpoint path of the observation.
+        """
+        return os.path.join(self.outputDir, 'checkpoints', f'{observationId}.npy')
+
+    def _fields(self, observationId, ra, dec):
+        catalog = GaiaCatalog(observationId)
+        fieldx, fieldy = catalog.fieldAngles(Pointing(ra, dec, catalog.rotation))
+        magnitude = np.ma.filled(np.ma.asarray(catalog[self.magnitude], dtype=float), np.inf)
+        intra = (np.asarray(catalog['focal']) == 'intra') & np.isfinite(magnitude)
+
+        names, corners, _ = WavefrontSensors.geometry()
+        centers = np.array([np.mean(corners[names.index(name)], axis=0) for name in WavefrontSensors.intraNames])
+        distance = np.hypot(fieldx[:, None] - centers[:, 0], fieldy[:, None] - centers[:, 1])
+        nearest = np.argmin(distance, axis=1) if len(distance) else np.zeros(0, dtype=int)
+
+        fields = np.full((len(centers), 2), np.nan)
+        for i in range(len(centers)):
+            sources = np.nonzero(intra & (nearest == i))[0]
+            if len(sources):
+                brightest = sources[np.argmin(magnitude[sources])]
+                fields[i] = fieldx[brightest], fieldy[brightest]
+        return fields
+
+    def observe(self, observationId, ra, dec, rotation, band):
+        """
+        Runs the closed loop for one observation and checkpoints the result.
+
+        Parameters
+        ----------
+        observationId: int
+            The observation id.
+        ra: float
+            Right ascension of the pointing in degrees.
+        dec: float
+            Declination of the pointing in degrees.
+        rotation: float
+            Rotation of the focal plane in degrees, recorded with the result; the stars are placed
+            with the rotation of the catalog.
+        band: str
+            The LSST filter.
+
+        Returns
+        -------
+        numpy.ndarray
+            The result record.
+
+        Raises
+        ------
+        ValueError
+            If no wavefront sensor has a star.
+        """
+        fields = self._fields(observationId, ra, dec)
+        available = ~np.any(np.isnan(fields), axis=1)
+        if not np.any(available):
+            raise ValueError('no wavefront sensor of observation {} has a star.'.format(observationId))
+        # missing sensors keep a nominal field position; their wavefronts are NaN
+        solverFields = np.where(available[:, None], fields, MultiFieldSensitivitySolver.cornerFields())
+
+        # mirror residuals accumulate, so they must not be shared between observations
+        nModes = (BendingState.LENGTH - 10) // 2
+        telescope = BendingTelescope(Telescope.nominal(band=band).optic, M1M3Residual(nModes=nModes),
+                                     M2Residual(nModes=nModes))
+        simulator = WavefrontSimulator()
+        estimator = WavefrontEstimator()
+        solver = MultiFieldSensitivitySolver(fields=solverFields, grid=self.grid)
+        metric = SumOfSquares()
+        controller = GainController(metric, gain=self.gain)
+
+        rng = np.random.default_rng([self.seed, int(observationId)])
+        telescope.update(BendingState(rng.normal(0, 1, BendingState.LENGTH) * self.perturbation))
+
+        record = np.zeros((), dtype=self.dtype)
+        record['observationId'] = observationId
+        record['ra'], record['dec'], record['rotation'], record['band'] = ra, dec, rotation, band
+        record['fields'] = fields
+        record['x0'] = telescope.state.array
+        record['metric'][0] = metric.evaluate(telescope.state.array)
+
+        path = os.path.join(self.outputDir, 'telemetry', f'{observationId}.tlm')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            # a previous attempt did not finish
+            os.remove(path)
+        with TelemetryLog(path, nZern=self.nZern) as log:
+            for iteration in range(self.iterations):
+                timings = dict()
+                start = time.perf_counter()
+                wavefronts = [simulator.simulateWavefront(telescope.optic, *field) if ok else None
+                              for field, ok in zip(fields, available)]
+                timings['simulate'] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                y = np.full((len(fields), self.nZern + 1), np.nan)
+                for i, wavefront in enumerate(wavefronts):
+                    if wavefront is not None:
+                        y[i] = estimator.estimate(wavefront, nZern=self.nZern)
+                timings['estimate'] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                xest = solver.solve(y)
+                timings['solve'] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                _, xdelta = controller.nextState(xest)
+                telescope.update(xdelta)
+                timings['control'] = time.perf_counter() - start
+
+                record['metric'][iteration + 1] = metric.evaluate(telescope.state.array)
+                record['xest'] = xest.array
+                for name, value in timings.items():
+                    record[name] += value
+                for sensor in np.nonzero(available)[0]:
+                    log.append(iteration, sensor, telescope.state, xest, xdelta, y[sensor],
+                               record['metric'][iteration + 1], **timings)
+        record['x'] = telescope.state.array
+
+        path = self.checkpoint(observationId)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp.npy'
+        np.save(tmp, record)
+        os.replace(tmp, path)
+        return record
+
+    def _observe(self, observation):
+        try:
+            self.observe(*observation)
+            return 'done'
+        except Exception:
+            path = self.checkpoint(observation[0]).replace('.npy', '.err')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as w:
+                w.write(traceback.format_exc())
+            return 'failed'
+
+    def run(self, observations=None):
+        """
+        Runs the closed loop for many observations.
+
+        Parameters
+        ----------
+        observations: astropy.table.Table
+            Rows with observationId, fieldRA, fieldDec, filter and rotSkyPos, or rotTelPos (see
+            Survey.rotationColumn); defaults to Survey().table.
+
+        Returns
+        -------
+        dict[int] -> string
+            The outcome ('skipped', 'done' or 'failed') of each observation. The traceback of
+            a failed observation is written next to its checkpoint as {observationId}.err.
+        """
+        if observations is None:
+            observations = Survey().table
+        rotation = Survey.rotationColumn(observations)
+        observations = [(int(row['observationId']), float(row['fieldRA']), float(row['fieldDec']),
+                         float(row[rotation]), str(row['filter'])) for row in observations]
+        out = {obs[0]: 'skipped' for obs in observations if os.path.exists(self.checkpoint(obs[0]))}
+        jobs = [obs for obs in observations if obs[0] not in out]
+
+        if self.processes == 1:
+            results = [self._observe(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                results = list(pool.map(self._observe, jobs)) if jobs else []
+        out.update(zip([obs[0] for obs in jobs], results))
+        return out
+
+    def summarize(self):
+        """
+        Collects the checkpoints into a directory of per-column .npy files.
+
+        Notes
+        -----
+        The directory, outputDir/results, is written under a temporary name and renamed into
+        place, so readers never see a partial summary. A previous summary is first renamed aside
+        and only deleted once the new one is in place; a reader that looks in between finds no
+        summary.
+
+        Returns
+        -------
+        string
+            The results directory.
+        """
+        directory = os.path.join(self.outputDir, 'checkpoints')
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.npy') and '.tmp' not in name) \
+            if os.path.exists(directory) else []
+        records = np.array([np.load(os.path.join(directory, name)) for name in names], dtype=self.dtype)
+        records = records[np.argsort(records['observationId'])]
+
+        path = os.path.join(self.outputDir, 'results')
+        os.makedirs(self.outputDir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.outputDir)
+        for name in self.dtype.names:
+            np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(records[name]))
+        with open(os.path.join(tmp, 'columns.txt'), 'w') as w:
+            w.write('\n'.join(self.dtype.names))
+        stale = None
+        if os.path.exists(path):
+            stale = tempfile.mkdtemp(dir=self.outputDir)
+            os.replace(path, stale)
+        os.replace(tmp, path)
+        if stale is not None:
+            shutil.rmtree(stale, ignore_errors=True)
+        return path
+
+    @staticmethod
+    def results(path):
+        """
+        Loads a results directory written by summarize.
+
+        Parameters
+        ----------
+        path: string
+            The results directory.
+
+        Returns
+        -------
+        astropy.table.Table
+            One row per observation, with memory-mapped columns.
+        """
+        with open(os.path.join(path, 'columns.txt')) as f:
+            names = f.read().split()
+        return Table([Column(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'), name=name, copy=False)
+                      for name in names], copy=False)
@@ -0,0 +1,320 @@
+"""
+Benchmarks of the active optics pipeline stages.
+
+Run all benchmarks and write the results with
+
+    python -m aos.benchmark --output results.json
+
+and check them against a stored baseline (exits with status 1 on regressions) with
+
+    python -m aos.benchmark --output results.json --baseline baseline.json
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+
+
+class BenchmarkSuite:
+    """
+    Times the stages of the active optics pipeline.
+
+    Notes
+    -----
+    Every case has a setup, which is not timed, that returns the callable to time. Each callable
+    is run number times per repeat, where number is chosen so that a repeat takes at least
+    minTime, and the median and minimum time per call over the repeats are reported. Cases whose
+    setup raises ImportError (e.g. without batoid) are reported as skipped.
+
+    Parameters
+    ----------
+    repeat: int
+        The number of timed repeats per case; defaults to 5.
+    minTime: float
+        The minimum duration of a repeat in seconds; defaults to 0.05.
+
+    Attributes
+    ----------
+    repeat: int
+        The number of timed repeats per case.
+    minTime: float
+        The minimum duration of a repeat in seconds.
+    cases: dict[string] -> callable
+        The setup of each case, by name.
+    """
+    def __init__(self, repeat=5, minTime=0.05):
+        self.repeat = repeat
+        self.minTime = minTime
+        self.cases = dict()
+        for nx in [63, 127, 255]:
+            self.cases[f'simulateWavefront[nx={nx}]'] = lambda nx=nx: BenchmarkSuite._simulateWavefront(nx)
+        for nphot in [10 ** 4, 10 ** 5, 10 ** 6]:
+            self.cases[f'simulateDonut[nphot={nphot}]'] = lambda nphot=nphot: BenchmarkSuite._simulateDonut(nphot)
+        self.cases['estimate'] = BenchmarkSuite._estimate
+        self.cases['evaluate'] = BenchmarkSuite._evaluate
+        self.cases['solve'] = lambda: BenchmarkSuite._solve(1)
+        self.cases['solve[batch=1000]'] = lambda: BenchmarkSuite._solve(1000)
+        self.cases['update'] = BenchmarkSuite._update
+        self.cases['catalog'] = BenchmarkSuite._catalog
+        self.cases['closedLoop'] = BenchmarkSuite._closedLoop
+
+    @staticmethod
+    def _telescope(band='g'):
+        # a telescope with its own mirror residuals, which accumulate bending
+        from aos.mirror import M1M3Residual, M2Residual
+        from aos.state import BendingState
+        from aos.telescope import Telescope, BendingTelescope
+        nModes = (BendingState.LENGTH - 10) // 2
+        return BendingTelescope(Telescope.nominal(band=band).optic, M1M3Residual(nModes=nModes),
+                                M2Residual(nModes=nModes))
+
+    @staticmethod
+    def _simulateWavefront(nx):
+        from aos.simulator import WavefrontSimulator
+        from aos.telescope import Telescope
+        optic = Telescope.nominal().optic
+        simulator = WavefrontSimulator(nx=nx)
+        return lambda: simulator.simulateWavefront(optic, 1.0, 0.5)
+
+    @staticmethod
+    def _simulateDonut(nphot):
+        from aos.simulator import DonutSimulator
+        from aos.telescope import Telescope
+        optic = Telescope.nominal().intra
+        simulator = DonutSimulator(nphot=nphot)
+        return lambda: simulator.simulateDonut(optic, 1.0, 0.5)
+
+    @staticmethod
+    def _wavefront():
+        from aos.estimator import WavefrontEstimator
+        estimator = WavefrontEstimator()
+        coefs = np.random.RandomState(0).normal(0, 1e-7, 23)
+        coefs[0] = 0
+        return estimator, estimator.evaluate(coefs), coefs
+
+    @staticmethod
+    def _estimate():
+        estimator, wavefront, _ = BenchmarkSuite._wavefront()
+        return lambda: estimator.estimate(wavefront)
+
+    @staticmethod
+    def _evaluate():
+        estimator, _, coefs = BenchmarkSuite._wavefront()
+        return lambda: estimator.evaluate(coefs)
+
+    @staticmethod
+    def _solve(batch):
+        from aos.solver import SensitivitySolver
+        solver = SensitivitySolver()
+        y = np.random.RandomState(0).normal(0, 1e-7, (batch, 23)).squeeze()
+        return lambda: solver.solve(y, asArray=True)
+
+    @staticmethod
+    def _update():
+        from aos.state import BendingState
+        telescope = BenchmarkSuite._telescope()
+        x = BendingState()
+        x['m2b3'] = 1e-9
+        steps = [x, BendingState(-x.array)]
+        calls = [0]
+
+        def update():
+            # alternate the sign so that the bending does not grow over the calls
+            telescope.update(steps[calls[0] % 2])
+            calls[0] += 1
+        return update
+
+    @staticmethod
+    def _catalog():
+        from aos.catalog import GaiaCatalog
+        # the first load converts the csv; the benchmark measures the cached path
+        GaiaCatalog().table
+
+        def load():
+            catalog = GaiaCatalog()
+            return catalog.table
+        return load
+
+    @staticmethod
+    def _closedLoop():
+        from aos.simulator import WavefrontSimulator
+        from aos.estimator import WavefrontEstimator
+        from aos.metric import SumOfSquares
+        from aos.control import GainController
+        from aos.state import BendingState
+        from aos.solver import SensitivitySolver
+
+        telescope = BenchmarkSuite._telescope(band='g')
+        simulator = WavefrontSimulator()
+        estimator = WavefrontEstimator()
+        solver = SensitivitySolver()
+        controller = GainController(SumOfSquares(), gain=0.3)
+        x = BendingState()
+        x['m2b3'] = 1e-6
+        telescope.update(x)
+
+        def iteration():
+            wavefront = simulator.simulateWavefront(telescope.optic, 0, 0)
+            yest = estimator.estimate(wavefront)
+            xest = solver.solve(yest)
+            _, xdelta = controller.nextState(xest)
+            telescope.update(xdelta)
+        return iteration
+
+    def time(self, func):
+        """
+        Times a callable.
+
+        Parameters
+        ----------
+        func: callable
+            The function to time, called without arguments.
+
+        Returns
+        -------
+        dict
+            The median and min seconds per call, and the number and repeat used.
+        """
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        number = max(1, int(np.ceil(self.minTime / max(elapsed, 1e-9))))
+        times = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number)
+        return {'median': float(np.median(times)), 'min': float(np.min(times)),
+                'number': number, 'repeat': self.repeat}
+
+    def run(self, names=None, verbose=False):
+        """
+        Runs benchmarks.
+
+        Parameters
+        ----------
+        names: list[string]
+            Only run cases whose name contains one of these; defaults to all cases.
+        verbose: bool
+            Whether to print each result; defaults to False.
+
+        Returns
+        -------
+        dict
+            The environment under 'meta' and the result of each case, by name, under
+            'benchmarks'; skipped cases have a 'skipped' reason instead of timings.
+        """
+        results = dict()
+        for name, setup in self.cases.items():
+            if names is not None and not any(pattern in name for pattern in names):
+                continue
+            try:
+                func = setup()
+            except ImportError as e:
+                results[name] = {'skipped': str(e)}
+            else:
+                results[name] = self.time(func)
+            if verbose:
+                print(name, results[name])
+        meta = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        }
+        return {'meta': meta, 'benchmarks': results}
+
+    @staticmethod
+    def write(results, path):
+        """
+        Parameters
+        ----------
+        results: dict
+            The output of BenchmarkSuite.run.
+        path: string
+            The JSON file to write.
+        """
+        with open(path, 'w') as w:
+            json.dump(results, w, indent=2, sort_keys=True)
+
+    @staticmethod
+    def read(path):
+        """
+        Parameters
+        ----------
+        path: string
+            A JSON file written by BenchmarkSuite.write.
+
+        Returns
+        -------
+        dict
+            The benchmark results.
+        """
+        with open(path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.2):
+        """
+        Compares benchmark results against a baseline.
+
+        Parameters
+        ----------
+        results: dict
+            The output of BenchmarkSuite.run.
+        baseline: dict
+            Earlier output of BenchmarkSuite.run.
+        tolerance: float
+            The relative change in median time per call that is flagged; defaults to 0.2.
+
+        Returns
+        -------
+        dict[string] -> dict
+            The ratio of current to baseline median time per call and a status ('regression',
+            'improvement', 'ok' or 'missing') for each case.
+        """
+        out = dict()
+        for name, result in results['benchmarks'].items():
+            base = baseline['benchmarks'].get(name, {})
+            if 'median' not in result or 'median' not in base:
+                out[name] = {'ratio': None, 'status': 'missing'}
+                continue
+            ratio = result['median'] / base['median']
+            if ratio > 1 + tolerance:
+                status = 'regression'
+            elif ratio < 1 / (1 + tolerance):
+                status = 'improvement'
+            else:
+                status = 'ok'
+            out[name] = {'ratio': ratio, 'status': status}
+        return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the active optics pipeline stages.')
+    parser.add_argument('--output', default='benchmarks.json', help='where to write the results')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative slowdown flagged as a regression')
+    parser.add_argument('--repeat', type=int, default=5, help='timed repeats per case')
+    parser.add_argument('names', nargs='*', help='only run cases whose name contains one of these')
+    args = parser.parse_args(argv)
+
+    suite = BenchmarkSuite(repeat=args.repeat)
+    results = suite.run(args.names or None, verbose=True)
+    BenchmarkSuite.write(results, args.output)
+    if args.baseline is None:
+        return 0
+
+    comparison = BenchmarkSuite.compare(results, BenchmarkSuite.read(args.baseline), args.tolerance)
+    for name, outcome in comparison.items():
+        ratio = '-' if outcome['ratio'] is None else '{:.2f}x'.format(outcome['ratio'])
+        print('{:<32} {:>8} {}'.format(name, ratio, outcome['status']))
+    return int(any(outcome['status'] == 'regression' for outcome in comparison.values()))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,356 @@
 import os
+import pickle
+import shutil
+import sqlite3
+import asyncio
+import tempfile
+import traceback
+import scipy
+import numpy as np
+from contextlib import closing
+from scipy.spatial import cKDTree
 from aos import catDir
 from aos.constant import h,c
-from astropy.table import Table, vstack
+from astropy.table import Table, Column, MaskedColumn, vstack
 from astroquery.gaia import Gaia
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from aos.focal_plane import WavefrontSensors
+from aos.survey import Survey
 
 class GaiaCatalog:
     """
     Class for gaia catalog tables.
 
+    Notes
+    -----
+    On first use, the csv catalog is converted into a directory of per-column .npy files under
+    data/catalogs/columnar, which are then memory-mapped and loaded one column at a time. The
+    conversion is redone if the csv is newer than the cache. If the cache cannot be written,
+    the csv is read directly.
+
     Parameters
     ----------
+    observation: int
+        The observation id; defaults to 19436.
+
+    Attributes
+    ----------
+    observation: int
+        The observation id.
+    names: list[string]
+        The column names.
     table: astropy.table.Table
         The catalog.
     """
+    columnarDir = os.path.join(catDir, 'columnar')
+    indexCacheSize = 8
+    indexVersion = 1
+    _indices = OrderedDict()
+
     def __init__(self, observation=19436):
-        self.table = Table.read(os.path.join(catDir, f'gaia_catalog_{observation}.csv'))
+        self.observation = observation
+        self._pointing = None
+        self._projections = dict()
+        csvPath = os.path.join(catDir, f'gaia_catalog_{observation}.csv')
+        self._mtime = os.path.getmtime(csvPath)
+        self.path = os.path.join(GaiaCatalog.columnarDir, f'gaia_catalog_{observation}')
+        self._columns = dict()
+        self._table = None
+        try:
+            if not os.path.exists(self.path) or os.path.getmtime(self.path) < os.path.getmtime(csvPath):
+                GaiaCatalog.convert(csvPath, self.path)
+            with open(os.path.join(self.path, 'columns.txt')) as f:
+                self.names = f.read().split()
+        except OSError:
+            self._table = Table.read(csvPath)
+            self.names = self._table.colnames
 
     @staticmethod
-    def __make_query(mag_cutoff, chips):
+    def convert(csvPath, path):
+        """
+        Converts a csv catalog into a directory of per-column .npy files.
+
+        Notes
+        -----
+        Masked columns also get a {name}.mask.npy file. The directory is written under a
+        temporary name and renamed into place, so concurrent readers never see a partial cache.
+        A stale directory is first renamed aside and only deleted once the new one is in place;
+        a reader that looks in between finds no cache and falls back to the csv.
+
+        Parameters
+        ----------
+        csvPath: string
+            The csv catalog.
+        path: string
+            The directory to write.
+        """
+        table = Table.read(csvPath)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent)
+        for name in table.colnames:
+            col = table[name]
+            np.save(os.path.join(tmp, f'{name}.npy'), np.asarray(col))
+            if isinstance(col, MaskedColumn):
+                np.save(os.path.join(tmp, f'{name}.mask.npy'), np.asarray(col.mask))
+        with open(os.path.join(tmp, 'columns.txt'), 'w') as w:
+            w.write('\n'.join(table.colnames))
+        stale = None
+        if os.path.exists(path):
+            stale = tempfile.mkdtemp(dir=parent)
+            try:
+                os.replace(path, stale)
+            except OSError:
+                # another process moved it first
+                pass
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # another process converted it first
+            shutil.rmtree(tmp, ignore_errors=True)
+        if stale is not None:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    @staticmethod
+    def _unitVectors(ra, dec):
+        ra, dec = np.deg2rad(ra), np.deg2rad(dec)
+        return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1)
+
+    @staticmethod
+    def _chord(radius):
+        return 2 * np.sin(np.deg2rad(radius) / 2)
+
+    @property
+    def index(self):
+        """
+        Returns
+        -------
+        scipy.spatial.cKDTree
+            KD-tree over the unit vectors of the sources.
+
+        Notes
+        -----
+        The tree is persisted as index.pickle in the columnar cache, together with indexVersion,
+        the scipy version and the modification time of the csv catalog. A pickle that does not
+        match all three is rebuilt, so that trees are reused across processes and pointings but
+        never outlive the catalog or the format they were built for. Within a process, the tree
+        is shared between all GaiaCatalog instances of the same observation, and the trees of the
+        indexCacheSize most recently used observations are kept.
+        """
+        key = (GaiaCatalog.indexVersion, scipy.__version__, self._mtime)
+        if self.observation in GaiaCatalog._indices:
+            GaiaCatalog._indices.move_to_end(self.observation)
+            cached, tree = GaiaCatalog._indices[self.observation]
+            if cached == key:
+                return tree
+        tree = self._loadIndex(key)
+        if tree is None:
+            tree = cKDTree(GaiaCatalog._unitVectors(np.asarray(self['ra']), np.asarray(self['dec'])))
+            self._saveIndex(key, tree)
+        GaiaCatalog._indices[self.observation] = (key, tree)
+        while len(GaiaCatalog._indices) > GaiaCatalog.indexCacheSize:
+            GaiaCatalog._indices.popitem(last=False)
+        return tree
+
+    def _loadIndex(self, key):
+        if self._table is not None:
+            return None
+        try:
+            with open(os.path.join(self.path, 'index.pickle'), 'rb') as r:
+                cached, tree = pickle.load(r)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        return tree if cached == key else None
+
+    def _saveIndex(self, key, tree):
+        if self._table is not None:
+            return
+        path = os.path.join(self.path, 'index.pickle')
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'wb') as w:
+                pickle.dump((key, tree), w)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def queryRadius(self, ra, dec, radius):
+        """
+        Finds the sources within a radius of one or more positions.
+
+        Parameters
+        ----------
+        ra: float | numpy.ndarray
+            Right ascension(s) in degrees.
+        dec: float | numpy.ndarray
+            Declination(s) in degrees.
+        radius: float
+            The search radius in degrees.
+
+        Returns
+        -------
+        list[int] | numpy.ndarray[list[int]]
+            The indices of the sources near each position.
+        """
+        return self.index.query_ball_point(GaiaCatalog._unitVectors(ra, dec), GaiaCatalog._chord(radius))
+
+    def nearestNeighbours(self, k=1):
+        """
+        Finds the nearest other sources of every source.
+
+        Parameters
+        ----------
+        k: int
+            The number of neighbours; defaults to 1.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The (N, k) angular distances in degrees and indices of the neighbours.
+        """
+        dist, ind = self.index.query(self.index.data, k=k + 1)
+        dist = np.rad2deg(2 * np.arcsin(np.clip(dist[:, 1:] / 2, 0, 1)))
+        return dist, ind[:, 1:]
+
+    def isolated(self, radius, magnitudeGap=None, magnitude='lsst_r_mag'):
+        """
+        Flags sources without blending neighbours.
+
+        Parameters
+        ----------
+        radius: float
+            Sources closer than this (in degrees) are candidate blends, e.g. a donut diameter.
+        magnitudeGap: float
+            If given, only neighbours brighter than this many magnitudes fainter than the source
+            count as blends; defaults to None (every neighbour counts).
+        magnitude: string
+            The magnitude column; defaults to 'lsst_r_mag'.
+
+        Returns
+        -------
+        numpy.ndarray[bool]
+            Whether each source is isolated.
+        """
+        pairs = self.index.query_pairs(GaiaCatalog._chord(radius), output_type='ndarray')
+        out = np.ones(self.index.n, dtype=bool)
+        if magnitudeGap is None:
+            out[pairs.ravel()] = False
+        else:
+            mag = np.asarray(self[magnitude], dtype=float)
+            i, j = pairs[:, 0], pairs[:, 1]
+            out[i[mag[j] < mag[i] + magnitudeGap]] = False
+            out[j[mag[i] < mag[j] + magnitudeGap]] = False
+        return out
+
+    def onChip(self, chip):
+        """
+        Flags the sources that fall on a chip.
+
+        Parameters
+        ----------
+        chip: aos.focal_plane.Chip
+            The chip.
+
+        Returns
+        -------
+        numpy.ndarray[bool]
+            Whether each source is on the chip.
+        """
+        # the center is the mean of the corner unit vectors, which is safe across ra=0
+        corners = GaiaCatalog._unitVectors(chip.corners[:, 0], chip.corners[:, 1])
+        center = np.sum(corners, axis=0)
+        center /= np.linalg.norm(center)
+        radius = np.max(np.linalg.norm(corners - center, axis=1))
+        candidates = np.array(self.index.query_ball_point(center, radius), dtype=int)
+        out = np.zeros(self.index.n, dtype=bool)
+        if len(candidates):
+            ra = np.asarray(self['ra'])[candidates]
+            dec = np.asarray(self['dec'])[candidates]
+            out[candidates] = chip.contains(ra, dec)
+        return out
+
+    @property
+    def rotation(self):
+        """
+        Returns
+        -------
+        float
+            The rotation of the focal plane, in degrees, that the catalog was queried with. It is
+            0 for catalogs without a rotation column, such as the shipped ones, which were queried
+            before the wavefront sensors were rotated with the pointing.
+        """
+        if 'rotation' not in self.names or len(self['rotation']) == 0:
+            return 0.
+        return float(self['rotation'][0])
+
+    def fieldAngles(self, pointing=None):
+        """
+        Projects every source to field angles.
+
+        Notes
+        -----
+        Projections are cached on the instance per pointing, and the observation's pointing is
+        only looked up in the survey once.
+
+        Parameters
+        ----------
+        pointing: aos.projection.Pointing
+            The telescope pointing; defaults to this observation's pointing in aos.survey.Survey.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The x and y field angles of the sources in degrees.
+        """
+        if pointing is None:
+            if self._pointing is None:
+                self._pointing = Survey().pointing(self.observation)
+            pointing = self._pointing
+        if pointing.key not in self._projections:
+            self._projections[pointing.key] = pointing.toField(np.asarray(self['ra']), np.asarray(self['dec']))
+        return self._projections[pointing.key]
+
+    def __getitem__(self, name):
+        """
+        Parameters
+        ----------
+        name: string
+            The column name.
+
+        Returns
+        -------
+        astropy.table.Column | astropy.table.MaskedColumn
+            The column, memory-mapped from the columnar cache.
+        """
+        if self._table is not None:
+            return self._table[name]
+        if name not in self._columns:
+            if name not in self.names:
+                raise KeyError(name)
+            data = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+            maskPath = os.path.join(self.path, f'{name}.mask.npy')
+            if os.path.exists(maskPath):
+                col = MaskedColumn(data, name=name, mask=np.load(maskPath), copy=False)
+            else:
+                col = Column(data, name=name, copy=False)
+            self._columns[name] = col
+        return self._columns[name]
+
+    @property
+    def table(self):
+        """
+        Returns
+        -------
+        astropy.table.Table
+            The full catalog, built from the memory-mapped columns on first access.
+        """
+        if self._table is None:
+            self._table = Table([self[name] for name in self.names], copy=False)
+        return self._table
+
+    @staticmethod
+    def _make_query(mag_cutoff, chips):
         """
         Forms Gaia Archive ADQL query.
 
@@ -42,6 +375,39 @@ class GaiaCatalog:
         OR 1=CONTAINS(POINT('ICRS',ra,dec), {chips[3].polygon_string()}))
         """
 
+    @staticmethod
+    def augment(intra, extra):
+        """
+        Combines intra and extra-focal query results and adds the lsst_r_mag column.
+
+        Parameters
+        ----------
+        intra: astropy.table.Table
+            Sources on the intra-focal chips.
+        extra: astropy.table.Table
+            Sources on the extra-focal chips.
+
+        Returns
+        -------
+        astropy.table.Table
+            The catalog.
+
+        Notes
+        -----
+        The lsst_r_mag relationship comes from
+        https://gea.esac.esa.int/archive/documentation/GDR2/Data_processing/chap_cu5pho/sec_cu5pho_calibr/ssec_cu5pho_PhotTransf.html
+        viewed on 2020/4/7.
+        """
+        intra['focal'] = 'intra'
+        extra['focal'] = 'extra'
+        out = vstack([intra, extra])
+
+        # convert magnitudes
+        x = out['phot_bp_mean_mag'] - out['phot_rp_mean_mag']
+        G_minus_r = -0.12879 + 0.24662 * x - 0.027464 * x ** 2 - 0.049465 * x ** 3
+        out['lsst_r_mag'] = out['phot_g_mean_mag'] - G_minus_r
+        return out
+
     @staticmethod
     def launch_query(wavefront_sensors, output_path, mag_cutoff=25, test=False, verbose=True):
         """
@@ -67,12 +433,12 @@ class GaiaCatalog:
         viewed on 2020/4/7.
         """
         intras = wavefront_sensors.intras
-        intra_query = GaiaCatalog.__make_query(mag_cutoff, wavefront_sensors.intras)
+        intra_query = GaiaCatalog._make_query(mag_cutoff, wavefront_sensors.intras)
         # temporary intermediate path
         intra_path = output_path + '_intra'
 
         extras = wavefront_sensors.extras
-        extra_query = GaiaCatalog.__make_query(mag_cutoff, wavefront_sensors.extras)
+        extra_query = GaiaCatalog._make_query(mag_cutoff, wavefront_sensors.extras)
         # temporary intermediate path
         extra_path = output_path + '_extra'
 
@@ -82,18 +448,288 @@ class GaiaCatalog:
 
         intra = Table.read(intra_path, format='csv')
         extra = Table.read(extra_path, format='csv')
-        intra['focal'] = 'intra'
-        extra['focal'] = 'extra'
-        out = vstack([intra, extra])
-
-        # convert magnitudes
-        x = out['phot_bp_mean_mag'] - out['phot_rp_mean_mag']
-        G_minus_r = -0.12879 + 0.24662 * x - 0.027464 * x ** 2 - 0.049465 * x ** 3
-        out['lsst_r_mag'] = out['phot_g_mean_mag'] - G_minus_r
+        out = GaiaCatalog.augment(intra, extra)
 
         if not test:
             out.write(output_path, overwrite=True)
 
         # delete temporary files
         os.remove(intra_path)
-        os.remove(extra_path)
\ No newline at end of file
+        os.remove(extra_path)
+
+
+class CatalogBackend(ABC):
+    """
+    Abstract source of catalog query results for CatalogPipeline.
+    """
+    columns = ['source_id', 'ra', 'dec', 'teff_val', 'phot_g_mean_mag', 'phot_bp_mean_mag', 'phot_rp_mean_mag']
+
+    @abstractmethod
+    def query(self, chips, mag_cutoff):
+        """
+        Queries the sources on a set of chips.
+
+        Parameters
+        ----------
+        chips: list[aos.focal_plane.Chip]
+            List of either intra or extra-focal chips.
+        mag_cutoff: float | int
+            Ignore sources fainter than this cutoff.
+
+        Returns
+        -------
+        astropy.table.Table
+            The sources, with CatalogBackend.columns.
+        """
+        pass
+
+
+class GaiaBackend(CatalogBackend):
+    """
+    Queries the Gaia Archive.
+
+    Parameters
+    ----------
+    verbose: bool
+        Whether to launch queries with verbose flag; defaults to False.
+    """
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def query(self, chips, mag_cutoff):
+        """
+        Queries the sources on a set of chips from the Gaia Archive.
+
+        Parameters
+        ----------
+        chips: list[aos.focal_plane.Chip]
+            List of either intra or extra-focal chips.
+        mag_cutoff: float | int
+            Ignore sources fainter than this cutoff.
+
+        Returns
+        -------
+        astropy.table.Table
+            The sources.
+        """
+        job = Gaia.launch_job_async(query=GaiaCatalog._make_query(mag_cutoff, chips), verbose=self.verbose,
+                                    dump_to_file=False, background=False)
+        return job.get_results()
+
+
+class SQLiteBackend(CatalogBackend):
+    """
+    Queries a local SQLite stand-in for the Gaia Archive, e.g. for offline testing.
+
+    Notes
+    -----
+    The database must have a gaia_source table with CatalogBackend.columns. Sources are
+    selected by bounding box in SQL, split in two ra ranges when the chips straddle ra=0, and
+    then by chip polygon.
+
+    Parameters
+    ----------
+    path: string
+        The SQLite database.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def write(table, path):
+        """
+        Writes a table of sources to a SQLite database usable by SQLiteBackend.
+
+        Parameters
+        ----------
+        table: astropy.table.Table
+            The sources, with at least CatalogBackend.columns.
+        path: string
+            The SQLite database.
+        """
+        with closing(sqlite3.connect(path)) as conn, conn:
+            names = ', '.join(CatalogBackend.columns)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS gaia_source ({names})')
+            data = [np.asarray(table['source_id']).tolist()]
+            data += [np.ma.filled(np.ma.asarray(table[c], dtype=float), np.nan).tolist()
+                     for c in CatalogBackend.columns[1:]]
+            placeholders = ', '.join('?' * len(CatalogBackend.columns))
+            conn.executemany(f'INSERT INTO gaia_source VALUES ({placeholders})', zip(*data))
+
+    def query(self, chips, mag_cutoff):
+        """
+        Queries the sources on a set of chips from the database.
+
+        Parameters
+        ----------
+        chips: list[aos.focal_plane.Chip]
+            List of either intra or extra-focal chips.
+        mag_cutoff: float | int
+            Ignore sources fainter than this cutoff.
+
+        Returns
+        -------
+        astropy.table.Table
+            The sources.
+        """
+        corners = np.vstack([chip.corners for chip in chips])
+        # unwrap ra relative to the first corner, so that chips straddling ra=0 keep a small range
+        ra0 = corners[0, 0]
+        offsets = (corners[:, 0] - ra0 + 180) % 360 - 180
+        lo = [(ra0 + offsets.min()) % 360, corners[:, 1].min()]
+        hi = [(ra0 + offsets.max()) % 360, corners[:, 1].max()]
+        ra = 'ra BETWEEN ? AND ?' if lo[0] <= hi[0] else '(ra >= ? OR ra <= ?)'
+        with closing(sqlite3.connect(self.path)) as conn:
+            rows = conn.execute(f'SELECT {", ".join(CatalogBackend.columns)} FROM gaia_source '
+                                f'WHERE phot_g_mean_mag < ? AND {ra} AND dec BETWEEN ? AND ?',
+                                (mag_cutoff, lo[0], hi[0], lo[1], hi[1])).fetchall()
+        table = Table(rows=rows, names=CatalogBackend.columns) if rows else \
+            Table(names=CatalogBackend.columns, dtype=['i8'] + ['f8'] * (len(CatalogBackend.columns) - 1))
+        for c in CatalogBackend.columns[1:]:
+            table[c] = MaskedColumn(np.asarray(table[c], dtype=float), mask=np.isnan(np.asarray(table[c], dtype=float)))
+        mask = np.zeros(len(table), dtype=bool)
+        for chip in chips:
+            mask |= chip.contains(np.asarray(table['ra']), np.asarray(table['dec']))
+        return table[mask]
+
+
+class CatalogPipeline:
+    """
+    Generates catalogs for many observations concurrently.
+
+    Notes
+    -----
+    Each observation's catalog is written atomically to gaia_catalog_{observation}.csv, with the
+    rotation of the chips it was queried on (see GaiaCatalog.rotation), and doubles as its
+    checkpoint: observations whose catalog already exists are skipped, so an
+    interrupted run can simply be restarted. At most maxConcurrent queries run at once, in a
+    thread pool, and failed observations are retried with exponential backoff. The traceback of
+    the last attempt of an observation that still fails is written to
+    gaia_catalog_{observation}.err.
+
+    Parameters
+    ----------
+    backend: CatalogBackend
+        The source of query results; defaults to GaiaBackend().
+    outputDir: string
+        Where to write catalogs; defaults to data/catalogs.
+    maxConcurrent: int
+        The maximum number of concurrent queries; defaults to 4.
+    mag_cutoff: float | int
+        Ignore sources fainter than this cutoff; defaults to 25.
+    retries: int
+        The number of retries per observation; defaults to 3.
+    backoff: float
+        The delay before the first retry in seconds, doubled for each retry; defaults to 1.
+
+    Attributes
+    ----------
+    backend: CatalogBackend
+        The source of query results.
+    outputDir: string
+        Where to write catalogs.
+    maxConcurrent: int
+        The maximum number of concurrent queries.
+    mag_cutoff: float | int
+        Ignore sources fainter than this cutoff.
+    retries: int
+        The number of retries per observation.
+    backoff: float
+        The delay before the first retry in seconds.
+    """
+    def __init__(self, backend=None, outputDir=catDir, maxConcurrent=4, mag_cutoff=25, retries=3, backoff=1.):
+        self.backend = GaiaBackend() if backend is None else backend
+        self.outputDir = outputDir
+        self.maxConcurrent = maxConcurrent
+        self.mag_cutoff = mag_cutoff
+        self.retries = retries
+        self.backoff = backoff
+
+    def path(self, observation):
+        """
+        Parameters
+        ----------
+        observation: int
+            The observation id.
+
+        Returns
+        -------
+        string
+            The catalog path for the observation.
+        """
+        return os.path.join(self.outputDir, f'gaia_catalog_{observation}.csv')
+
+    def _generate(self, observation, ra, dec, rotation):
+        ws = WavefrontSensors(ra, dec, rotation)
+        intra = self.backend.query(ws.intras, self.mag_cutoff)
+        extra = self.backend.query(ws.extras, self.mag_cutoff)
+        out = GaiaCatalog.augment(intra, extra)
+        out['rotation'] = np.full(len(out), float(rotation))
+        tmp = self.path(observation) + '.tmp'
+        out.write(tmp, format='csv', overwrite=True)
+        os.replace(tmp, self.path(observation))
+
+    async def generate(self, observation, ra, dec, rotation, semaphore):
+        """
+        Generates the catalog of one observation, unless it already exists.
+
+        Parameters
+        ----------
+        observation: int
+            The observation id.
+        ra: float
+            Right ascension of the pointing in degrees.
+        dec: float
+            Declination of the pointing in degrees.
+        rotation: float
+            Rotation of the focal plane on the sky in degrees.
+        semaphore: asyncio.Semaphore
+            Bounds the number of concurrent queries.
+
+        Returns
+        -------
+        string
+            'skipped', 'done' or 'failed'.
+        """
+        if os.path.exists(self.path(observation)):
+            return 'skipped'
+        loop = asyncio.get_running_loop()
+        error = self.path(observation).replace('.csv', '.err')
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    await loop.run_in_executor(None, self._generate, observation, ra, dec, rotation)
+                if os.path.exists(error):
+                    os.remove(error)
+                return 'done'
+            except Exception:
+                if attempt == self.retries:
+                    with open(error, 'w') as w:
+                        w.write(traceback.format_exc())
+                    return 'failed'
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def _run(self, observations):
+        semaphore = asyncio.Semaphore(self.maxConcurrent)
+        observations = [(int(obs), float(ra), float(dec), float(rotation[0]) if rotation else 0.)
+                        for obs, ra, dec, *rotation in observations]
+        results = await asyncio.gather(*[self.generate(*obs, semaphore) for obs in observations])
+        return dict(zip([obs[0] for obs in observations], results))
+
+    def run(self, observations):
+        """
+        Generates the catalogs of many observations.
+
+        Parameters
+        ----------
+        observations: iterable[(int, float, float, float)]
+            Observation id, ra, dec and, optionally, rotation (defaults to 0) of each pointing,
+            e.g. Survey().table['observationId', 'fieldRA', 'fieldDec', 'rotTelPos'].
+
+        Returns
+        -------
+        dict[int] -> string
+            The outcome ('skipped', 'done' or 'failed') of each observation. The traceback of
+            a failed observation is written next to its catalog as gaia_catalog_{observation}.err.
+        """
+        return asyncio.run(self._run(observations))
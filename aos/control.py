@@ -1,3 +1,4 @@
+import warnings
 import numpy as np
 from scipy.optimize import minimize
 from aos.state import BendingState
@@ -29,6 +30,12 @@ class GainController(Controller):
     A controller that computes the next state by optimizing a metric and multiplying the
     optimal update by a gain.
 
+    Notes
+    -----
+    If the metric declares a quadratic form, its minimum is computed in closed form (and cached);
+    otherwise the metric is minimized numerically, using its analytic gradient if available
+    and warm-starting from the previous optimum.
+
     Parameters
     __________
     metric: aos.metric.Metric
@@ -46,6 +53,8 @@ class GainController(Controller):
     def __init__(self, metric, gain=1):
         self.metric = metric
         self.gain = gain
+        self._closedForm = dict()
+        self._warmStart = dict()
 
     def nextState(self, x):
         """
@@ -59,8 +68,175 @@ class GainController(Controller):
         aos.state.BendingState, aos.state.BendingState
             The next state and corresponding update.
         """
-        xprime = np.zeros(BendingState.LENGTH)
-        res = minimize(self.metric.evaluate, xprime)
-        xdelta = BendingState((res.x - x.array) * self.gain)
+        xopt = self.optimum(BendingState.LENGTH)
+        xdelta = BendingState((xopt - x.array) * self.gain)
         xprime = BendingState(x.array + xdelta.array)
         return xprime, xdelta
+
+    def optimum(self, length):
+        """
+        Finds the state that minimizes the metric.
+
+        Parameters
+        ----------
+        length: int
+            The number of degrees of freedom in the optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The optimal state.
+        """
+        if length in self._closedForm:
+            return self._closedForm[length]
+
+        form = self.metric.quadraticForm(length)
+        if form is not None:
+            Q, b, _ = form
+            # minimum of x^T Q x + b^T x where 2 Q x = -b
+            self._closedForm[length] = -0.5 * np.dot(np.linalg.pinv(Q), b)
+            return self._closedForm[length]
+
+        x0 = self._warmStart.get(length, np.zeros(length))
+        jac = self.metric.gradient if self.metric.hasGradient else None
+        res = minimize(self.metric.evaluate, x0, jac=jac)
+        self._warmStart[length] = res.x
+        return res.x
+
+
+class ModelPredictiveController(Controller):
+    """
+    A receding horizon controller for quadratic metrics with actuator limits.
+
+    Notes
+    -----
+    Plans the states x_1..x_H over a horizon of H visits, starting from the current state x_0,
+    by minimizing
+
+        sum_t metric(x_t) + (x_t - x_{t-1})^T R (x_t - x_{t-1})
+
+    subject to limits on each degree of freedom (hexapod travel and bending mode amplitudes, see
+    BendingState.LIMITS), and applies only the first step. Planning in states
+    rather than updates makes the limits simple bounds.
+
+    The metric must declare a quadratic form. The unconstrained plan is linear in x_0, so its
+    gain matrices are precomputed; if it violates the limits, the bounded QP is solved with a
+    primal-dual active set method, warm-started from the previous plan. If the active set has
+    not settled within maxIter iterations, a RuntimeWarning is issued and the last iterate,
+    clipped to the limits, is used.
+
+    Parameters
+    ----------
+    metric: aos.metric.Metric
+        The quadratic metric to optimize for in the control loop.
+    horizon: int
+        The number of visits to plan over; defaults to 3.
+    effort: float
+        Weight of the update penalty R, relative to the mean diagonal of the metric's Q;
+        defaults to 1e-3.
+    limits: numpy.ndarray | None
+        Maximum absolute value of each degree of freedom; defaults to BendingState.LIMITS. None
+        leaves the states unbounded.
+    length: int
+        The number of degrees of freedom; defaults to BendingState.LENGTH.
+    maxIter: int
+        Maximum number of active set iterations; defaults to 50.
+
+    Attributes
+    ----------
+    metric: aos.metric.Metric
+        The quadratic metric to optimize for in the control loop.
+    horizon: int
+        The number of visits to plan over.
+    limits: numpy.ndarray | None
+        Maximum absolute value of each degree of freedom.
+    K: numpy.ndarray
+        The (H * length, length) gain from x_0 to the unconstrained plan.
+    k: numpy.ndarray
+        The (H * length) offset of the unconstrained plan.
+
+    Raises
+    ------
+    ValueError
+        If the metric does not declare a quadratic form.
+    """
+    def __init__(self, metric, horizon=3, effort=1e-3, limits=BendingState.LIMITS, length=BendingState.LENGTH,
+                 maxIter=50):
+        form = metric.quadraticForm(length)
+        if form is None:
+            raise ValueError('metric must declare a quadratic form.')
+        Q, b, _ = form
+        self.metric = metric
+        self.horizon = horizon
+        self.limits = None if limits is None else np.broadcast_to(limits, length).astype(float)
+        self.length = length
+        self.maxIter = maxIter
+
+        R = effort * np.mean(np.diag(Q)) * np.eye(length)
+        # plan cost X^T M X + (B + E x_0)^T X, with M block tridiagonal
+        M = np.kron(np.eye(horizon), Q + 2 * R) - np.kron(np.eye(horizon, k=1) + np.eye(horizon, k=-1), R)
+        M[-length:, -length:] -= R
+        B = np.tile(b, horizon)
+        E = np.zeros((horizon * length, length))
+        E[:length] = -2 * R
+
+        Minv = np.linalg.inv(M)
+        self._M = M
+        self._B = B
+        self._E = E
+        self.K = -0.5 * np.dot(Minv, E)
+        self.k = -0.5 * np.dot(Minv, B)
+        self._plan = None
+
+    def _solveBounded(self, q, X):
+        # primal-dual active set method for min X^T M X + q^T X subject to |X| <= limits
+        H = 2 * self._M
+        hi = np.tile(self.limits, self.horizon)
+        lo = -hi
+        c = np.mean(np.diag(H))
+        mu = -(np.dot(H, X) + q)
+        active = None
+        for _ in range(self.maxIter):
+            atHi = mu + c * (X - hi) > 0
+            atLo = mu + c * (X - lo) < 0
+            if active is not None and np.array_equal(atHi, active[0]) and np.array_equal(atLo, active[1]):
+                break
+            active = (atHi, atLo)
+            free = ~(atHi | atLo)
+            X = np.where(atHi, hi, np.where(atLo, lo, 0.))
+            if np.any(free):
+                rhs = -(q[free] + np.dot(H[free][:, ~free], X[~free]))
+                X[free] = np.linalg.solve(H[free][:, free], rhs)
+            mu = -(np.dot(H, X) + q)
+            mu[free] = 0
+        else:
+            warnings.warn('the bounded plan did not converge in {} iterations; using the clipped last iterate.'
+                          .format(self.maxIter), RuntimeWarning)
+        return np.clip(X, lo, hi)
+
+    def nextState(self, x):
+        """
+        Parameters
+        ----------
+        x: aos.state.State
+            Optical state.
+
+        Returns
+        -------
+        aos.state.BendingState, aos.state.BendingState
+            The next state and corresponding update.
+        """
+        x0 = x.array
+        X = np.dot(self.K, x0) + self.k
+        if self.limits is not None and np.any(np.abs(X) > np.tile(self.limits, self.horizon)):
+            if self._plan is None:
+                warm = X
+            else:
+                # shift the previous plan by one visit
+                warm = np.concatenate([self._plan[self.length:], self._plan[-self.length:]])
+            X = self._solveBounded(self._B + np.dot(self._E, x0), warm)
+        self._plan = X
+
+        xprime = BendingState(X[:self.length].copy())
+        xdelta = BendingState(xprime.array - x0)
+        return xprime, xdelta
@@ -1,5 +1,276 @@
+import numpy as np
+from scipy.ndimage import maximum_filter
+from scipy.signal import fftconvolve
+from scipy.spatial import cKDTree
+
+
 class DonutExtractor:
     """
     A class to extract donuts from wavefront sensor images.
+
+    Notes
+    -----
+    Candidates are the peaks of the cross-correlation of the (binned, background subtracted)
+    chip image with an annular template, computed with FFTs. Their positions are refined by
+    the centroid of the full resolution image over the donut, and optionally matched to
+    catalog-predicted positions after removing their median offset. Donuts that are clipped by
+    the chip edge or that have a neighbour (detected or in the catalog) within blendRadius are
+    rejected. Stamps are cut in one gather into a contiguous (N, crop, crop) cube.
+
+    Templates are cached per defocus and field position (rounded to fieldStep). Without a
+    telescope they are geometric annuli, which only depend on the defocus; with one they are
+    ray-traced with aos.simulator.DonutSimulator.
+
+    Parameters
+    ----------
+    crop: int
+        The number of pixels in donut stamps; defaults to 192.
+    pix: float
+        The size of a pixel in meters; defaults to 10e-6.
+    bin: int
+        The binning factor of the image for template matching; defaults to 4.
+    threshold: float
+        The detection threshold in units of the robust standard deviation of the
+        cross-correlation; defaults to 5.
+    blendRadius: float
+        Donuts with a neighbour closer than this many pixels are rejected; defaults to the
+        donut diameter.
+    maxShift: float
+        The largest distance in pixels between a donut and its catalog position, after removing
+        the median offset; defaults to 10.
+    telescope: aos.telescope.Telescope
+        Used to ray-trace templates; defaults to None (geometric templates).
+    fieldStep: float
+        Templates are cached on a grid of field positions with this spacing in degrees; defaults
+        to 0.1.
+
+    Attributes
+    ----------
+    crop: int
+        The number of pixels in donut stamps.
+    pix: float
+        The size of a pixel in meters.
+    bin: int
+        The binning factor of the image for template matching.
+    threshold: float
+        The detection threshold in robust standard deviations.
+    blendRadius: float | None
+        The blending distance in pixels.
+    maxShift: float
+        The largest distance in pixels between a donut and its catalog position.
+    telescope: aos.telescope.Telescope | None
+        Used to ray-trace templates.
+    fieldStep: float
+        The spacing in degrees of the template cache.
+
+    Raises
+    ------
+    ValueError
+        crop must be an even integer.
     """
-    pass
\ No newline at end of file
+    F_NUMBER = 1.234
+    OBSCURATION = 0.61
+
+    def __init__(self, crop=192, pix=10e-6, bin=4, threshold=5., blendRadius=None, maxShift=10.,
+                 telescope=None, fieldStep=0.1):
+        if crop % 2 == 1:
+            raise ValueError('crop must be even integer.')
+        self.crop = crop
+        self.pix = pix
+        self.bin = bin
+        self.threshold = threshold
+        self.blendRadius = blendRadius
+        self.maxShift = maxShift
+        self.telescope = telescope
+        self.fieldStep = fieldStep
+        self._templates = dict()
+
+    def radius(self, defocus):
+        """
+        Parameters
+        ----------
+        defocus: float
+            The detector offset from focus in meters.
+
+        Returns
+        -------
+        float
+            The outer radius of a donut in pixels.
+        """
+        return abs(defocus) / (2 * DonutExtractor.F_NUMBER) / self.pix
+
+    def template(self, defocus, field=(0, 0)):
+        """
+        Provides the unit-norm, zero-mean template of a donut.
+
+        Parameters
+        ----------
+        defocus: float
+            The detector offset from focus in meters; negative is intra-focal.
+        field: (float, float)
+            Field position in degrees; defaults to (0, 0).
+
+        Returns
+        -------
+        numpy.ndarray
+            The read-only (crop, crop) template.
+        """
+        field = tuple(np.round(np.asarray(field, dtype=float) / self.fieldStep) * self.fieldStep)
+        key = (float(defocus),) + (field if self.telescope is not None else ())
+        if key not in self._templates:
+            if self.telescope is None:
+                space = np.arange(self.crop) - (self.crop - 1) / 2
+                r = np.hypot(*np.meshgrid(space, space))
+                outer = self.radius(defocus)
+                out = ((r <= outer) & (r >= DonutExtractor.OBSCURATION * outer)).astype(float)
+            else:
+                from aos.simulator import DonutSimulator
+                optic = self.telescope.optic.withGloballyShiftedOptic('LSST.LSSTCamera.Detector', [0, 0, defocus])
+                out = DonutSimulator(crop=self.crop, pix=self.pix).simulateDonut(optic, *field).array
+            out = out - np.mean(out)
+            out /= np.linalg.norm(out)
+            out.setflags(write=False)
+            self._templates[key] = out
+        return self._templates[key]
+
+    def _binned(self, image):
+        b = self.bin
+        ny, nx = image.shape[0] // b, image.shape[1] // b
+        # two contiguous passes are much faster than one reduction over axes (1, 3)
+        rows = image[:ny * b, :nx * b].reshape(ny, b, nx * b).sum(axis=1, dtype=float)
+        return rows.reshape(ny, nx, b).sum(axis=2) / b ** 2
+
+    def _windows(self, image, centers, size):
+        offsets = np.arange(size) - size // 2
+        rows = np.clip(np.rint(centers[:, 1])[:, None].astype(int) + offsets, 0, image.shape[0] - 1)
+        cols = np.clip(np.rint(centers[:, 0])[:, None].astype(int) + offsets, 0, image.shape[1] - 1)
+        return image[rows[:, :, None], cols[:, None, :]], rows, cols
+
+    def detect(self, image, defocus=-1.5e-3, field=(0, 0)):
+        """
+        Finds donut candidates by template matching.
+
+        Parameters
+        ----------
+        image: numpy.ndarray
+            The background subtracted chip image.
+        defocus: float
+            The detector offset from focus in meters; defaults to -1.5e-3 (intra-focal).
+        field: (float, float)
+            Field position of the chip in degrees; defaults to (0, 0).
+
+        Returns
+        -------
+        numpy.ndarray
+            The (N, 2) x and y pixel positions of the candidates, refined by centroiding.
+        """
+        return self._detect(image, self._binned(image), 0., defocus, field)
+
+    def _detect(self, image, binned, background, defocus, field):
+        b = self.bin
+        template = self._binned(self.template(defocus, field))
+        corr = fftconvolve(binned, template[::-1, ::-1], mode='same')
+        sigma = 1.4826 * np.median(np.abs(corr - np.median(corr)))
+        size = 2 * int(self.radius(defocus) / b) + 1
+        peaks = (corr == maximum_filter(corr, size=size)) & (corr > self.threshold * sigma)
+        py, px = np.nonzero(peaks)
+        centers = np.stack([px, py], axis=1) * b + (b - 1) / 2
+        # offset between the centers of the binned template and of the full template
+        centers += (self.crop / b - 1) / 2 * b - (template.shape[0] // 2) * b
+        if not len(centers):
+            return centers.reshape(0, 2)
+
+        size = 2 * int(np.ceil(1.2 * self.radius(defocus))) + 1
+        for _ in range(2):
+            windows, rows, cols = self._windows(image, centers, size)
+            inside = (np.hypot(cols[:, None, :] - centers[:, 0, None, None],
+                               rows[:, :, None] - centers[:, 1, None, None]) <= size // 2)
+            weights = np.clip(windows - background, 0, None) * inside
+            total = np.sum(weights, axis=(1, 2))
+            ok = total > 0
+            centers[ok, 0] = np.einsum('nij,nj->n', weights, cols)[ok] / total[ok]
+            centers[ok, 1] = np.einsum('nij,ni->n', weights, rows)[ok] / total[ok]
+        return centers
+
+    def extract(self, image, defocus=-1.5e-3, field=(0, 0), positions=None, magnitudes=None, magnitudeGap=2.):
+        """
+        Finds donuts and cuts them out of a chip image.
+
+        Parameters
+        ----------
+        image: numpy.ndarray
+            The chip image.
+        defocus: float
+            The detector offset from focus in meters; defaults to -1.5e-3 (intra-focal).
+        field: (float, float)
+            Field position of the chip in degrees; defaults to (0, 0).
+        positions: numpy.ndarray
+            The (M, 2) catalog-predicted x and y pixel positions of the sources, e.g. from
+            aos.focal_plane.FocalPlane.lookup; defaults to None, which keeps every candidate.
+        magnitudes: numpy.ndarray
+            The magnitudes of the catalog sources; defaults to None, in which case every
+            catalog neighbour blends.
+        magnitudeGap: float
+            Only catalog neighbours fainter by less than this blend; defaults to 2.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray, numpy.ndarray
+            The contiguous (N, crop, crop) background subtracted stamps, the (N, 2) x and y
+            pixel positions of their centers, and the index of the matching catalog source
+            (-1 without a catalog).
+        """
+        # integer images are not converted; only the pixels that are used become floats
+        image = np.asarray(image)
+        binned = self._binned(image)
+        # the median of the binned image is a cheap estimate of the background, which is only
+        # subtracted from the pixels that are used rather than from the whole chip
+        background = np.median(binned)
+        centers = self._detect(image, binned - background, background, defocus, field)
+        blendRadius = 2 * self.radius(defocus) if self.blendRadius is None else self.blendRadius
+
+        keep = np.ones(len(centers), dtype=bool)
+        if len(centers) > 1:
+            pairs = cKDTree(centers).query_pairs(blendRadius, output_type='ndarray')
+            keep[pairs.ravel()] = False
+
+        sources = np.full(len(centers), -1)
+        if positions is not None:
+            positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+            matched = np.zeros(len(centers), dtype=bool)
+            if len(positions) and len(centers):
+                tree = cKDTree(centers)
+                dist, nearest = tree.query(positions, distance_upper_bound=blendRadius)
+                found = np.isfinite(dist)
+                offset = np.median(centers[nearest[found]] - positions[found], axis=0) if np.any(found) else 0
+                dist, nearest = tree.query(positions + offset, distance_upper_bound=self.maxShift)
+                isolated = np.ones(len(positions), dtype=bool)
+                if len(positions) > 1:
+                    pairs = cKDTree(positions).query_pairs(blendRadius, output_type='ndarray')
+                    if magnitudes is not None and len(pairs):
+                        mag = np.asarray(magnitudes, dtype=float)
+                        i, j = pairs[:, 0], pairs[:, 1]
+                        isolated[i[mag[j] < mag[i] + magnitudeGap]] = False
+                        isolated[j[mag[i] < mag[j] + magnitudeGap]] = False
+                    else:
+                        isolated[pairs.ravel()] = False
+                for source in np.nonzero(np.isfinite(dist))[0]:
+                    candidate = nearest[source]
+                    if isolated[source] and sources[candidate] < 0:
+                        sources[candidate] = source
+                        matched[candidate] = True
+                    else:
+                        keep[candidate] = False
+            keep &= matched
+
+        # edge-clipped donuts, or stamps that would not fit on the chip
+        margin = max(self.radius(defocus), self.crop / 2)
+        keep &= ((centers[:, 0] >= margin) & (centers[:, 0] <= image.shape[1] - 1 - margin)
+                 & (centers[:, 1] >= margin) & (centers[:, 1] <= image.shape[0] - 1 - margin))
+
+        centers, sources = centers[keep], sources[keep]
+        offsets = np.arange(self.crop) - self.crop // 2
+        rows = np.rint(centers[:, 1]).astype(int)[:, None] + offsets
+        cols = np.rint(centers[:, 0]).astype(int)[:, None] + offsets
+        stamps = image[rows[:, :, None], cols[:, None, :]] - background
+        return stamps, centers, sources
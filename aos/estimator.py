@@ -1,5 +1,5 @@
 import numpy as np
-from galsim.zernike import zernikeBasis, Zernike
+from aos.zernike import gridBasis
 
 
 class WavefrontEstimator:
@@ -47,12 +47,9 @@ class WavefrontEstimator:
             the zernike coeficients (Noll .
         """
         nx = wavefront.shape[0]
-        space = np.linspace(-self.outRadius, self.outRadius, nx)
-        X, Y = np.meshgrid(space, space)
+        basis = gridBasis(nZern, nx, self.outRadius, self.inRadius)
         mask = ~np.isnan(wavefront)
-        basis = zernikeBasis(nZern, X[mask].flatten(), Y[mask].flatten(),
-                             R_inner=self.inRadius, R_outer=self.outRadius)
-        coefs, _, _, _ = np.linalg.lstsq(basis.T, wavefront[mask].flatten())
+        coefs, _, _, _ = np.linalg.lstsq(basis[:, mask].T, wavefront[mask], rcond=None)
         return coefs
 
     def evaluate(self, coefs, nx=255):
@@ -80,8 +77,8 @@ class WavefrontEstimator:
         X, Y = np.meshgrid(space, space)
         R = np.sqrt(X ** 2 + Y ** 2)
         mask = np.logical_and(R <= self.outRadius, R >= self.inRadius)
-        zern = Zernike(coefs, R_inner=self.inRadius, R_outer=self.outRadius)
-        img = zern.evalCartesian(X, Y)
+        basis = gridBasis(len(coefs) - 1, nx, self.outRadius, self.inRadius)
+        img = np.tensordot(coefs, basis, axes=1)
         img[~mask] = np.nan
         return img
 
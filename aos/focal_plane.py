@@ -2,24 +2,42 @@ import os
 import pickle
 import numpy as np
 from aos import dataDir
+from aos.projection import Pointing
 
 class WavefrontSensors:
     """
     Manages boundaries of wavefront sensors.
 
+    Notes
+    -----
+    The corner geometry is read once per process into an (8, 4, 2) array of field angles and
+    shared by all instances. For a pointing, the corners are deprojected to the sky with
+    aos.projection.Pointing (gnomonic, including the rotation) in one vectorized operation;
+    WavefrontSensors.batch does the same for many pointings at once. Chip objects are only built
+    when first accessed.
+
     Parameters
     ----------
     ra: int | float
         Right ascension of telescope pointing; defaults to 0.
     dec: int | float
         Declination of telescope pointing; defaults to 0.
-    
+    rotation: int | float
+        Rotation of the focal plane on the sky in degrees (e.g. rotTelPos); defaults to 0.
+    corners: numpy.ndarray
+        Precomputed (8, 4, 2) corners for this pointing, as made by WavefrontSensors.batch;
+        defaults to None, which computes them.
+
     Attributes
     ----------
     ra: int | float
         Right ascension of telescope pointing.
     dec: int | float
         Declination of telescope pointing.
+    rotation: int | float
+        Rotation of the focal plane on the sky in degrees.
+    corners: numpy.ndarray
+        The (8, 4, 2) ra/dec corners of the chips, in the order of WavefrontSensors.names.
     chips: dict[string] -> aos.focal_plane.Chip
         The 8 wavefront sensor chips (name -> chip).
     intras: list[aos.focal_plane.Chip]
@@ -28,26 +46,122 @@ class WavefrontSensors:
         The 4 extra-focal chips.
     """
     path = os.path.join(dataDir, 'wavefront_sensor_corners.pickle')
+    intraNames = ['R:0,0 S:2,2,A', 'R:0,4 S:2,0,A', 'R:4,0 S:0,2,A', 'R:4,4 S:0,0,A']
+    extraNames = ['R:0,0 S:2,2,B', 'R:0,4 S:2,0,B', 'R:4,0 S:0,2,B', 'R:4,4 S:0,0,B']
+    _geometry = None
 
-    def __init__(self, ra=0, dec=0):
+    def __init__(self, ra=0, dec=0, rotation=0, corners=None):
         self.ra = ra
         self.dec = dec
-        self.chips = dict()
-        with open(WavefrontSensors.path, 'rb') as r:
-            pick = pickle.load(r)
-        for k,v in pick.items():
-            corners = np.rad2deg(np.array([[v['x'][0], v['y'][0]], 
-                                [v['x'][0], v['y'][1]], 
-                                [v['x'][1], v['y'][1]], 
-                                [v['x'][1], v['y'][0]]]))
-            corners[:,0] += ra
-            corners[:,1] += dec
-
-            chip = Chip(k, corners, v['focal'])
-            self.chips[k] = chip
-        
-        self.intras = [self.chips[k] for k in ['R:0,0 S:2,2,A', 'R:0,4 S:2,0,A', 'R:4,0 S:0,2,A', 'R:4,4 S:0,0,A']]
-        self.extras = [self.chips[k] for k in ['R:0,0 S:2,2,B', 'R:0,4 S:2,0,B', 'R:4,0 S:0,2,B', 'R:4,4 S:0,0,B']]
+        self.rotation = rotation
+        if corners is None:
+            corners = WavefrontSensors.transform(ra, dec, rotation)[0]
+        self.corners = corners
+        self._chips = None
+
+    @staticmethod
+    def geometry():
+        """
+        Loads the corner geometry on first use.
+
+        Returns
+        -------
+        list[string], numpy.ndarray, list[string]
+            The chip names, the read-only (8, 4, 2) field angle corners in degrees, and whether
+            each chip is intra or extra-focal.
+        """
+        if WavefrontSensors._geometry is None:
+            with open(WavefrontSensors.path, 'rb') as r:
+                pick = pickle.load(r)
+            names = list(pick)
+            x = np.array([pick[k]['x'] for k in names])
+            y = np.array([pick[k]['y'] for k in names])
+            # corners run (x0, y0), (x0, y1), (x1, y1), (x1, y0)
+            corners = np.rad2deg(np.stack([x[:, [0, 0, 1, 1]], y[:, [0, 1, 1, 0]]], axis=-1))
+            corners.setflags(write=False)
+            WavefrontSensors._geometry = names, corners, [pick[k]['focal'] for k in names]
+        return WavefrontSensors._geometry
+
+    @staticmethod
+    def transform(ra, dec, rotation=0):
+        """
+        Places the chip corners on the sky for one or many pointings.
+
+        Parameters
+        ----------
+        ra: float | numpy.ndarray
+            Right ascensions of the pointings in degrees.
+        dec: float | numpy.ndarray
+            Declinations of the pointings in degrees.
+        rotation: float | numpy.ndarray
+            Rotations of the focal plane in degrees; defaults to 0.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (N, 8, 4, 2) ra/dec corners.
+        """
+        ra, dec, rotation = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in (ra, dec, rotation)])
+        _, corners, _ = WavefrontSensors.geometry()
+        return np.stack(Pointing.deproject(ra[:, None, None], dec[:, None, None], rotation[:, None, None],
+                                           corners[..., 0], corners[..., 1]), axis=-1)
+
+    @staticmethod
+    def batch(ra, dec, rotation=0):
+        """
+        Builds the wavefront sensors of many pointings at once.
+
+        Parameters
+        ----------
+        ra: numpy.ndarray
+            Right ascensions of the pointings in degrees, e.g. Survey().table['fieldRA'].
+        dec: numpy.ndarray
+            Declinations of the pointings in degrees, e.g. Survey().table['fieldDec'].
+        rotation: float | numpy.ndarray
+            Rotations of the focal plane in degrees, e.g. Survey().table['rotTelPos']; defaults
+            to 0.
+
+        Returns
+        -------
+        list[aos.focal_plane.WavefrontSensors]
+            The wavefront sensors of each pointing, sharing one corner array.
+        """
+        corners = WavefrontSensors.transform(ra, dec, rotation)
+        ra, dec, rotation = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in (ra, dec, rotation)])
+        return [WavefrontSensors(*args) for args in zip(ra, dec, rotation, corners)]
+
+    @property
+    def chips(self):
+        """
+        Returns
+        -------
+        dict[string] -> aos.focal_plane.Chip
+            The 8 wavefront sensor chips (name -> chip), built on first access.
+        """
+        if self._chips is None:
+            names, _, focal = WavefrontSensors.geometry()
+            self._chips = {name: Chip(name, self.corners[i], focal[i]) for i, name in enumerate(names)}
+        return self._chips
+
+    @property
+    def intras(self):
+        """
+        Returns
+        -------
+        list[aos.focal_plane.Chip]
+            The 4 intra-focal chips.
+        """
+        return [self.chips[k] for k in WavefrontSensors.intraNames]
+
+    @property
+    def extras(self):
+        """
+        Returns
+        -------
+        list[aos.focal_plane.Chip]
+            The 4 extra-focal chips.
+        """
+        return [self.chips[k] for k in WavefrontSensors.extraNames]
 
 class Chip:
     """
@@ -86,6 +200,41 @@ class Chip:
         self.corners = corners
         self.focal = focal
 
+    def contains(self, ra, dec):
+        """
+        Tests which points fall on this chip.
+
+        Notes
+        -----
+        Uses the crossing number test on the corners, treating ra/dec as flat over the chip and
+        unwrapping ra relative to the first corner.
+
+        Parameters
+        ----------
+        ra: numpy.ndarray
+            Right ascensions of the points in degrees.
+        dec: numpy.ndarray
+            Declinations of the points in degrees.
+
+        Returns
+        -------
+        numpy.ndarray[bool]
+            Whether each point is inside the chip.
+        """
+        ra0 = self.corners[0, 0]
+        x = (np.asarray(ra) - ra0 + 180) % 360 - 180
+        y = np.asarray(dec)
+        cx = (self.corners[:, 0] - ra0 + 180) % 360 - 180
+        cy = self.corners[:, 1]
+        inside = np.zeros(np.shape(x), dtype=bool)
+        for i in range(len(cx)):
+            x1, y1, x2, y2 = cx[i - 1], cy[i - 1], cx[i], cy[i]
+            crosses = (y1 > y) != (y2 > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                xcross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (x < xcross)
+        return inside
+
     def polygon_string(self):
         """
         Returns
@@ -93,4 +242,135 @@ class Chip:
         string
             The ADQL query for the region spanned by this chip.
         """
-        return f"POLYGON('ICRS', {self.corners[0,0]}, {self.corners[0,1]},{self.corners[1,0]}, {self.corners[1,1]},{self.corners[2,0]}, {self.corners[2,1]},{self.corners[3,0]}, {self.corners[3,1]})"
\ No newline at end of file
+        return f"POLYGON('ICRS', {self.corners[0,0]}, {self.corners[0,1]},{self.corners[1,0]}, {self.corners[1,1]},{self.corners[2,0]}, {self.corners[2,1]},{self.corners[3,0]}, {self.corners[3,1]})"
+
+class FocalPlane:
+    """
+    Model of the LSST focal plane: the 189 science sensors and the 8 wavefront sensors.
+
+    Notes
+    -----
+    Chips are axis-aligned rectangles in field angles (degrees, before rotation by the pointing;
+    see aos.projection.Pointing). The 21 science rafts are laid out on a 5 x 5 grid of
+    RAFT_PITCH without the corner rafts, each holding 3 x 3 sensors of SENSOR_PIXELS on
+    SENSOR_PITCH; raft R:i,j and sensor S:a,b increase along x with i, a and along y with j, b.
+    The wavefront sensors come from WavefrontSensors.geometry.
+
+    Lookups go through a uniform grid over the focal plane whose cells list the (at most a few)
+    chips that overlap them, so mapping points to chips is a handful of gathers and comparisons
+    per point with no loop over chips.
+
+    Parameters
+    ----------
+    cellSize: float
+        The size of the lookup grid cells in degrees; defaults to SENSOR_PITCH.
+
+    Attributes
+    ----------
+    names: list[string]
+        The chip names; science sensors first, then wavefront sensors.
+    science: numpy.ndarray[bool]
+        Whether each chip is a science sensor.
+    lower: numpy.ndarray
+        The (N, 2) lower left corners of the chips in degrees.
+    upper: numpy.ndarray
+        The (N, 2) upper right corners of the chips in degrees.
+    centers: numpy.ndarray
+        The (N, 2) centers of the chips in degrees.
+    shape: numpy.ndarray
+        The (N, 2) number of pixels of the chips along x and y.
+    cellSize: float
+        The size of the lookup grid cells in degrees.
+    """
+    PIXEL_SCALE = 0.2 / 3600
+    SENSOR_PIXELS = (4000, 4072)
+    SENSOR_PITCH = 4225 * PIXEL_SCALE
+    RAFT_PITCH = 12700 * PIXEL_SCALE
+
+    def __init__(self, cellSize=SENSOR_PITCH):
+        names, centers = [], []
+        for i in range(5):
+            for j in range(5):
+                if i in (0, 4) and j in (0, 4):
+                    continue
+                for a in range(3):
+                    for b in range(3):
+                        names.append(f'R:{i},{j} S:{a},{b}')
+                        centers.append([(i - 2) * FocalPlane.RAFT_PITCH + (a - 1) * FocalPlane.SENSOR_PITCH,
+                                        (j - 2) * FocalPlane.RAFT_PITCH + (b - 1) * FocalPlane.SENSOR_PITCH])
+        half = np.array(FocalPlane.SENSOR_PIXELS) * FocalPlane.PIXEL_SCALE / 2
+        lower = [np.array(centers) - half]
+        upper = [np.array(centers) + half]
+
+        wfsNames, wfsCorners, _ = WavefrontSensors.geometry()
+        lower.append(np.min(wfsCorners, axis=1))
+        upper.append(np.max(wfsCorners, axis=1))
+
+        self.names = names + list(wfsNames)
+        self.science = np.arange(len(self.names)) < len(names)
+        self.lower = np.vstack(lower)
+        self.upper = np.vstack(upper)
+        self.centers = (self.lower + self.upper) / 2
+        self.shape = np.rint((self.upper - self.lower) / FocalPlane.PIXEL_SCALE).astype(int)
+        self.cellSize = cellSize
+        self._buildIndex()
+
+    def _buildIndex(self):
+        self._origin = np.min(self.lower, axis=0)
+        ncell = np.floor((np.max(self.upper, axis=0) - self._origin) / self.cellSize).astype(int) + 1
+        first = np.floor((self.lower - self._origin) / self.cellSize).astype(int)
+        last = np.floor((self.upper - self._origin) / self.cellSize).astype(int)
+        cells = [[] for _ in range(ncell[0] * ncell[1])]
+        for chip, ((x0, y0), (x1, y1)) in enumerate(zip(first, last)):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells[cy * ncell[0] + cx].append(chip)
+        depth = max(len(cell) for cell in cells)
+        # one spare column of -1 for points outside the grid
+        index = np.full((len(cells) + 1, depth), -1, dtype=np.int32)
+        for i, cell in enumerate(cells):
+            index[i, :len(cell)] = cell
+        # per cell chip bounds (x0, y0, x1, y1); empty slots never match
+        bounds = np.hstack([self.lower, self.upper])[index]
+        bounds[index < 0] = [np.inf, np.inf, -np.inf, -np.inf]
+        self._ncell = ncell
+        self._index = index
+        self._bounds = bounds
+
+    def lookup(self, fieldx, fieldy):
+        """
+        Maps field positions to chips and pixel coordinates.
+
+        Parameters
+        ----------
+        fieldx: numpy.ndarray
+            The x field angles in degrees.
+        fieldy: numpy.ndarray
+            The y field angles in degrees.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray, numpy.ndarray
+            The index into names of the chip holding each point (-1 if none) and the pixel
+            coordinates of the point on it along x and y (NaN if none), measured from the lower
+            left corner of the chip.
+        """
+        fieldx = np.asarray(fieldx, dtype=float)
+        fieldy = np.asarray(fieldy, dtype=float)
+        with np.errstate(invalid='ignore'):
+            cx = np.floor((fieldx - self._origin[0]) / self.cellSize)
+            cy = np.floor((fieldy - self._origin[1]) / self.cellSize)
+            outside = ~((cx >= 0) & (cx < self._ncell[0]) & (cy >= 0) & (cy < self._ncell[1]))
+        cell = np.where(outside, len(self._index) - 1, cy * self._ncell[0] + cx).astype(np.intp)
+
+        chip = np.full(fieldx.shape, -1, dtype=np.intp)
+        # reversed so that the first matching candidate wins
+        for depth in range(self._index.shape[1] - 1, -1, -1):
+            x0, y0, x1, y1 = np.moveaxis(self._bounds[cell, depth], -1, 0)
+            hit = (fieldx >= x0) & (fieldx < x1) & (fieldy >= y0) & (fieldy < y1)
+            chip[hit] = self._index[cell[hit], depth]
+
+        found = chip >= 0
+        px = np.where(found, (fieldx - self.lower[chip, 0]) / FocalPlane.PIXEL_SCALE, np.nan)
+        py = np.where(found, (fieldy - self.lower[chip, 1]) / FocalPlane.PIXEL_SCALE, np.nan)
+        return chip, px, py
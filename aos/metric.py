@@ -1,12 +1,19 @@
 import numpy as np
 from abc import ABC, abstractmethod
-from aos.state import State
+from aos.state import State, StateArray
+from aos.solver import SensitivitySolver
 
 
 class Metric(ABC):
     """
-    A class to represent a metric of the optical state.
-    Eventually will have non-trivial image quality metrics ...
+    A class to represent a metric of the optical state, to be minimized by the controllers.
+
+    Notes
+    -----
+    Subclasses implement evaluate. They may override gradient and hessian with analytic
+    derivatives, and quadraticForm if the metric is exactly x^T Q x + b^T x + c, so that
+    controllers can skip numerical optimization. SumOfSquares penalizes the raw state and
+    StrehlLoss the wavefront error over the field.
     """
     @abstractmethod
     def evaluate(self, x):
@@ -17,9 +24,76 @@ class Metric(ABC):
         ----------
         x : aos.state.State | numpy.ndarray[float]
             Optical state.
+
+        Returns
+        -------
+        float
+            The metric; lower is better.
         """
         pass
 
+    def gradient(self, x):
+        """
+        Evaluates the gradient of the metric at state x.
+
+        Parameters
+        ----------
+        x : aos.state.State | numpy.ndarray[float]
+            Optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The gradient.
+        """
+        raise NotImplementedError()
+
+    def hessian(self, x):
+        """
+        Evaluates the hessian of the metric at state x.
+
+        Parameters
+        ----------
+        x : aos.state.State | numpy.ndarray[float]
+            Optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The hessian.
+        """
+        raise NotImplementedError()
+
+    def quadraticForm(self, length):
+        """
+        Declares the metric as the quadratic form x^T Q x + b^T x + c, if it is one.
+
+        Parameters
+        ----------
+        length: int
+            The number of degrees of freedom in the optical state.
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray, float) | None
+            Q, b and c; None if the metric is not quadratic.
+        """
+        return None
+
+    @property
+    def hasGradient(self):
+        """
+        Whether the metric provides an analytic gradient.
+        """
+        return type(self).gradient is not Metric.gradient
+
+    @property
+    def hasHessian(self):
+        """
+        Whether the metric provides an analytic hessian.
+        """
+        return type(self).hessian is not Metric.hessian
+
 
 class SumOfSquares(Metric):
     """
@@ -43,3 +117,190 @@ class SumOfSquares(Metric):
         if isinstance(x, State):
             x = x.array
         return np.sum(x ** 2)
+
+    def gradient(self, x):
+        """
+        Computes the gradient of the sum of squares at state x.
+
+        Parameters
+        ----------
+        x : aos.state.State | numpy.ndarray[float]
+            Optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The gradient, 2x.
+        """
+        if isinstance(x, State):
+            x = x.array
+        return 2 * x
+
+    def hessian(self, x):
+        """
+        Computes the hessian of the sum of squares at state x.
+
+        Parameters
+        ----------
+        x : aos.state.State | numpy.ndarray[float]
+            Optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The hessian, 2I.
+        """
+        if isinstance(x, State):
+            x = x.array
+        return 2 * np.eye(len(x))
+
+    def quadraticForm(self, length):
+        """
+        Parameters
+        ----------
+        length: int
+            The number of degrees of freedom in the optical state.
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray, float)
+            Q = I, b = 0 and c = 0.
+        """
+        return np.eye(length), np.zeros(length), 0
+
+
+class StrehlLoss(Metric):
+    """
+    Loss of Strehl ratio (1 - S) in the Marechal approximation, averaged over the field.
+
+    Notes
+    -----
+    For small aberrations the Strehl ratio is S = exp(-(2 pi / wavelength)^2 sigma^2), so that
+
+        1 - S ~ alpha * sigma^2,  sigma^2 = sum_{j >= 4} (y0 + A x)_j^2
+
+    where sigma^2 is the wavefront variance over Noll-normalized zernike coefficients,
+    excluding piston and tip/tilt, which do not change the PSF shape, and alpha = (2 pi /
+    wavelength)^2. This is not the atmosphere-normalized PSSN; it is a diffraction-limited
+    proxy for it, which overstates the loss of a seeing-limited PSF.
+
+    Averaging over the field positions with the sensitivity models of SensitivitySolver makes
+    the metric the quadratic form x^T Q x + b^T x + c, which is built once, so that each
+    evaluation is a few small matrix products. evaluate also accepts (N, nDof) arrays.
+
+    Parameters
+    ----------
+    fields: list[(float, float)]
+        Field positions in degrees; defaults to the grid nodes if a grid is given, otherwise
+        the field center.
+    weights: numpy.ndarray
+        Relative weights of the field positions; defaults to uniform.
+    grid: aos.solver.SensitivityGrid
+        The tabulated sensitivity matrices; defaults to data/sensitivity_grid_20dof.npy if present.
+    wavelength: float
+        The wavelength of light in meters; defaults to 500e-9.
+    alpha: float
+        The coefficient relating wavefront variance to 1 - S; defaults to (2 pi / wavelength)^2.
+
+    Attributes
+    ----------
+    Q: numpy.ndarray
+        The quadratic coefficients.
+    b: numpy.ndarray
+        The linear coefficients.
+    c: float
+        The constant, the metric of the nominal telescope.
+    """
+    def __init__(self, fields=None, weights=None, grid=None, wavelength=500e-9, alpha=None):
+        solver = SensitivitySolver(grid=grid)
+        if fields is None:
+            if solver.grid is None:
+                fields = [(0, 0)]
+            else:
+                fields = [(fx, fy) for fy in solver.grid.fieldy for fx in solver.grid.fieldx]
+        if weights is None:
+            weights = np.ones(len(fields))
+        if alpha is None:
+            alpha = (2 * np.pi / wavelength) ** 2
+        weights = alpha * np.asarray(weights, dtype=float) / np.sum(weights)
+
+        nDof = solver.A.shape[1]
+        self.Q = np.zeros((nDof, nDof))
+        self.b = np.zeros(nDof)
+        self.c = 0.
+        for field, weight in zip(fields, weights):
+            A, _, y0 = solver.model(field)
+            # rows are Noll j = 1, 2, ...; drop piston and tip/tilt
+            A, y0 = A[3:], y0[3:]
+            self.Q += weight * np.dot(A.T, A)
+            self.b += 2 * weight * np.dot(A.T, y0)
+            self.c += weight * np.dot(y0, y0)
+
+    def evaluate(self, x):
+        """
+        Computes the approximate 1 - S of state x.
+
+        Parameters
+        ----------
+        x : aos.state.State | aos.state.StateArray | numpy.ndarray[float]
+            Optical state, or an (N, nDof) array of states.
+
+        Returns
+        -------
+        float | numpy.ndarray
+            1 - S, for each state if x is 2D.
+        """
+        if isinstance(x, (State, StateArray)):
+            x = x.array
+        return np.sum(np.dot(x, self.Q) * x, axis=-1) + np.dot(x, self.b) + self.c
+
+    def gradient(self, x):
+        """
+        Parameters
+        ----------
+        x : aos.state.State | numpy.ndarray[float]
+            Optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The gradient, 2Qx + b.
+        """
+        if isinstance(x, State):
+            x = x.array
+        return 2 * np.dot(x, self.Q) + self.b
+
+    def hessian(self, x):
+        """
+        Parameters
+        ----------
+        x : aos.state.State | numpy.ndarray[float]
+            Optical state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The hessian, 2Q.
+        """
+        return 2 * self.Q
+
+    def quadraticForm(self, length):
+        """
+        Parameters
+        ----------
+        length: int
+            The number of degrees of freedom in the optical state.
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray, float)
+            Q, b and c.
+
+        Raises
+        ------
+        ValueError
+            If length does not match the sensitivity matrices.
+        """
+        if length != len(self.b):
+            raise ValueError('length must be {}'.format(len(self.b)))
+        return self.Q, self.b, self.c
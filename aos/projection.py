@@ -0,0 +1,134 @@
+import numpy as np
+
+
+class Pointing:
+    """
+    Gnomonic projection between sky coordinates and field angles for a telescope pointing.
+
+    Notes
+    -----
+    Field angles are tangent plane coordinates in degrees, matching the fieldx/fieldy arguments
+    of aos.simulator. The tangent plane is rotated by the rotation angle, measured from north
+    through east; before rotation, fieldx points east and fieldy points north. All methods
+    accept arrays and are a single vectorized pass.
+
+    Parameters
+    ----------
+    ra: float
+        Right ascension of the pointing in degrees.
+    dec: float
+        Declination of the pointing in degrees.
+    rotation: float
+        Rotation of the focal plane on the sky in degrees; defaults to 0.
+
+    Attributes
+    ----------
+    ra: float
+        Right ascension of the pointing in degrees.
+    dec: float
+        Declination of the pointing in degrees.
+    rotation: float
+        Rotation of the focal plane on the sky in degrees.
+    """
+    def __init__(self, ra, dec, rotation=0):
+        self.ra = float(ra)
+        self.dec = float(dec)
+        self.rotation = float(rotation)
+        self._sin0, self._cos0 = np.sin(np.deg2rad(self.dec)), np.cos(np.deg2rad(self.dec))
+        self._sinr, self._cosr = np.sin(np.deg2rad(self.rotation)), np.cos(np.deg2rad(self.rotation))
+
+    @property
+    def key(self):
+        """
+        Returns
+        -------
+        (float, float, float)
+            Hashable identifier of the pointing.
+        """
+        return self.ra, self.dec, self.rotation
+
+    def toField(self, ra, dec):
+        """
+        Projects sky coordinates to field angles.
+
+        Parameters
+        ----------
+        ra: float | numpy.ndarray
+            Right ascensions in degrees.
+        dec: float | numpy.ndarray
+            Declinations in degrees.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The x and y field angles in degrees; NaN for points more than 90 degrees away.
+        """
+        dra = np.deg2rad(np.asarray(ra, dtype=float) - self.ra)
+        dec = np.deg2rad(np.asarray(dec, dtype=float))
+        sind, cosd = np.sin(dec), np.cos(dec)
+        cosdra = np.cos(dra)
+        cosc = self._sin0 * sind + self._cos0 * cosd * cosdra
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xi = np.where(cosc > 0, cosd * np.sin(dra) / cosc, np.nan)
+            eta = np.where(cosc > 0, (self._cos0 * sind - self._sin0 * cosd * cosdra) / cosc, np.nan)
+        fieldx = xi * self._cosr + eta * self._sinr
+        fieldy = -xi * self._sinr + eta * self._cosr
+        return np.rad2deg(fieldx), np.rad2deg(fieldy)
+
+    def toSky(self, fieldx, fieldy):
+        """
+        Deprojects field angles to sky coordinates.
+
+        Parameters
+        ----------
+        fieldx: float | numpy.ndarray
+            The x field angles in degrees.
+        fieldy: float | numpy.ndarray
+            The y field angles in degrees.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            Right ascensions in [0, 360) and declinations, in degrees.
+        """
+        return Pointing.deproject(self.ra, self.dec, self.rotation, fieldx, fieldy)
+
+    @staticmethod
+    def deproject(ra, dec, rotation, fieldx, fieldy):
+        """
+        Deprojects field angles to sky coordinates for one or many pointings.
+
+        Notes
+        -----
+        Same as Pointing(ra, dec, rotation).toSky(fieldx, fieldy), with all arguments
+        broadcast against each other, so many pointings are deprojected in one pass.
+
+        Parameters
+        ----------
+        ra: float | numpy.ndarray
+            Right ascensions of the pointings in degrees.
+        dec: float | numpy.ndarray
+            Declinations of the pointings in degrees.
+        rotation: float | numpy.ndarray
+            Rotations of the focal plane on the sky in degrees.
+        fieldx: float | numpy.ndarray
+            The x field angles in degrees.
+        fieldy: float | numpy.ndarray
+            The y field angles in degrees.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            Right ascensions in [0, 360) and declinations, in degrees.
+        """
+        dec0, rot = np.deg2rad(dec), np.deg2rad(rotation)
+        sin0, cos0 = np.sin(dec0), np.cos(dec0)
+        sinr, cosr = np.sin(rot), np.cos(rot)
+        fx = np.deg2rad(np.asarray(fieldx, dtype=float))
+        fy = np.deg2rad(np.asarray(fieldy, dtype=float))
+        xi = fx * cosr - fy * sinr
+        eta = fx * sinr + fy * cosr
+        denom = cos0 - eta * sin0
+        ra = ra + np.rad2deg(np.arctan2(xi, denom))
+        dec = np.rad2deg(np.arctan2(sin0 + eta * cos0, np.hypot(xi, denom)))
+        return ra % 360, dec
@@ -1,5 +1,6 @@
 import os
 import numpy as np
+from functools import lru_cache
 from aos import dataDir
 from aos.constant import h,c,k,b
 
@@ -17,13 +18,41 @@ class Bandpass:
         The lowest wavelength (in m).
     high: int
         The highest wavelength (in m).
+
+    Notes
+    -----
+    The LSST bands are loaded lazily, once per process, through Bandpass.band and shared by
+    all callers; their arrays are read-only.
     """
+    _registry = dict()
+
     def __init__(self, wavelengths, bandpass):
         self.wavelengths = wavelengths.astype('int') * 1e-9
         self.bandpass = bandpass
         self.low = np.min(self.wavelengths)
         self.high = np.max(self.wavelengths)
 
+    @staticmethod
+    def band(name):
+        """
+        Parameters
+        ----------
+        name: str
+            The LSST filter (u, g, r, i, z or y).
+
+        Returns
+        -------
+        Bandpass
+            The shared bandpass function, loaded on first use.
+        """
+        if name not in Bandpass._registry:
+            data = np.load(os.path.join(dataDir, f'total_{name}.npy'))
+            bandpass = Bandpass(data[:,0], data[:,1])
+            bandpass.wavelengths.setflags(write=False)
+            bandpass.bandpass.setflags(write=False)
+            Bandpass._registry[name] = bandpass
+        return Bandpass._registry[name]
+
     @staticmethod
     def u():
         """
@@ -32,8 +61,7 @@ class Bandpass:
         Bandpass
             The LSST u-band bandpass function.
         """
-        data = np.load(os.path.join(dataDir, 'total_u.npy'))
-        return Bandpass(data[:,0], data[:,1])
+        return Bandpass.band('u')
 
     @staticmethod
     def g():
@@ -43,8 +71,7 @@ class Bandpass:
         Bandpass
             The LSST g-band bandpass function.
         """
-        data = np.load(os.path.join(dataDir, 'total_g.npy'))
-        return Bandpass(data[:,0], data[:,1])
+        return Bandpass.band('g')
 
     @staticmethod
     def r():
@@ -54,8 +81,7 @@ class Bandpass:
         Bandpass
             The LSST r-band bandpass function.
         """
-        data = np.load(os.path.join(dataDir, 'total_r.npy'))
-        return Bandpass(data[:,0], data[:,1])
+        return Bandpass.band('r')
     
     @staticmethod
     def i():
@@ -65,8 +91,7 @@ class Bandpass:
         Bandpass
             The LSST i-band bandpass function.
         """
-        data = np.load(os.path.join(dataDir, 'total_i.npy'))
-        return Bandpass(data[:,0], data[:,1])
+        return Bandpass.band('i')
 
     @staticmethod
     def z():
@@ -76,8 +101,7 @@ class Bandpass:
         Bandpass
             The LSST z-band bandpass function.
         """
-        data = np.load(os.path.join(dataDir, 'total_z.npy'))
-        return Bandpass(data[:,0], data[:,1])
+        return Bandpass.band('z')
 
     @staticmethod
     def y():
@@ -87,8 +111,7 @@ class Bandpass:
         Bandpass
             The LSST y-band bandpass function.
         """
-        data = np.load(os.path.join(dataDir, 'total_y.npy'))
-        return Bandpass(data[:,0], data[:,1])
+        return Bandpass.band('y')
 
 class SED:
     """
@@ -153,15 +176,17 @@ class Blackbody(SED):
     wavelength: float
         The central wavelength of the blackbody spectrum.
     bandpass: Bandpass
-        The throughput of the system (atmosphere, optics, detector).
+        The throughput of the system (atmosphere, optics, detector); defaults to Bandpass.g().
 
     TODO: add attributes.
     """
 
-    def __init__(self, temperature=None, wavelength=500e-9, bandpass=Bandpass.g()):
+    def __init__(self, temperature=None, wavelength=500e-9, bandpass=None):
         super().__init__()
         if temperature is not None:
             wavelength = b / temperature
+        if bandpass is None:
+            bandpass = Bandpass.g()
         self.bandpass = bandpass
         self.wavelength = wavelength
         T = b / wavelength
@@ -195,4 +220,224 @@ class Blackbody(SED):
         """
         size = int(nphot * self.bp_factor)
         ind = np.searchsorted(self.bp_cdf, np.random.uniform(0, 1, size=size))
-        return self.wavelengths[[ind]]
\ No newline at end of file
+        return self.wavelengths[[ind]]
+
+
+def _aliasTable(p):
+    """
+    Builds Walker/Vose alias table for discrete distribution p.
+    """
+    n = len(p)
+    scaled = p * n
+    prob = np.ones(n)
+    alias = np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1 - scaled[s]
+        if scaled[l] < 1:
+            small.append(l)
+        else:
+            large.append(l)
+    return prob, alias
+
+
+@lru_cache(maxsize=8)
+def _blackbodyTables(band, tMin, tMax, nTemp):
+    """
+    Alias tables of blackbody spectra times bandpass on a log temperature grid.
+    """
+    bandpass = Bandpass.band(band)
+    wavelengths = bandpass.wavelengths
+    temperatures = np.geomspace(tMin, tMax, nTemp)
+    with np.errstate(over='ignore'):
+        spec = wavelengths ** -5 / np.expm1(h * c / (wavelengths * k * temperatures[:, None]))
+    spec /= np.sum(spec, axis=1, keepdims=True)
+    bp_spec = spec * bandpass.bandpass
+    bp_factor = np.sum(bp_spec, axis=1)
+    prob = np.zeros(bp_spec.shape)
+    alias = np.zeros(bp_spec.shape, dtype=int)
+    for i, row in enumerate(bp_spec / bp_factor[:, None]):
+        prob[i], alias[i] = _aliasTable(row)
+    for arr in (temperatures, bp_factor, prob, alias):
+        arr.setflags(write=False)
+    return temperatures, bp_factor, prob, alias
+
+
+class BlackbodySampler:
+    """
+    Samples photon wavelengths for many blackbody stars at once.
+
+    Notes
+    -----
+    Each star's temperature is snapped to the nearest node of a logarithmic temperature grid,
+    for which alias tables of the blackbody spectrum times the bandpass are precomputed;
+    temperatures outside of the grid are rejected rather than clipped. The tables of the most
+    recently used (band, grid) combinations are kept in an LRU cache. Every photon of every star
+    is then drawn with a handful of vectorized gathers and no loop over stars. Photons are drawn
+    chunkSize at a time, so that the temporary arrays stay bounded and only the returned
+    wavelengths grow with the number of photons.
+
+    Parameters
+    ----------
+    band: str
+        The LSST filter; defaults to 'g'.
+    tMin: float
+        The lowest grid temperature in K; defaults to 2000.
+    tMax: float
+        The highest grid temperature in K; defaults to 50000.
+    nTemp: int
+        The number of grid temperatures; defaults to 512.
+    chunkSize: int
+        The number of photons drawn at a time; defaults to 2 ** 20.
+
+    Attributes
+    ----------
+    bandpass: Bandpass
+        The throughput of the system (atmosphere, optics, detector).
+    temperatures: numpy.ndarray
+        The temperature grid.
+    chunkSize: int
+        The number of photons drawn at a time.
+    """
+    def __init__(self, band='g', tMin=2000., tMax=50000., nTemp=512, chunkSize=2 ** 20):
+        self.bandpass = Bandpass.band(band)
+        self.chunkSize = int(chunkSize)
+        self.temperatures, self._factor, self._prob, self._alias = \
+            _blackbodyTables(band, float(tMin), float(tMax), int(nTemp))
+
+    def sample(self, temperatures, nphot):
+        """
+        Parameters
+        ----------
+        temperatures: numpy.ndarray
+            The temperature of each star in K.
+        nphot: numpy.ndarray | int | float
+            The number of photons of each star before the bandpass, as in Blackbody.sample.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The flat array of sampled wavelengths and the N + 1 offsets such that the
+            wavelengths of star i are wavelengths[offsets[i]:offsets[i + 1]].
+
+        Raises
+        ------
+        ValueError
+            If a temperature is not finite or is outside of the temperature grid.
+        """
+        temperatures = np.asarray(temperatures, dtype=float)
+        if not np.all(np.isfinite(temperatures)):
+            raise ValueError('temperatures must be finite.')
+        elif np.any((temperatures < self.temperatures[0]) | (temperatures > self.temperatures[-1])):
+            raise ValueError('temperatures must be within the grid: [{}, {}]'
+                             .format(self.temperatures[0], self.temperatures[-1]))
+        logt = np.log(self.temperatures)
+        step = logt[1] - logt[0]
+        rows = np.rint((np.log(temperatures) - logt[0]) / step).astype(int)
+
+        counts = (np.broadcast_to(nphot, rows.shape) * self._factor[rows]).astype(int)
+        offsets = np.zeros(len(rows) + 1, dtype=int)
+        np.cumsum(counts, out=offsets[1:])
+
+        out = np.empty(offsets[-1])
+        for start in range(0, offsets[-1], self.chunkSize):
+            stop = min(start + self.chunkSize, offsets[-1])
+            # the stars with photons in [start, stop), and how many of them
+            first = np.searchsorted(offsets, start, side='right') - 1
+            last = np.searchsorted(offsets, stop, side='left')
+            inChunk = np.minimum(offsets[first + 1:last + 1], stop) - np.maximum(offsets[first:last], start)
+            chunkRows = np.repeat(rows[first:last], inChunk)
+            cols = np.random.randint(0, self._prob.shape[1], size=len(chunkRows))
+            keep = np.random.uniform(0, 1, size=len(chunkRows)) < self._prob[chunkRows, cols]
+            out[start:stop] = self.bandpass.wavelengths[np.where(keep, cols, self._alias[chunkRows, cols])]
+        return out, offsets
+
+
+def _gaussQuadrature(x, w, order):
+    """
+    Gauss quadrature nodes and weights for the discrete measure sum_i w_i delta(x - x_i).
+
+    Notes
+    -----
+    The three-term recurrence is found with the discretized Stieltjes procedure on x mapped to
+    [-1, 1], and the nodes and weights follow from the eigendecomposition of the Jacobi matrix
+    (Golub & Welsch 1969).
+    """
+    center, scale = (x[-1] + x[0]) / 2, (x[-1] - x[0]) / 2
+    t = (x - center) / scale
+    w = w / np.sum(w)
+    alpha = np.zeros(order)
+    beta = np.zeros(order)
+    prev, poly = np.zeros_like(t), np.ones_like(t)
+    for i in range(order):
+        alpha[i] = np.sum(w * t * poly ** 2)
+        poly, prev = (t - alpha[i]) * poly - beta[i] * prev, poly
+        if i + 1 < order:
+            beta[i + 1] = np.sqrt(np.sum(w * poly ** 2))
+            poly /= beta[i + 1]
+    jacobi = np.diag(alpha) + np.diag(beta[1:], 1) + np.diag(beta[1:], -1)
+    nodes, vectors = np.linalg.eigh(jacobi)
+    return center + scale * nodes, vectors[0] ** 2
+
+
+@lru_cache(maxsize=256)
+def _quadrature(band, temperature, order):
+    bandpass = Bandpass.band(band)
+    if temperature is None:
+        weights = bandpass.bandpass
+    else:
+        weights = Blackbody(temperature=temperature, bandpass=bandpass).bp_spec
+    nodes, weights = _gaussQuadrature(bandpass.wavelengths, weights, order)
+    nodes.setflags(write=False)
+    weights.setflags(write=False)
+    return nodes, weights
+
+
+def quadrature(band='g', temperature=None, order=4, nTemp=64, tMin=2000., tMax=50000.):
+    """
+    Computes quadrature wavelengths and weights for integrating over a bandpass and SED.
+
+    Notes
+    -----
+    The nodes and weights are those of the Gauss quadrature rule for the measure blackbody
+    spectrum times bandpass throughput, so order nodes integrate polynomials in wavelength of
+    degree up to 2 * order - 1 exactly. Temperatures are snapped to the nearest of nTemp bins
+    spaced logarithmically in [tMin, tMax], and the rule is cached per (band, temperature bin,
+    order); the returned arrays are read-only.
+
+    Parameters
+    ----------
+    band: str
+        The LSST filter; defaults to 'g'.
+    temperature: float
+        The blackbody temperature in K; defaults to None, which weights by the bandpass alone.
+    order: int
+        The number of quadrature wavelengths; defaults to 4.
+    nTemp: int
+        The number of temperature bins; defaults to 64.
+    tMin: float
+        The lowest temperature bin in K; defaults to 2000.
+    tMax: float
+        The highest temperature bin in K; defaults to 50000.
+
+    Returns
+    -------
+    numpy.ndarray, numpy.ndarray
+        The quadrature wavelengths in m and their weights, which sum to one.
+
+    Raises
+    ------
+    ValueError
+        If order is not positive.
+    """
+    if order < 1:
+        raise ValueError('order must be positive.')
+    if temperature is not None:
+        temperatures = np.geomspace(tMin, tMax, nTemp)
+        index = np.argmin(np.abs(np.log(temperatures) - np.log(temperature)))
+        temperature = float(temperatures[index])
+    return _quadrature(band, temperature, int(order))
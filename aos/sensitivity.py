@@ -0,0 +1,256 @@
+import os
+import json
+import batoid
+import hashlib
+import numpy as np
+from aos import dataDir
+from concurrent.futures import ProcessPoolExecutor
+from aos.estimator import WavefrontEstimator
+from aos.mirror import M1M3Residual, M2Residual
+from aos.simulator import WavefrontSimulator
+from aos.solver import SensitivityGrid
+from aos.state import BendingState
+from aos.telescope import Telescope, BendingTelescope
+
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _trace(band, nModes, delta, field, wavelength, nx, nZern):
+    """
+    Simulates and fits the wavefront of a perturbed telescope.
+
+    Notes
+    -----
+    Module level so that it can be pickled and sent to worker processes. A fresh telescope is
+    built for every trace because surface residuals accumulate.
+    """
+    optic = Telescope.nominal(band=band).optic
+    telescope = BendingTelescope(optic, M1M3Residual(nModes=nModes), M2Residual(nModes=nModes))
+    telescope.update(BendingState(np.array(delta)))
+    wavefront = WavefrontSimulator(wavelength=wavelength, nx=nx).simulateWavefront(telescope.optic, *field)
+    return WavefrontEstimator().estimate(wavefront, nZern=nZern)[1:]
+
+
+class SensitivityBuilder:
+    """
+    Builds sensitivity matrices by central finite differences of BendingState degrees of freedom.
+
+    Notes
+    -----
+    Each field position requires 2 * len(dofs) + 1 ray traces, which are spread over a process
+    pool. Results are cached on disk under a hash of everything that determines them: the batoid
+    optic configuration, the mirror bending mode files, band, field, nModes, step, dofs,
+    wavelength, nx and nZern.
+
+    STEPS holds the default step of each BendingState degree of freedom, from
+    notebooks/ConstructingTheSensitivityMatrix.ipynb: 500 microns for hexapod shifts (100 in z),
+    60 arcseconds for camera and 40 for M2 rotations, and 500 nm for M1M3 and 200 nm for M2
+    bending modes.
+
+    Parameters
+    ----------
+    band: str
+        The LSST filter; defaults to 'g'.
+    nModes: int
+        The number of bending modes per mirror; defaults to 5.
+    step: float | numpy.ndarray
+        The finite difference step in meters or radians, for all dofs or one per dof; defaults
+        to STEPS.
+    dofs: list[str]
+        The BendingState degrees of freedom to perturb; defaults to all of them.
+    wavelength: float
+        The wavelength of light to simulate; defaults to 500e-9.
+    nx: int
+        The wavefront grid size; defaults to 255.
+    nZern: int
+        The number of zernike coefficients to fit; defaults to 22.
+    processes: int
+        The number of worker processes; defaults to the number of cpus. 1 runs in process.
+    cacheDir: string
+        The directory to cache results in; defaults to data/cache.
+
+    Attributes
+    ----------
+    band: str
+        The LSST filter.
+    nModes: int
+        The number of bending modes per mirror.
+    step: numpy.ndarray
+        The finite difference step of each dof in meters or radians.
+    dofs: list[str]
+        The BendingState degrees of freedom to perturb.
+    wavelength: float
+        The wavelength of light to simulate.
+    nx: int
+        The wavefront grid size.
+    nZern: int
+        The number of zernike coefficients to fit.
+    processes: int | None
+        The number of worker processes.
+    cacheDir: string
+        The directory to cache results in.
+
+    Raises
+    ------
+    ValueError
+        If nModes does not match BendingState, a dof is not a BendingState degree of freedom, or
+        the steps are not one positive value per dof.
+    """
+    arcsecond = np.pi / 180 / 3600
+    STEPS = np.array([500e-6, 500e-6, 100e-6, 60 * arcsecond, 60 * arcsecond,
+                      500e-6, 500e-6, 100e-6, 40 * arcsecond, 40 * arcsecond]
+                     + [500e-9] * 5 + [200e-9] * 5)
+    STEPS.setflags(write=False)
+
+    def __init__(self, band='g', nModes=5, step=None, dofs=None, wavelength=500e-9, nx=255,
+                 nZern=22, processes=None, cacheDir=os.path.join(dataDir, 'cache')):
+        stateMap = BendingState().stateMap
+        if 10 + 2 * nModes != BendingState.LENGTH:
+            raise ValueError('nModes must match BendingState: {}'.format((BendingState.LENGTH - 10) // 2))
+        if dofs is None:
+            dofs = sorted(stateMap, key=stateMap.get)
+        elif not set(dofs) <= set(stateMap):
+            raise ValueError('dofs must be BendingState degrees of freedom.')
+        if step is None:
+            step = SensitivityBuilder.STEPS[[stateMap[dof] for dof in dofs]]
+        step = np.asarray(step, dtype=float)
+        if step.ndim == 0:
+            step = np.full(len(dofs), step)
+        if step.shape != (len(dofs),) or np.any(step <= 0):
+            raise ValueError('step must be positive, for all dofs or one per dof.')
+
+        self.band = band
+        self.nModes = nModes
+        self.step = step
+        self.dofs = list(dofs)
+        self.wavelength = wavelength
+        self.nx = nx
+        self.nZern = nZern
+        self.processes = processes
+        self.cacheDir = cacheDir
+
+    def key(self, field):
+        """
+        Computes the cache key for a field position.
+
+        Parameters
+        ----------
+        field: (float, float)
+            Field position in degrees.
+
+        Returns
+        -------
+        string
+            The hex digest identifying the sensitivity matrix.
+        """
+        with open(os.path.join(batoid.datadir, 'LSST', 'LSST_{}.yaml'.format(self.band))) as f:
+            config = f.read()
+        modes = {name: _digest(os.path.join(dataDir, name)) for name in
+                 ['M1M3_bending_modes.npy', 'M1M3_grid_x.npy', 'M1M3_grid_y.npy',
+                  'M2_bending_modes.npy', 'M2_grid_x.npy', 'M2_grid_y.npy']}
+        description = json.dumps({
+            'config': config,
+            'modes': modes,
+            'band': self.band,
+            'field': [float(field[0]), float(field[1])],
+            'nModes': self.nModes,
+            'step': self.step.tolist(),
+            'dofs': self.dofs,
+            'wavelength': self.wavelength,
+            'nx': self.nx,
+            'nZern': self.nZern,
+        }, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, field):
+        return os.path.join(self.cacheDir, 'sensitivity_{}.npz'.format(self.key(field)))
+
+    def _jobs(self, field):
+        stateMap = BendingState().stateMap
+        jobs = [np.zeros(BendingState.LENGTH)]
+        for dof, step in zip(self.dofs, self.step):
+            for sign in [1, -1]:
+                delta = np.zeros(BendingState.LENGTH)
+                delta[stateMap[dof]] = sign * step
+                jobs.append(delta)
+        return [(self.band, self.nModes, tuple(delta), tuple(field), self.wavelength, self.nx, self.nZern)
+                for delta in jobs]
+
+    def _assemble(self, results):
+        y0 = results[0]
+        plus = np.array(results[1::2])
+        minus = np.array(results[2::2])
+        A = ((plus - minus) / (2 * self.step[:, None])).T
+        return A, y0
+
+    def _tabulate(self, fieldx, fieldy):
+        fields = [(fx, fy) for fy in fieldy for fx in fieldx]
+        missing = [field for field in fields if not os.path.exists(self._path(field))]
+        jobs = [job for field in missing for job in self._jobs(field)]
+
+        if self.processes == 1:
+            results = [_trace(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                results = list(pool.map(_trace, *zip(*jobs))) if jobs else []
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+        n = 2 * len(self.dofs) + 1
+        for i, field in enumerate(missing):
+            A, y0 = self._assemble(results[i * n:(i + 1) * n])
+            np.savez(self._path(field), A=A, y0=y0)
+
+        A = np.zeros((len(fieldy), len(fieldx), self.nZern, len(self.dofs)))
+        y0 = np.zeros((len(fieldy), len(fieldx), self.nZern))
+        for j, fy in enumerate(fieldy):
+            for i, fx in enumerate(fieldx):
+                with np.load(self._path((fx, fy))) as data:
+                    A[j, i] = data['A']
+                    y0[j, i] = data['y0']
+        return A, y0
+
+    def buildGrid(self, fieldx, fieldy):
+        """
+        Builds (or loads from cache) sensitivity matrices on a field grid.
+
+        Parameters
+        ----------
+        fieldx: numpy.ndarray
+            The increasing x field positions of the grid in degrees; at least 2.
+        fieldy: numpy.ndarray
+            The increasing y field positions of the grid in degrees; at least 2.
+
+        Returns
+        -------
+        aos.solver.SensitivityGrid
+            The sensitivity matrices and nominal wavefronts on the grid.
+
+        Raises
+        ------
+        ValueError
+            If an axis has fewer than 2 points.
+        """
+        if len(fieldx) < 2 or len(fieldy) < 2:
+            raise ValueError('the field grid must have at least 2 points per axis.')
+        A, y0 = self._tabulate(fieldx, fieldy)
+        return SensitivityGrid(np.asarray(fieldx, dtype=float), np.asarray(fieldy, dtype=float), A, y0)
+
+    def build(self, field=(0, 0)):
+        """
+        Builds (or loads from cache) the sensitivity matrix at a single field position.
+
+        Parameters
+        ----------
+        field: (float, float)
+            Field position in degrees; defaults to (0, 0).
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The (nZern, len(dofs)) sensitivity matrix and the nominal wavefront.
+        """
+        A, y0 = self._tabulate([field[0]], [field[1]])
+        return A[0, 0], y0[0, 0]
@@ -1,6 +1,7 @@
 import batoid
 import numpy as np
 from batoid.analysis import wavefront
+from aos.sed import quadrature
 
 class WavefrontSimulator:
     """
@@ -12,12 +13,22 @@ class WavefrontSimulator:
     Trace to exit pupil.
     Measure relative path differences with respect to the chief ray.
 
+    If a band is given the wavefront is polychromatic: the optical path differences are averaged
+    over the blackbody spectrum times the bandpass throughput using the Gauss quadrature
+    wavelengths from aos.sed.quadrature, so only order ray traces are needed.
+
     Parameters
     ----------
     wavelength: float
         The wavelength of light to use.
     nx: int
         The grid size to use (grid = nx x nx pixels/rays).
+    band: str
+        The LSST filter to integrate over; defaults to None (monochromatic).
+    temperature: float
+        The blackbody temperature of the star in K; defaults to None (bandpass only).
+    order: int
+        The number of quadrature wavelengths; defaults to 4.
 
     Attributes
     ----------
@@ -25,17 +36,37 @@ class WavefrontSimulator:
         The wavelength of light to use.
     nx: int
         The grid size to use (grid = nx x nx pixels/rays). Must be odd.
+    band: str
+        The LSST filter to integrate over, or None.
+    temperature: float
+        The blackbody temperature of the star in K, or None.
+    order: int
+        The number of quadrature wavelengths.
 
     Raises
     ------
     ValueError
         Raise if nx is even; nx must be odd.
     """
-    def __init__(self, wavelength=500e-9, nx=255):
+    def __init__(self, wavelength=500e-9, nx=255, band=None, temperature=None, order=4):
         if nx % 2 == 0:
             raise ValueError('nx must be odd.')
         self.wavelength = wavelength
         self.nx = nx
+        self.band = band
+        self.temperature = temperature
+        self.order = order
+
+    def wavelengths(self):
+        """
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The wavelengths traced and their weights.
+        """
+        if self.band is None:
+            return np.array([self.wavelength]), np.ones(1)
+        return quadrature(self.band, self.temperature, self.order)
 
     def simulateWavefront(self, optic, fieldx, fieldy):
         """
@@ -54,13 +85,16 @@ class WavefrontSimulator:
             The grid of relative path difference values.
         """
         thetax, thetay = np.deg2rad([fieldx, fieldy])
-        lattice = wavefront(
-            optic, thetax, thetay, wavelength=self.wavelength,
-            nx=self.nx, reference='chief'
-        )
-        marray = lattice.array
-        out = marray.data * self.wavelength
-        out[marray.mask] = np.nan
+        out = np.zeros((self.nx, self.nx))
+        for wavelength, weight in zip(*self.wavelengths()):
+            lattice = wavefront(
+                optic, thetax, thetay, wavelength=wavelength,
+                nx=self.nx, reference='chief'
+            )
+            marray = lattice.array
+            opd = marray.data * wavelength
+            opd[marray.mask] = np.nan
+            out += weight * opd
         return out
 
 
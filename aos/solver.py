@@ -1,8 +1,11 @@
 import os
 import aos
 import numpy as np
+import scipy.linalg
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from aos.state import BendingState
+from aos.focal_plane import WavefrontSensors
 
 
 class Solver(ABC):
@@ -27,32 +30,296 @@ class Solver(ABC):
         pass
 
 
+class SensitivityGrid:
+    """
+    Sensitivity matrices and nominal wavefronts tabulated on a regular field grid.
+
+    Notes
+    -----
+    The grid is stored as a single record in one .npy file, so that it can be memory-mapped
+    and only the neighbouring field positions are read from disk when interpolating.
+
+    Parameters
+    ----------
+    fieldx: numpy.ndarray
+        The increasing x field positions of the grid in degrees.
+    fieldy: numpy.ndarray
+        The increasing y field positions of the grid in degrees.
+    A: numpy.ndarray
+        The (len(fieldy), len(fieldx), nZern, nDof) sensitivity matrices.
+    y0: numpy.ndarray
+        The (len(fieldy), len(fieldx), nZern) nominal wavefronts.
+
+    Attributes
+    ----------
+    fieldx: numpy.ndarray
+        The increasing x field positions of the grid in degrees.
+    fieldy: numpy.ndarray
+        The increasing y field positions of the grid in degrees.
+    A: numpy.ndarray
+        The (len(fieldy), len(fieldx), nZern, nDof) sensitivity matrices.
+    y0: numpy.ndarray
+        The (len(fieldy), len(fieldx), nZern) nominal wavefronts.
+
+    Raises
+    ------
+    ValueError
+        If an axis has fewer than 2 points or the shapes of A and y0 do not match the field grid.
+    """
+    def __init__(self, fieldx, fieldy, A, y0):
+        if len(fieldx) < 2 or len(fieldy) < 2:
+            raise ValueError('the field grid must have at least 2 points per axis.')
+        if A.shape[:2] != (len(fieldy), len(fieldx)) or y0.shape != A.shape[:3]:
+            raise ValueError('A and y0 must be tabulated on the (fieldy, fieldx) grid.')
+        self.fieldx = fieldx
+        self.fieldy = fieldy
+        self.A = A
+        self.y0 = y0
+
+    def _dtype(self):
+        ny, nx, nZern, nDof = self.A.shape
+        return np.dtype([('fieldx', 'f8', (nx,)), ('fieldy', 'f8', (ny,)),
+                         ('A', 'f8', (ny, nx, nZern, nDof)), ('y0', 'f8', (ny, nx, nZern))])
+
+    def save(self, path):
+        """
+        Writes the grid to a single .npy file.
+
+        Parameters
+        ----------
+        path: string
+            The path to write to.
+        """
+        record = np.zeros((), dtype=self._dtype())
+        record['fieldx'] = self.fieldx
+        record['fieldy'] = self.fieldy
+        record['A'] = self.A
+        record['y0'] = self.y0
+        np.save(path, record)
+
+    @staticmethod
+    def load(path):
+        """
+        Memory-maps a grid written by SensitivityGrid.save.
+
+        Parameters
+        ----------
+        path: string
+            The path to read from.
+
+        Returns
+        -------
+        SensitivityGrid
+            The grid, backed by a read-only memory map.
+        """
+        record = np.load(path, mmap_mode='r')
+        return SensitivityGrid(record['fieldx'], record['fieldy'], record['A'], record['y0'])
+
+    @staticmethod
+    def cornerAxes():
+        """
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The smallest x and y grid axes whose cells cover every point of the 4 corner
+            wavefront sensors, in degrees.
+        """
+        _, corners, _ = WavefrontSensors.geometry()
+        lo, hi = np.abs(corners).min(axis=(0, 1)), np.abs(corners).max(axis=(0, 1))
+        return tuple(np.array([-hi[k], -lo[k], lo[k], hi[k]]) for k in range(2))
+
+    @staticmethod
+    def _weights(grid, value):
+        if not grid[0] <= value <= grid[-1]:
+            raise ValueError(f'field position {value} is outside of the grid.')
+        i = min(max(np.searchsorted(grid, value) - 1, 0), len(grid) - 2)
+        t = (value - grid[i]) / (grid[i + 1] - grid[i])
+        return i, t
+
+    def interpolate(self, fieldx, fieldy):
+        """
+        Bilinearly interpolates the sensitivity matrix and nominal wavefront.
+
+        Parameters
+        ----------
+        fieldx: float
+            The x field position in degrees.
+        fieldy: float
+            The y field position in degrees.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray
+            The sensitivity matrix and the nominal wavefront at the field position.
+
+        Raises
+        ------
+        ValueError
+            If the field position is outside of the grid.
+        """
+        i, tx = SensitivityGrid._weights(self.fieldx, fieldx)
+        j, ty = SensitivityGrid._weights(self.fieldy, fieldy)
+        w = np.array([[(1 - ty) * (1 - tx), (1 - ty) * tx], [ty * (1 - tx), ty * tx]])
+        A = np.tensordot(w, self.A[j:j + 2, i:i + 2], axes=2)
+        y0 = np.tensordot(w, self.y0[j:j + 2, i:i + 2], axes=2)
+        return A, y0
+
+
 class SensitivitySolver(Solver):
     """
     Solves for optical state with a sensitivity matrix.
 
+    Notes
+    -----
+    If data/sensitivity_grid_20dof.npy exists (or a grid is provided), the sensitivity matrix and
+    nominal wavefront are interpolated at the requested field position; otherwise only the
+    field center is supported. The grid is not shipped with the repository, because it is ray
+    traced from the mirror bending modes, which are not either; build it with
+
+        python data/build_sensitivity_grid.py
+
+    or, to only cover the corner wavefront sensors (SensitivityGrid.cornerAxes), with the
+    --corners option, which traces 16 instead of 225 field positions.
+
+    The SVD of each sensitivity matrix is computed once and cached per field position, up to
+    cacheSize entries. The regularized inverse is formed from the cached SVD, so changing the
+    regularization with setRegularization does not refactor any matrix. Two regularizations
+    are available, both relative to the largest singular value s_max:
+
+    - 'tsvd': truncated SVD, discarding singular values below strength * s_max.
+    - 'tikhonov': filter factors s / (s^2 + (strength * s_max)^2).
+
     Parameters
     ----------
     field: (float, float)
-        Field position of the wavefront.
+        Field position of the wavefront in degrees; defaults to (0, 0).
+    grid: SensitivityGrid
+        The tabulated sensitivity matrices; defaults to data/sensitivity_grid_20dof.npy if present.
+    cacheSize: int
+        The maximum number of field positions to cache factorizations for; defaults to 32.
+    method: str
+        The regularization, 'tsvd' or 'tikhonov'; defaults to 'tsvd'.
+    strength: float
+        The relative regularization strength; defaults to 1e-4.
 
     Attributes
     ----------
     A: numpy.ndarray
         The sensitivity matrix mapping the optical state to the wavefront.
     Ainv: numpy.ndarray
-        The psuedoinverse of the sensitivity matrix.
+        The regularized psuedoinverse of the sensitivity matrix.
     y0: numpy.ndarray
         The wavefront from the nominal optical system.
+    field: (float, float)
+        Field position of the wavefront in degrees.
+    grid: SensitivityGrid | None
+        The tabulated sensitivity matrices.
+    cacheSize: int
+        The maximum number of field positions to cache factorizations for.
+    method: str
+        The regularization, 'tsvd' or 'tikhonov'.
+    strength: float
+        The relative regularization strength.
+
+    Raises
+    ------
+    ValueError
+        If cacheSize is less than 1 or the regularization is invalid.
+    FileNotFoundError
+        If there is no sensitivity grid and the field is not the center.
     """
-    def __init__(self, field=(0,0)):
-        if not (field[0] == 0  and field[1] == 0):
-            raise NotImplementedError()
-        self.A = np.load(os.path.join(aos.dataDir, 'sensitivity_matrix_20dof.npy'))
-        self.Ainv = np.linalg.pinv(self.A, rcond=1e-4)
-        self.y0 = np.load(os.path.join(aos.dataDir, 'nominal_wavefront_20dof.npy'))
+    gridPath = os.path.join(aos.dataDir, 'sensitivity_grid_20dof.npy')
+    methods = {'tsvd', 'tikhonov'}
 
-    def solve(self, y):
+    def __init__(self, field=(0, 0), grid=None, cacheSize=32, method='tsvd', strength=1e-4):
+        if cacheSize < 1:
+            raise ValueError('cacheSize must be at least 1.')
+        if grid is None and os.path.exists(SensitivitySolver.gridPath):
+            grid = SensitivityGrid.load(SensitivitySolver.gridPath)
+        self.grid = grid
+        self.cacheSize = cacheSize
+        self._cache = OrderedDict()
+        self.field = (float(field[0]), float(field[1]))
+        self.setRegularization(method, strength)
+
+    def setRegularization(self, method, strength):
+        """
+        Changes the regularization, reusing the cached SVDs.
+
+        Parameters
+        ----------
+        method: str
+            The regularization, 'tsvd' or 'tikhonov'.
+        strength: float
+            The relative regularization strength.
+
+        Raises
+        ------
+        ValueError
+            If the method is unknown or the strength is negative.
+        """
+        if method not in SensitivitySolver.methods:
+            raise ValueError('method must be tsvd | tikhonov')
+        elif strength < 0:
+            raise ValueError('strength must be non-negative.')
+        self.method = method
+        self.strength = strength
+        for entry in self._cache.values():
+            entry['Ainv'] = self._inverse(entry['svd'])
+        self.A, self.Ainv, self.y0 = self.model(self.field)
+
+    def _inverse(self, svd):
+        U, s, Vt = svd
+        if self.method == 'tsvd':
+            keep = s > self.strength * s[0]
+            f = np.zeros_like(s)
+            f[keep] = 1 / s[keep]
+        else:
+            f = s / (s ** 2 + (self.strength * s[0]) ** 2)
+        return np.dot(Vt.T * f, U.T)
+
+    def model(self, field):
+        """
+        Provides the sensitivity model at a field position.
+
+        Parameters
+        ----------
+        field: (float, float)
+            Field position of the wavefront in degrees.
+
+        Returns
+        -------
+        numpy.ndarray, numpy.ndarray, numpy.ndarray
+            The sensitivity matrix, its regularized pseudoinverse and the nominal wavefront.
+
+        Raises
+        ------
+        FileNotFoundError
+            If there is no sensitivity grid and the field is not the center.
+        """
+        key = (float(field[0]), float(field[1]))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            entry = self._cache[key]
+            return entry['A'], entry['Ainv'], entry['y0']
+
+        if self.grid is not None:
+            A, y0 = self.grid.interpolate(*key)
+        elif key == (0, 0):
+            A = np.load(os.path.join(aos.dataDir, 'sensitivity_matrix_20dof.npy'))
+            y0 = np.load(os.path.join(aos.dataDir, 'nominal_wavefront_20dof.npy'))
+        else:
+            raise FileNotFoundError('field {} requires the sensitivity grid {}, which does not exist; build it '
+                                    'with data/build_sensitivity_grid.py.'.format(key, SensitivitySolver.gridPath))
+        svd = np.linalg.svd(A, full_matrices=False)
+        Ainv = self._inverse(svd)
+
+        self._cache[key] = {'A': A, 'y0': y0, 'svd': svd, 'Ainv': Ainv}
+        while len(self._cache) > self.cacheSize:
+            self._cache.popitem(last=False)
+        return A, Ainv, y0
+
+    def solve(self, y, field=None, asArray=False):
         """
         Solves for the optical state.
 
@@ -63,6 +330,288 @@ class SensitivitySolver(Solver):
         The coefficients are indexed by the Noll (1976) convention, which starts at j=1. The 0th
         coefficient has no impact.
 
+        A batch of N wavefronts is solved with a single matrix multiply.
+
+        Parameters
+        ----------
+        y: numpy.ndarray
+            The wavefront in annular zernike polynomial coefficients, or an (N, nZern) array of
+            wavefronts.
+        field: (float, float)
+            Field position of the wavefront in degrees; defaults to self.field.
+        asArray: bool
+            Whether to return the raw state array instead of BendingState objects; defaults to
+            False.
+
+        Returns
+        -------
+        aos.state.BendingState | list[aos.state.BendingState] | numpy.ndarray
+            The optical state(s) that produce wavefront(s) y.
+        """
+        if field is None:
+            Ainv, y0 = self.Ainv, self.y0
+        else:
+            _, Ainv, y0 = self.model(field)
+        y = np.asarray(y)
+        xest = np.dot(y[..., 1:] - y0, Ainv.T)
+        if asArray:
+            return xest
+        elif xest.ndim == 1:
+            return BendingState(xest)
+        return [BendingState(x) for x in xest]
+
+
+class MultiFieldSensitivitySolver(Solver):
+    """
+    Solves for optical state jointly from the wavefronts of several sensors.
+
+    Notes
+    -----
+    Math: x = (sum_i w_i A_i^T A_i)^+ sum_i w_i A_i^T (y_i - y0_i)
+
+    The solution is the truncated SVD pseudoinverse of the stacked blocks sqrt(w_i) A_i of the
+    available sensors, which never forms the normal matrix and so does not square its condition
+    number. The full stack is QR factorized once; sensors can be missing (e.g. chips with no
+    usable donuts), in which case their rows are deleted from the factorization by Givens
+    rotations (a QR downdate) and only the small (nDof, nDof) triangular factor is decomposed
+    by SVD. The pseudoinverse of each combination of available sensors is cached, so there are
+    at most 2^nSensor downdates.
+
+    Without a grid, the default corner fields require data/sensitivity_grid_20dof.npy (see
+    SensitivitySolver).
+
+    Parameters
+    ----------
+    fields: list[(float, float)]
+        Field positions of the sensors in degrees; defaults to the centers of the 4 corner
+        wavefront sensors.
+    weights: numpy.ndarray
+        Per-sensor weights; defaults to ones.
+    grid: SensitivityGrid
+        The tabulated sensitivity matrices; defaults to data/sensitivity_grid_20dof.npy if present.
+    rcond: float
+        Singular values of the weighted block matrix below rcond * s_max are discarded; defaults
+        to 1e-4.
+
+    Attributes
+    ----------
+    fields: list[(float, float)]
+        Field positions of the sensors in degrees.
+    weights: numpy.ndarray
+        Per-sensor weights.
+    A: numpy.ndarray
+        The (nSensor, nZern, nDof) sensitivity matrices.
+    y0: numpy.ndarray
+        The (nSensor, nZern) nominal wavefronts.
+    rcond: float
+        The relative singular value cutoff.
+
+    Raises
+    ------
+    ValueError
+        If the number of weights does not match the number of fields or a weight is negative.
+    FileNotFoundError
+        If there is no sensitivity grid and a field is not the center.
+    """
+    def __init__(self, fields=None, weights=None, grid=None, rcond=1e-4):
+        if fields is None:
+            fields = MultiFieldSensitivitySolver.cornerFields()
+        if weights is None:
+            weights = np.ones(len(fields))
+        if len(weights) != len(fields):
+            raise ValueError('weights must have the same length as fields.')
+        elif np.any(np.asarray(weights) < 0):
+            raise ValueError('weights must be non-negative.')
+
+        solver = SensitivitySolver(grid=grid)
+        models = [solver.model(field) for field in fields]
+        self.fields = [(float(fx), float(fy)) for fx, fy in fields]
+        self.weights = np.asarray(weights, dtype=float)
+        self.A = np.array([A for A, _, _ in models])
+        self.y0 = np.array([y0 for _, _, y0 in models])
+        self.rcond = rcond
+        self._cache = dict()
+        nSensor, nZern, nDof = self.A.shape
+        block = (self.A * np.sqrt(self.weights)[:, None, None]).reshape(-1, nDof)
+        self._q, self._r = scipy.linalg.qr(block)
+
+    @staticmethod
+    def cornerFields():
+        """
+        Returns
+        -------
+        list[(float, float)]
+            The field positions (in degrees) of the centers of the 4 corner wavefront sensors.
+        """
+        names, corners, _ = WavefrontSensors.geometry()
+        return [tuple(float(v) for v in np.mean(corners[[names.index(intra), names.index(extra)]], axis=(0, 1)))
+                for intra, extra in zip(WavefrontSensors.intraNames, WavefrontSensors.extraNames)]
+
+    def inverse(self, available=None):
+        """
+        Provides the weighted block pseudoinverse for a set of available sensors.
+
+        Parameters
+        ----------
+        available: numpy.ndarray[bool]
+            Which sensors have measurements; defaults to all of them.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (nDof, nSensor, nZern) matrix mapping wavefront residuals to the state; columns
+            of missing sensors are zero.
+
+        Raises
+        ------
+        ValueError
+            If no sensor is available.
+        """
+        if available is None:
+            available = np.ones(len(self.fields), dtype=bool)
+        key = tuple(bool(a) for a in available)
+        if key in self._cache:
+            return self._cache[key]
+        if not any(key):
+            raise ValueError('at least one sensor must be available.')
+
+        keep = np.array(key)
+        nSensor, nZern, nDof = self.A.shape
+        scale = np.sqrt(self.weights[keep])
+        q, r = self._q, self._r
+        # delete from the last block so that the row offsets of the others do not move
+        for i in np.flatnonzero(~keep)[::-1]:
+            q, r = scipy.linalg.qr_delete(q, r, i * nZern, nZern, which='row')
+        n = min(nDof, len(r))
+        U, s, Vt = np.linalg.svd(r[:n])
+        nonzero = s > self.rcond * s[0]
+        blockInv = np.dot(Vt[nonzero].T / s[nonzero], np.dot(q[:, :n], U[:, nonzero]).T)
+        inv = np.zeros((nDof, nSensor, nZern))
+        inv[:, keep] = blockInv.reshape(nDof, -1, nZern) * scale[:, None]
+        self._cache[key] = inv
+        return inv
+
+    def solve(self, y, asArray=False):
+        """
+        Solves for the optical state.
+
+        Notes
+        -----
+        The coefficients are indexed by the Noll (1976) convention, which starts at j=1. The 0th
+        coefficient has no impact. Sensors whose coefficients contain NaNs are treated as
+        missing; batches are grouped by the set of available sensors.
+
+        Parameters
+        ----------
+        y: numpy.ndarray
+            The (nSensor, nZern) wavefronts in annular zernike polynomial coefficients, or an
+            (N, nSensor, nZern) array of them.
+        asArray: bool
+            Whether to return the raw state array instead of BendingState objects; defaults to
+            False.
+
+        Returns
+        -------
+        aos.state.BendingState | list[aos.state.BendingState] | numpy.ndarray
+            The optical state(s) that produce wavefronts y.
+
+        Raises
+        ------
+        ValueError
+            If every sensor of a wavefront set is missing.
+        """
+        y = np.asarray(y)
+        batch = y.reshape((-1,) + y.shape[-2:])
+        resid = batch[..., 1:] - self.y0
+        available = ~np.any(np.isnan(resid), axis=-1)
+        resid = np.nan_to_num(resid)
+
+        xest = np.zeros((len(batch), self.A.shape[2]))
+        masks, groups = np.unique(available, axis=0, return_inverse=True)
+        for i, mask in enumerate(masks):
+            rows = groups.ravel() == i
+            xest[rows] = np.einsum('isk,nsk->ni', self.inverse(mask), resid[rows])
+
+        if y.ndim == 2:
+            xest = xest[0]
+        if asArray:
+            return xest
+        elif xest.ndim == 1:
+            return BendingState(xest)
+        return [BendingState(x) for x in xest]
+
+
+class KalmanSolver(Solver):
+    """
+    Recursively estimates the optical state from a sequence of wavefronts.
+
+    Notes
+    -----
+    Keeps a state mean and covariance and folds in each wavefront one zernike coefficient at a
+    time, so that every measurement update is a rank one, O(nDof^2) update of the covariance
+    and no matrix is ever inverted. Between exposures, predict adds the applied control update
+    to the mean and the process noise (drift) to the covariance.
+
+    Parameters
+    ----------
+    solver: SensitivitySolver
+        Provides the sensitivity matrix and nominal wavefront; defaults to SensitivitySolver().
+    priorSigma: float | numpy.ndarray
+        Standard deviation of the prior on each degree of freedom; defaults to 1e-6.
+    measurementSigma: float | numpy.ndarray
+        Standard deviation of the noise on each zernike coefficient; defaults to 1e-9.
+    processSigma: float | numpy.ndarray
+        Standard deviation of the drift of each degree of freedom between exposures; defaults
+        to 0.
+
+    Attributes
+    ----------
+    A: numpy.ndarray
+        The sensitivity matrix mapping the optical state to the wavefront.
+    y0: numpy.ndarray
+        The wavefront from the nominal optical system.
+    x: numpy.ndarray
+        The state mean.
+    P: numpy.ndarray
+        The state covariance.
+    R: numpy.ndarray
+        The variance of the noise on each zernike coefficient.
+    Q: numpy.ndarray
+        The process noise covariance.
+    """
+    def __init__(self, solver=None, priorSigma=1e-6, measurementSigma=1e-9, processSigma=0):
+        if solver is None:
+            solver = SensitivitySolver()
+        self.A = solver.A
+        self.y0 = solver.y0
+        nZern, nDof = self.A.shape
+        self.x = np.zeros(nDof)
+        self.P = np.diag(np.broadcast_to(np.square(priorSigma), nDof)).astype(float)
+        self.R = np.broadcast_to(np.square(measurementSigma), nZern).astype(float)
+        self.Q = np.diag(np.broadcast_to(np.square(processSigma), nDof)).astype(float)
+
+    def predict(self, xdelta=None):
+        """
+        Propagates the state to the next exposure.
+
+        Parameters
+        ----------
+        xdelta: aos.state.State | numpy.ndarray
+            The update applied to the telescope since the last exposure; defaults to None.
+        """
+        if xdelta is not None:
+            self.x = self.x + getattr(xdelta, 'array', xdelta)
+        self.P = self.P + self.Q
+
+    def solve(self, y):
+        """
+        Updates the state estimate with a new wavefront.
+
+        Notes
+        -----
+        The coefficients are indexed by the Noll (1976) convention, which starts at j=1. The 0th
+        coefficient has no impact. NaN coefficients are skipped.
+
         Parameters
         ----------
         y: numpy.ndarray
@@ -71,7 +620,18 @@ class SensitivitySolver(Solver):
         Returns
         -------
         aos.state.BendingState
-            The optical state that produces wavefront y.
+            The updated estimate of the optical state.
         """
-        xest = BendingState(np.dot(self.Ainv, (y[1:] - self.y0)))
-        return xest
\ No newline at end of file
+        x = self.x.copy()
+        P = self.P.copy()
+        resid = np.asarray(y)[1:] - self.y0
+        for a, r, noise in zip(self.A, resid, self.R):
+            if np.isnan(r):
+                continue
+            Pa = np.dot(P, a)
+            gain = Pa / (np.dot(a, Pa) + noise)
+            x += gain * (r - np.dot(a, x))
+            P -= np.outer(gain, Pa)
+        self.x = x
+        self.P = (P + P.T) / 2
+        return BendingState(self.x.copy())
@@ -0,0 +1,244 @@
+import os
+import json
+import numpy as np
+
+
+class StampStore:
+    """
+    Append-only, memory-mapped store of donut stamps and their metadata.
+
+    Notes
+    -----
+    Stamps are kept in chunk files stamps_{k}.npy of chunkSize (crop, crop) images, next to
+    metadata_{k}.npy chunks of a parallel structured array, all opened as memory maps. Reading
+    a stamp or a slice within one chunk is a zero-copy view; other index arrays are gathered
+    chunk by chunk. The number of stamps lives in store.json, which is replaced atomically after
+    the data of an append is flushed, so readers only ever see complete stamps. A read only store
+    never creates files: reading from a chunk whose file is missing raises an IndexError.
+
+    Parameters
+    ----------
+    path: string
+        The directory of the store.
+    crop: int
+        The number of pixels in donut stamps; defaults to 192.
+    dtype: numpy.dtype
+        The stamp dtype, e.g. float32 or uint16 (rounded and clipped); defaults to float32.
+    chunkSize: int
+        The number of stamps per chunk file; defaults to 4096.
+    readonly: bool
+        Whether to open an existing store for reading only; defaults to False.
+
+    Attributes
+    ----------
+    path: string
+        The directory of the store.
+    crop: int
+        The number of pixels in donut stamps.
+    dtype: numpy.dtype
+        The stamp dtype.
+    chunkSize: int
+        The number of stamps per chunk file.
+    readonly: bool
+        Whether the store is read only.
+
+    Raises
+    ------
+    ValueError
+        If crop, dtype or chunkSize do not match an existing store.
+    """
+    metadataDtype = np.dtype([
+        ('observation', 'i8'),
+        ('chip', 'U16'),
+        ('field', 'f8', (2,)),
+        ('focal', 'U5'),
+        ('magnitude', 'f8'),
+    ])
+
+    def __init__(self, path, crop=192, dtype=np.float32, chunkSize=4096, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        header = os.path.join(path, 'store.json')
+        if os.path.exists(header):
+            with open(header) as f:
+                config = json.load(f)
+            for name, value in [('crop', crop), ('dtype', np.dtype(dtype).str), ('chunkSize', chunkSize)]:
+                if config[name] != value:
+                    raise ValueError('{} does not match the store: {}'.format(name, config[name]))
+            self._count = config['count']
+        else:
+            if readonly:
+                raise ValueError('{} is not a stamp store.'.format(path))
+            os.makedirs(path, exist_ok=True)
+            self._count = 0
+        self.crop = crop
+        self.dtype = np.dtype(dtype)
+        self.chunkSize = chunkSize
+        self._chunks = dict()
+        if not os.path.exists(header):
+            self._writeHeader()
+
+    def _writeHeader(self):
+        config = {'crop': self.crop, 'dtype': self.dtype.str, 'chunkSize': self.chunkSize, 'count': self._count}
+        tmp = os.path.join(self.path, 'store.json.tmp')
+        with open(tmp, 'w') as w:
+            json.dump(config, w)
+        os.replace(tmp, os.path.join(self.path, 'store.json'))
+
+    def _chunk(self, k):
+        if k not in self._chunks:
+            paths = [os.path.join(self.path, f'{name}_{k:05d}.npy') for name in ['stamps', 'metadata']]
+            if os.path.exists(paths[0]):
+                mode = 'r' if self.readonly else 'r+'
+                self._chunks[k] = tuple(np.load(p, mmap_mode=mode) for p in paths)
+            elif self.readonly:
+                raise IndexError('chunk {} is missing from {}.'.format(k, self.path))
+            else:
+                self._chunks[k] = (
+                    np.lib.format.open_memmap(paths[0], mode='w+', dtype=self.dtype,
+                                              shape=(self.chunkSize, self.crop, self.crop)),
+                    np.lib.format.open_memmap(paths[1], mode='w+', dtype=StampStore.metadataDtype,
+                                              shape=(self.chunkSize,)),
+                )
+        return self._chunks[k]
+
+    def append(self, stamps, observation=-1, chip='', field=(np.nan, np.nan), focal='', magnitude=np.nan):
+        """
+        Appends stamps and their metadata.
+
+        Parameters
+        ----------
+        stamps: numpy.ndarray | batoid.Lattice | list[batoid.Lattice]
+            A (crop, crop) stamp, e.g. from aos.simulator.DonutSimulator, or an (N, crop, crop)
+            cube of them, e.g. from aos.donut.DonutExtractor.
+        observation: int | numpy.ndarray
+            The observation id(s); defaults to -1.
+        chip: string | numpy.ndarray
+            The chip name(s); defaults to ''.
+        field: (float, float) | numpy.ndarray
+            The field position(s) in degrees; defaults to NaN.
+        focal: string | numpy.ndarray
+            'intra' or 'extra'; defaults to ''.
+        magnitude: float | numpy.ndarray
+            The magnitude(s) of the sources; defaults to NaN.
+
+        Raises
+        ------
+        ValueError
+            If the store is read only or the stamps are not (crop, crop).
+        """
+        if self.readonly:
+            raise ValueError('the store is read only.')
+        if isinstance(stamps, list):
+            stamps = [getattr(stamp, 'array', stamp) for stamp in stamps]
+        stamps = np.asarray(getattr(stamps, 'array', stamps))
+        stamps = stamps.reshape((-1,) + stamps.shape[-2:])
+        if stamps.shape[1:] != (self.crop, self.crop):
+            raise ValueError('stamps must be ({0}, {0}).'.format(self.crop))
+        if np.issubdtype(self.dtype, np.integer):
+            info = np.iinfo(self.dtype)
+            stamps = np.clip(np.rint(stamps), info.min, info.max)
+
+        n = len(stamps)
+        metadata = np.zeros(n, dtype=StampStore.metadataDtype)
+        metadata['observation'] = observation
+        metadata['chip'] = chip
+        metadata['field'] = field
+        metadata['focal'] = focal
+        metadata['magnitude'] = magnitude
+
+        start = 0
+        touched = set()
+        while start < n:
+            k, offset = divmod(self._count + start, self.chunkSize)
+            size = min(n - start, self.chunkSize - offset)
+            chunkStamps, chunkMetadata = self._chunk(k)
+            chunkStamps[offset:offset + size] = stamps[start:start + size]
+            chunkMetadata[offset:offset + size] = metadata[start:start + size]
+            touched.add(k)
+            start += size
+        for k in touched:
+            for chunk in self._chunks[k]:
+                chunk.flush()
+        self._count += n
+        self._writeHeader()
+
+    def __len__(self):
+        return self._count
+
+    def _locate(self, index):
+        index = np.arange(self._count)[index]
+        return index, index // self.chunkSize, index % self.chunkSize
+
+    def _get(self, index, part):
+        if isinstance(index, (int, np.integer)):
+            if not -self._count <= index < self._count:
+                raise IndexError('index {} is out of range.'.format(index))
+            k, offset = divmod(int(index) % self._count, self.chunkSize)
+            return self._chunk(k)[part][offset]
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if start < stop and step > 0 and start // self.chunkSize == (stop - 1) // self.chunkSize:
+                k = start // self.chunkSize
+                return self._chunk(k)[part][start - k * self.chunkSize:stop - k * self.chunkSize:step]
+        index, chunks, offsets = self._locate(index)
+        if part == 0:
+            out = np.empty(index.shape + (self.crop, self.crop), dtype=self.dtype)
+        else:
+            out = np.empty(index.shape, dtype=StampStore.metadataDtype)
+        for k in np.unique(chunks):
+            mask = chunks == k
+            out[mask] = self._chunk(k)[part][offsets[mask]]
+        return out
+
+    def __getitem__(self, index):
+        """
+        Parameters
+        ----------
+        index: int | slice | numpy.ndarray
+            The stamp(s) to read.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (crop, crop) stamp or (N, crop, crop) stamps; a view of the memory map for an
+            int or a slice within one chunk.
+        """
+        return self._get(index, 0)
+
+    def metadata(self, index=slice(None)):
+        """
+        Parameters
+        ----------
+        index: int | slice | numpy.ndarray
+            The stamp(s) to describe; defaults to all.
+
+        Returns
+        -------
+        numpy.ndarray
+            The metadata records, with fields observation, chip, field, focal and magnitude.
+        """
+        return self._get(index, 1)
+
+    def refresh(self):
+        """
+        Picks up stamps appended by another process since the store was opened.
+        """
+        with open(os.path.join(self.path, 'store.json')) as f:
+            self._count = json.load(f)['count']
+
+    def close(self):
+        """
+        Flushes and releases the memory maps.
+        """
+        if not self.readonly:
+            for chunks in self._chunks.values():
+                for chunk in chunks:
+                    chunk.flush()
+        self._chunks = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -20,28 +20,29 @@ class State(dict):
     array: numpy.ndarray
         A 1D array with the 20 degrees of freedom.
     stateMap: dict(str, int)
-        A dictionary mapping the name of the degree of freedom to its index in self.array.
+        A dictionary mapping the name of the degree of freedom to its index in self.array; shared
+        by all instances of the class.
     camhex: numpy.ndarray
         1D array with the 5 camera hexapod degrees of freedom.
     m2hex: numpy.ndarray
         1D array with the 5 camera hexapod degrees of freedom.
     """
     LENGTH = 10
+    stateMap = {
+        'camx': 0,
+        'camy': 1,
+        'camz': 2,
+        'camrx': 3,
+        'camry': 4,
+        'm2x': 5,
+        'm2y': 6,
+        'm2z': 7,
+        'm2rx': 8,
+        'm2ry': 9,
+    }
 
     def __init__(self, array=None):
         self.array = np.zeros(State.LENGTH) if array is None else array
-        self.stateMap = {
-            'camx': 0,
-            'camy': 1,
-            'camz': 2,
-            'camrx': 3,
-            'camry': 4,
-            'm2x': 5,
-            'm2y': 6,
-            'm2z': 7,
-            'm2rx': 8,
-            'm2ry': 9,
-        }
 
     def __getitem__(self, key):
         ind = self.stateMap[key]
@@ -75,25 +76,36 @@ class BendingState(State):
         1D array with the 5 M1M3 bending modes.
     m2modes: numpy.ndarray
         1D array with the 5 M2 bending modes.
+
+    Notes
+    -----
+    LIMITS holds approximate maximum absolute values of each degree of freedom, used as the
+    default bounds of aos.control.ModelPredictiveController: hexapod travel (1 cm and 3.5 mrad
+    for the camera, 5 mm and 2 mrad for M2) and bending mode amplitudes (2 microns). They are
+    round numbers of the order of the LSST design ranges, not calibrated values.
     """
     LENGTH = 20
+    LIMITS = np.array([1e-2, 1e-2, 1e-2, 3.5e-3, 3.5e-3,
+                       5e-3, 5e-3, 5e-3, 2e-3, 2e-3]
+                      + [2e-6] * 10)
+    LIMITS.setflags(write=False)
+    stateMap = dict(State.stateMap, **{
+        'm1m3b1': 10,
+        'm1m3b2': 11,
+        'm1m3b3': 12,
+        'm1m3b4': 13,
+        'm1m3b5': 14,
+        'm2b1': 15,
+        'm2b2': 16,
+        'm2b3': 17,
+        'm2b4': 18,
+        'm2b5': 19,
+    })
 
     def __init__(self, array=None):
         if array is None:
             array = np.zeros(BendingState.LENGTH)
         super().__init__(array)
-        self.stateMap.update({
-            'm1m3b1': 10,
-            'm1m3b2': 11,
-            'm1m3b3': 12,
-            'm1m3b4': 13,
-            'm1m3b5': 14,
-            'm2b1': 15,
-            'm2b2': 16,
-            'm2b3': 17,
-            'm2b4': 18,
-            'm2b5': 19,
-        })
 
     @property
     def m1m3modes(self):
@@ -123,14 +135,14 @@ class ZernikeState(State):
         1D array with the 12 M3 zernike coefficients (Z4-Z15).
     """
     LENGTH = 46
+    stateMap = dict(State.stateMap,
+                    **{'m1m3zer{}'.format(i+4): i + 10 for i in range(18)},
+                    **{'m2zer{}'.format(i+4): i + 28 for i in range(18)})
 
     def __init__(self, array=None):
         if array is None:
             array = np.zeros(ZernikeState.LENGTH)
         super().__init__(array)
-        for i in range(18):
-            self.stateMap['m1m3zer{}'.format(i+4)] = i + 10
-            self.stateMap['m2zer{}'.format(i+4)] = i + 28
 
     @property
     def m1m3zer(self):
@@ -142,4 +154,149 @@ class ZernikeState(State):
     def m2zer(self):
         out = np.zeros(22)
         out[4:] = self.array[28:46]
-        return out
\ No newline at end of file
+        return out
+
+
+class StateArray:
+    """
+    A batch of optical states stored in a single (N, LENGTH) array.
+
+    Notes
+    -----
+    Client can access a degree of freedom across the batch with `states['camx']` and a single
+    state with `states[i]`; both are views into the shared array, as are the named field
+    properties. Names follow the stateMap of stateClass.
+
+    Parameters
+    ----------
+    array: numpy.ndarray
+        A 2D (N, LENGTH) array of states, or a 1D array for a single state.
+    stateClass: type
+        BendingState or ZernikeState; defaults to BendingState.
+
+    Attributes
+    ----------
+    array: numpy.ndarray
+        The (N, LENGTH) array of states.
+    stateClass: type
+        The class of the individual states.
+    camhex: numpy.ndarray
+        (N, 5) array with the camera hexapod degrees of freedom.
+    m2hex: numpy.ndarray
+        (N, 5) array with the M2 hexapod degrees of freedom.
+    m1m3modes: numpy.ndarray
+        (N, 5) array with the M1M3 bending modes (BendingState only).
+    m2modes: numpy.ndarray
+        (N, 5) array with the M2 bending modes (BendingState only).
+    m1m3zer: numpy.ndarray
+        (N, 22) array with the M1M3 zernike coefficients (ZernikeState only).
+    m2zer: numpy.ndarray
+        (N, 22) array with the M2 zernike coefficients (ZernikeState only).
+
+    Raises
+    ------
+    ValueError
+        If the array does not have stateClass.LENGTH columns.
+    """
+    def __init__(self, array, stateClass=BendingState):
+        array = np.asarray(array, dtype=float)
+        if array.ndim == 1:
+            array = array.reshape(1, -1)
+        if array.ndim != 2 or array.shape[1] != stateClass.LENGTH:
+            raise ValueError('array must be (N, {})'.format(stateClass.LENGTH))
+        self.array = array
+        self.stateClass = stateClass
+
+    @classmethod
+    def zeros(cls, size, stateClass=BendingState):
+        """
+        Parameters
+        ----------
+        size: int
+            The number of states.
+        stateClass: type
+            BendingState or ZernikeState; defaults to BendingState.
+
+        Returns
+        -------
+        StateArray
+            size nominal states.
+        """
+        return cls(np.zeros((size, stateClass.LENGTH)), stateClass)
+
+    @classmethod
+    def fromStates(cls, states):
+        """
+        Parameters
+        ----------
+        states: list[aos.state.State]
+            States of a single class.
+
+        Returns
+        -------
+        StateArray
+            The states copied into one array.
+        """
+        stateClass = type(states[0])
+        return cls(np.array([state.array for state in states]), stateClass)
+
+    def toStates(self):
+        """
+        Returns
+        -------
+        list[aos.state.State]
+            The individual states, as views into self.array.
+        """
+        return [self.stateClass(row) for row in self.array]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.array[:, self.stateClass.stateMap[key]]
+        elif isinstance(key, (int, np.integer)):
+            return self.stateClass(self.array[key])
+        return StateArray(self.array[key], self.stateClass)
+
+    def __setitem__(self, key, val):
+        if isinstance(key, str):
+            self.array[:, self.stateClass.stateMap[key]] = val
+        else:
+            self.array[key] = getattr(val, 'array', val)
+
+    def _require(self, stateClass, name):
+        if not issubclass(self.stateClass, stateClass):
+            raise AttributeError('{} requires {}'.format(name, stateClass.__name__))
+
+    @property
+    def camhex(self):
+        return self.array[:, :5]
+
+    @property
+    def m2hex(self):
+        return self.array[:, 5:10]
+
+    @property
+    def m1m3modes(self):
+        self._require(BendingState, 'm1m3modes')
+        return self.array[:, 10:15]
+
+    @property
+    def m2modes(self):
+        self._require(BendingState, 'm2modes')
+        return self.array[:, 15:20]
+
+    @property
+    def m1m3zer(self):
+        self._require(ZernikeState, 'm1m3zer')
+        out = np.zeros((len(self), 22))
+        out[:, 4:] = self.array[:, 10:28]
+        return out
+
+    @property
+    def m2zer(self):
+        self._require(ZernikeState, 'm2zer')
+        out = np.zeros((len(self), 22))
+        out[:, 4:] = self.array[:, 28:46]
+        return out
@@ -1,5 +1,9 @@
 import os
+import sqlite3
+import pathlib
+import numpy as np
 from aos import dataDir
+from aos.projection import Pointing
 from astropy.table import Table
 
 class Survey:
@@ -8,6 +12,11 @@ class Survey:
 
     Parameters
     ----------
+    table: astropy.table.Table
+        The LSST observations; defaults to the sample in data/survey.csv.
+
+    Attributes
+    ----------
     table: astropy.table.Table
         The LSST observations.
 
@@ -18,9 +27,225 @@ class Survey:
     SELECT observationId, fieldRA, fieldDec, filter, rotTelPos, altitude, skyBrightness, seeingFwhm500 
     FROM SummaryAllProps WHERE filter IS "r" ORDER BY random() LIMIT 50;
 
+    Full OpSim databases can be read directly with Survey.fromOpSim or streamed in chunks with
+    OpSimDatabase.
     """
     survey_file = 'survey.csv'
+    columns = ['observationId', 'fieldRA', 'fieldDec', 'filter', 'rotTelPos', 'altitude', 'skyBrightness', 'seeingFwhm500']
+
+    def __init__(self, table=None):
+        if table is None:
+            table = Table.read(os.path.join(dataDir, Survey.survey_file), names=Survey.columns)
+        self.table = table
+
+    @classmethod
+    def fromOpSim(cls, path, **kwargs):
+        """
+        Loads the observations of an OpSim database that pass a filter.
+
+        Parameters
+        ----------
+        path: string
+            The OpSim sqlite database.
+        **kwargs
+            Passed to OpSimDatabase.query (band, start, end, minAltitude, maxAltitude, columns).
+
+        Returns
+        -------
+        Survey
+            The selected observations.
+        """
+        with OpSimDatabase(path) as db:
+            return cls(db.query(**kwargs))
+
+    def pointing(self, observationId):
+        """
+        Parameters
+        ----------
+        observationId: int
+            The observation id.
+
+        Returns
+        -------
+        aos.projection.Pointing
+            The pointing of the observation, rotated by the column of Survey.rotationColumn.
+        """
+        row = self.table[np.nonzero(self.table['observationId'] == observationId)[0][0]]
+        return Pointing(row['fieldRA'], row['fieldDec'], row[Survey.rotationColumn(self.table)])
+
+    @staticmethod
+    def rotationColumn(table):
+        """
+        Parameters
+        ----------
+        table: astropy.table.Table
+            The LSST observations.
+
+        Returns
+        -------
+        string
+            The column with the rotation of the focal plane on the sky: rotSkyPos when the table
+            has it, e.g. when it was read from OpSim with that column.
+
+        Notes
+        -----
+        The sample in data/survey.csv has neither rotSkyPos nor the parallactic angle, so it
+        falls back to rotTelPos, the rotator angle, which is then used as if it were the sky
+        angle.
+        """
+        return 'rotSkyPos' if 'rotSkyPos' in table.colnames else 'rotTelPos'
+
+
+class OpSimDatabase:
+    """
+    Streams observations from an OpSim sqlite database.
+
+    Notes
+    -----
+    Filtering happens in the database and only the requested columns are read, so a full
+    10 year run (~2M visits) never has to be held in memory: iterate yields tables of at most
+    chunkSize rows. The database is opened read-only.
+
+    Parameters
+    ----------
+    path: string
+        The OpSim sqlite database.
+    table: string
+        The observation table; defaults to SummaryAllProps, or observations for newer OpSim
+        versions.
+
+    Attributes
+    ----------
+    path: string
+        The OpSim sqlite database.
+    table: string
+        The observation table.
+    names: list[string]
+        The columns of the observation table.
+
+    Raises
+    ------
+    ValueError
+        If the database has no observation table.
+    """
+    dtypes = {'observationId': 'i8', 'filter': 'U1', 'note': 'U64'}
+
+    def __init__(self, path, table=None):
+        self.path = path
+        self._connection = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+        tables = [row[0] for row in self._connection.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        if table is None:
+            table = next((name for name in ['SummaryAllProps', 'observations'] if name in tables), None)
+        if table not in tables:
+            self.close()
+            raise ValueError('{} has no observation table.'.format(path))
+        self.table = table
+        self.names = [row[1] for row in self._connection.execute('PRAGMA table_info("{}")'.format(table))]
+
+    def _select(self, band=None, start=None, end=None, minAltitude=None, maxAltitude=None, columns=None):
+        columns = Survey.columns if columns is None else list(columns)
+        unknown = set(columns) - set(self.names)
+        if unknown:
+            raise ValueError('unknown columns: {}'.format(', '.join(sorted(unknown))))
+        conditions, params = [], []
+        if band is not None:
+            conditions.append('filter = ?')
+            params.append(band)
+        for column, op, value in [('observationStartMJD', '>=', start), ('observationStartMJD', '<', end),
+                                  ('altitude', '>=', minAltitude), ('altitude', '<=', maxAltitude)]:
+            if value is not None:
+                conditions.append('{} {} ?'.format(column, op))
+                params.append(float(value))
+        sql = 'SELECT {} FROM "{}"'.format(', '.join('"{}"'.format(c) for c in columns), self.table)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY observationId' if 'observationId' in self.names else ''
+        dtype = np.dtype([(c, OpSimDatabase.dtypes.get(c, 'f8')) for c in columns])
+        return sql, params, dtype
+
+    def count(self, **kwargs):
+        """
+        Parameters
+        ----------
+        **kwargs
+            The filters of OpSimDatabase.query.
+
+        Returns
+        -------
+        int
+            The number of observations that pass the filters.
+        """
+        sql, params, _ = self._select(**kwargs)
+        return self._connection.execute('SELECT COUNT(*) FROM ({})'.format(sql), params).fetchone()[0]
+
+    def iterate(self, chunkSize=100000, **kwargs):
+        """
+        Streams the observations that pass a filter.
+
+        Parameters
+        ----------
+        chunkSize: int
+            The maximum number of rows per chunk; defaults to 100000.
+        **kwargs
+            The filters of OpSimDatabase.query.
+
+        Yields
+        ------
+        astropy.table.Table
+            The next chunk of observations.
+        """
+        sql, params, dtype = self._select(**kwargs)
+        cursor = self._connection.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunkSize)
+            if not rows:
+                break
+            yield Table(np.array(rows, dtype=dtype))
+
+    def query(self, band=None, start=None, end=None, minAltitude=None, maxAltitude=None, columns=None):
+        """
+        Loads the observations that pass a filter.
+
+        Parameters
+        ----------
+        band: str
+            Only observations in this filter; defaults to all.
+        start: float
+            Only observations starting at or after this MJD; defaults to no limit.
+        end: float
+            Only observations starting before this MJD; defaults to no limit.
+        minAltitude: float
+            Only observations at or above this altitude in degrees; defaults to no limit.
+        maxAltitude: float
+            Only observations at or below this altitude in degrees; defaults to no limit.
+        columns: list[string]
+            The columns to read; defaults to Survey.columns.
+
+        Returns
+        -------
+        astropy.table.Table
+            The selected observations, ordered by observationId.
+
+        Raises
+        ------
+        ValueError
+            If a column is not in the database.
+        """
+        kwargs = dict(band=band, start=start, end=end, minAltitude=minAltitude, maxAltitude=maxAltitude,
+                      columns=columns)
+        chunks = [np.asarray(chunk) for chunk in self.iterate(**kwargs)]
+        if not chunks:
+            return Table(np.zeros(0, dtype=self._select(**kwargs)[2]))
+        return Table(np.concatenate(chunks))
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self._connection.close()
+
+    def __enter__(self):
+        return self
 
-    def __init__(self):
-        self.table = Table.read(os.path.join(dataDir, Survey.survey_file),
-                        names=['observationId', 'fieldRA', 'fieldDec', 'filter', 'rotTelPos', 'altitude', 'skyBrightness', 'seeingFwhm500'])
\ No newline at end of file
+    def __exit__(self, *args):
+        self.close()
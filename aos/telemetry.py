@@ -0,0 +1,196 @@
+import os
+import ast
+import time
+import numpy as np
+from aos.state import BendingState
+
+
+class TelemetryLog:
+    """
+    Append-only, memory-mappable log of closed loop iterations.
+
+    Notes
+    -----
+    The file is a short header describing the record dtype followed by fixed-width records, one
+    per iteration and sensor. Appending writes a single record at the end of the file, and
+    readers memory-map whatever complete records exist, so a run can be analysed while it is
+    still going. Reopening an existing log continues appending to it.
+
+    Parameters
+    ----------
+    path: string
+        The path of the log file.
+    nZern: int
+        The number of zernike coefficients per record (Noll j=1..nZern, stored with the unused
+        0th coefficient like aos.estimator.WavefrontEstimator.estimate); defaults to 22.
+    length: int
+        The number of degrees of freedom per state; defaults to BendingState.LENGTH.
+    timings: tuple[str]
+        The names of the per-iteration timings in seconds; defaults to
+        ('simulate', 'estimate', 'solve', 'control').
+
+    Attributes
+    ----------
+    path: string
+        The path of the log file.
+    dtype: numpy.dtype
+        The record dtype.
+
+    Raises
+    ------
+    ValueError
+        If an existing file is not a telemetry log, or nZern, length or timings do not match it.
+    """
+    MAGIC = b'AOSTLM01'
+    ALIGN = 64
+
+    def __init__(self, path, nZern=22, length=BendingState.LENGTH,
+                 timings=('simulate', 'estimate', 'solve', 'control')):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.dtype, offset = TelemetryLog._readHeader(path)
+            stored = [('nZern', self.dtype['zernikes'].shape[0] - 1), ('length', self.dtype['x'].shape[0]),
+                      ('timings', tuple(self.dtype['timings'].names))]
+            for (name, value), expected in zip(stored, [nZern, length, tuple(timings)]):
+                if value != expected:
+                    raise ValueError('{} does not match the log: {}'.format(name, value))
+            # drop a partially written trailing record
+            self._count = (os.path.getsize(path) - offset) // self.dtype.itemsize
+            with open(path, 'r+b') as f:
+                f.truncate(offset + self._count * self.dtype.itemsize)
+        else:
+            self.dtype = TelemetryLog.recordDtype(nZern, length, timings)
+            TelemetryLog._writeHeader(path, self.dtype)
+            self._count = 0
+        self._file = open(path, 'ab')
+        self._record = np.zeros(1, dtype=self.dtype)
+
+    @staticmethod
+    def recordDtype(nZern=22, length=BendingState.LENGTH,
+                    timings=('simulate', 'estimate', 'solve', 'control')):
+        """
+        Parameters
+        ----------
+        nZern: int
+            The number of zernike coefficients per record; defaults to 22.
+        length: int
+            The number of degrees of freedom per state; defaults to BendingState.LENGTH.
+        timings: tuple[str]
+            The names of the per-iteration timings in seconds.
+
+        Returns
+        -------
+        numpy.dtype
+            The fixed-width record dtype.
+        """
+        return np.dtype([
+            ('iteration', 'i8'),
+            ('sensor', 'i4'),
+            ('time', 'f8'),
+            ('x', 'f8', (length,)),
+            ('xest', 'f8', (length,)),
+            ('xdelta', 'f8', (length,)),
+            ('zernikes', 'f8', (nZern + 1,)),
+            ('metric', 'f8'),
+            ('timings', [(name, 'f8') for name in timings]),
+        ])
+
+    @staticmethod
+    def _writeHeader(path, dtype):
+        header = repr({'descr': np.lib.format.dtype_to_descr(dtype)}).encode()
+        size = len(TelemetryLog.MAGIC) + 4 + len(header) + 1
+        header += b' ' * (-size % TelemetryLog.ALIGN) + b'\n'
+        with open(path, 'wb') as f:
+            f.write(TelemetryLog.MAGIC)
+            f.write(np.uint32(len(header)).tobytes())
+            f.write(header)
+
+    @staticmethod
+    def _readHeader(path):
+        with open(path, 'rb') as f:
+            if f.read(len(TelemetryLog.MAGIC)) != TelemetryLog.MAGIC:
+                raise ValueError('{} is not a telemetry log.'.format(path))
+            length = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            header = ast.literal_eval(f.read(length).decode())
+        dtype = np.lib.format.descr_to_dtype(header['descr'])
+        return dtype, len(TelemetryLog.MAGIC) + 4 + length
+
+    def append(self, iteration, sensor=0, x=None, xest=None, xdelta=None, zernikes=None,
+               metric=np.nan, **timings):
+        """
+        Appends one record.
+
+        Parameters
+        ----------
+        iteration: int
+            The closed loop iteration.
+        sensor: int
+            The wavefront sensor index; defaults to 0.
+        x: aos.state.State | numpy.ndarray
+            The true optical state; defaults to NaN.
+        xest: aos.state.State | numpy.ndarray
+            The estimated optical state; defaults to NaN.
+        xdelta: aos.state.State | numpy.ndarray
+            The applied update; defaults to NaN.
+        zernikes: numpy.ndarray
+            The estimated zernike coefficients; defaults to NaN.
+        metric: float
+            The metric value; defaults to NaN.
+        **timings: float
+            Timings in seconds, by name; missing timings are NaN.
+
+        Raises
+        ------
+        ValueError
+            If a timing is not one of the log's timings.
+        """
+        record = self._record
+        record['iteration'] = iteration
+        record['sensor'] = sensor
+        record['time'] = time.time()
+        for name, value in [('x', x), ('xest', xest), ('xdelta', xdelta), ('zernikes', zernikes)]:
+            record[name] = np.nan if value is None else getattr(value, 'array', value)
+        record['metric'] = metric
+        for name in self.dtype['timings'].names:
+            record['timings'][name] = timings.pop(name, np.nan)
+        if timings:
+            raise ValueError('unknown timings: {}'.format(', '.join(timings)))
+        self._file.write(record.tobytes())
+        self._file.flush()
+        self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def read(path):
+        """
+        Memory-maps the complete records of a telemetry log.
+
+        Parameters
+        ----------
+        path: string
+            The path of the log file.
+
+        Returns
+        -------
+        numpy.ndarray
+            A read-only structured array view of the records.
+        """
+        dtype, offset = TelemetryLog._readHeader(path)
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+    def close(self):
+        """
+        Closes the log for writing.
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
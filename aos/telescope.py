@@ -19,11 +19,14 @@ class Telescope:
     ----------
     optic: batoid.optic.CompoundOptic
         The optical system.
+    state: aos.state.State | None
+        The sum of the updates applied to the optic; None before the first update.
     """
     OFFSET = 1.5e-3
 
     def __init__(self, optic):
         self.optic = optic
+        self.state = None
 
     @property
     def intra(self):
@@ -74,6 +77,8 @@ class Telescope:
         -----
         Rotations only commute for small angles; otherwise order matters.
         """
+        total = deltax.array if self.state is None else self.state.array + deltax.array
+        self.state = type(deltax)(np.array(total, dtype=float))
         camx, camy, camz, camrx, camry = deltax.camhex
         self.optic = self.optic.withGloballyShiftedOptic('LSST.LSSTCamera', [camx, camy, camz])
         camrot = np.dot(batoid.RotX(camrx), batoid.RotY(camry))
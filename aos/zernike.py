@@ -0,0 +1,299 @@
+import numpy as np
+from functools import lru_cache
+from scipy.special import comb
+
+
+@lru_cache(maxsize=None)
+def nollToZernike(j):
+    """
+    Converts a Noll (1976) index to radial and azimuthal zernike indices.
+
+    Parameters
+    ----------
+    j: int
+        The Noll index, starting at j=1.
+
+    Returns
+    -------
+    int, int
+        The radial index n and the azimuthal index m.
+    """
+    if j < 1:
+        raise ValueError('Noll indices start at j=1.')
+    n = 0
+    while (n + 1) * (n + 2) // 2 < j:
+        n += 1
+    # position of j within radial order n; each non-zero |m| appears twice
+    k = j - n * (n + 1) // 2 - 1
+    if n % 2 == 0:
+        m = 2 * ((k + 1) // 2)
+    else:
+        m = 2 * (k // 2) + 1
+    # Noll convention: even j are cosine terms (m > 0), odd j are sine terms (m < 0).
+    if m != 0 and j % 2 == 1:
+        m = -m
+    return n, m
+
+
+def _zernikeNorm(n, m):
+    """
+    Normalization so that each polynomial has unit variance over the pupil.
+    """
+    return np.sqrt(n + 1) if m == 0 else np.sqrt(2 * n + 2)
+
+
+@lru_cache(maxsize=None)
+def _circularRadialCoefficients(n, m):
+    """
+    Coefficients of rho^k for the circular radial polynomial R(n, m).
+    """
+    m = abs(m)
+    out = np.zeros(n + 1)
+    for k in range((n - m) // 2 + 1):
+        out[n - 2 * k] = (-1) ** k * comb(n - k, k, exact=True) * comb(n - 2 * k, (n - m) // 2 - k, exact=True)
+    return out
+
+
+# The following three functions implement the recurrences of
+# "Zernike annular polynomials for imaging systems with annular pupils",
+# Mahajan (1981) JOSA Vol. 71, No. 1.
+
+@lru_cache(maxsize=None)
+def _h(m, j, eps):
+    if m == 0:  # Equation (A5)
+        return (1 - eps ** 2) / (2 * (2 * j + 1))
+    num = -(2 * (2 * j + 2 * m - 1)) * _Q(m - 1, j + 1, eps)[0]
+    den = (j + m) * (1 - eps ** 2) * _Q(m - 1, j, eps)[0]
+    return num / den * _h(m - 1, j, eps)
+
+
+@lru_cache(maxsize=None)
+def _Q(m, j, eps):
+    if m == 0:  # Equation (A4)
+        return annularRadialCoefficients(2 * j, 0, eps)[::2]
+    num = 2 * (2 * j + 2 * m - 1) * _h(m - 1, j, eps)
+    den = (j + m) * (1 - eps ** 2) * _Q(m - 1, j, eps)[0]
+    summation = np.zeros(j + 1)
+    for i in range(j + 1):
+        qq = _Q(m - 1, i, eps)
+        summation[:i + 1] += qq * qq[0] / _h(m - 1, i, eps)
+    return summation * num / den
+
+
+@lru_cache(maxsize=None)
+def annularRadialCoefficients(n, m, eps):
+    """
+    Computes the coefficients of the annular radial polynomial R(n, m).
+
+    Notes
+    -----
+    Results are cached; the returned array is read-only.
+
+    Parameters
+    ----------
+    n: int
+        The radial index.
+    m: int
+        The azimuthal index; only abs(m) matters.
+    eps: float
+        The fractional linear obscuration (inner radius / outer radius).
+
+    Returns
+    -------
+    numpy.ndarray
+        Coefficients of rho^k for k = 0..n.
+    """
+    m = abs(m)
+    if not 0 <= eps < 1:
+        raise ValueError('eps must be in [0, 1).')
+    if eps == 0:
+        out = _circularRadialCoefficients(n, m).copy()
+    elif m == 0:  # Equation (18)
+        out = np.zeros(n + 1)
+        norm = 1 / (1 - eps ** 2)
+        for i, coef in enumerate(_circularRadialCoefficients(n, 0)):
+            if i % 2 == 1 or coef == 0:
+                continue
+            j = i // 2
+            # expand ((rho^2 - eps^2) / (1 - eps^2))^j in powers of rho^2
+            k = np.arange(j + 1)
+            out[0:i + 1:2] += coef * norm ** j * comb(j, k) * (-eps ** 2) ** (j - k)
+    elif m == n:  # Equation (25)
+        out = np.zeros(n + 1)
+        out[n] = 1 / np.sqrt(np.sum((eps ** 2) ** np.arange(n + 1)))
+    else:  # Equation (A1)
+        out = np.zeros(n + 1)
+        j = (n - m) // 2
+        norm = np.sqrt((1 - eps ** 2) / (2 * (2 * j + m + 1) * _h(m, j, eps)))
+        out[m::2] = norm * _Q(m, j, eps)
+    out.setflags(write=False)
+    return out
+
+
+@lru_cache(maxsize=None)
+def annularCoefficients(jmax, eps):
+    """
+    Computes the normalized radial coefficients for Noll indices 1..jmax.
+
+    Notes
+    -----
+    Each polynomial is written as norm * P(rho^2) * rho^|m| * (cos|m|theta | sin|m|theta),
+    so only the even-step coefficients in rho^2 are stored. Results are cached; the returned
+    array is read-only.
+
+    Parameters
+    ----------
+    jmax: int
+        The maximum Noll index.
+    eps: float
+        The fractional linear obscuration (inner radius / outer radius).
+
+    Returns
+    -------
+    numpy.ndarray
+        A (jmax + 1, nmax // 2 + 1) array; row j holds the coefficients of (rho^2)^k of Noll
+        polynomial j. Row 0 is all zeros.
+    """
+    nmax = nollToZernike(jmax)[0]
+    out = np.zeros((jmax + 1, nmax // 2 + 1))
+    for j in range(1, jmax + 1):
+        n, m = nollToZernike(j)
+        coefs = annularRadialCoefficients(n, m, eps)[abs(m)::2]
+        out[j, :len(coefs)] = _zernikeNorm(n, m) * coefs
+    out.setflags(write=False)
+    return out
+
+
+def zernikeBasis(jmax, x, y, outRadius=1.0, inRadius=0.0, dtype=np.float64):
+    """
+    Evaluates the annular zernike polynomials up to Noll index jmax on a set of points.
+
+    Notes
+    -----
+    The coefficients are indexed by the Noll (1976) convention, which starts at j=1. The 0th
+    basis vector is all zeros so that it does not impact least squares fits.
+
+    Powers of rho^2 and of (x + iy) are built once by recurrence and shared between all
+    polynomials, and each radial polynomial is only evaluated once per (n, |m|).
+
+    Parameters
+    ----------
+    jmax: int
+        The maximum Noll index.
+    x: numpy.ndarray
+        The x coordinates of the points.
+    y: numpy.ndarray
+        The y coordinates of the points; same shape as x.
+    outRadius: float
+        The outer radius of the annulus; defaults to 1.
+    inRadius: float
+        The inner radius of the annulus; defaults to 0.
+    dtype: numpy.dtype
+        float32 or float64; defaults to float64.
+
+    Returns
+    -------
+    numpy.ndarray
+        A (jmax + 1, *x.shape) array of basis vectors.
+    """
+    dtype = np.dtype(dtype)
+    ctype = np.result_type(dtype, np.complex64)
+    eps = float(inRadius) / float(outRadius)
+    coefs = annularCoefficients(jmax, eps)
+    nmax = nollToZernike(jmax)[0]
+
+    x = np.asarray(x, dtype=dtype) / dtype.type(outRadius)
+    y = np.asarray(y, dtype=dtype) / dtype.type(outRadius)
+    # the annular coefficients cancel strongly, so the radial polynomials are always summed in
+    # float64 and only cast to dtype once
+    rho2 = np.square(x, dtype=np.float64) + np.square(y, dtype=np.float64)
+
+    # (x + iy)^m = rho^m (cos m theta + i sin m theta)
+    zpow = [np.ones(x.shape, dtype=ctype)]
+    z = (x + 1j * y).astype(ctype)
+    for _ in range(nmax):
+        zpow.append(zpow[-1] * z)
+
+    out = np.zeros((jmax + 1,) + x.shape, dtype=dtype)
+    radial = dict()
+    for j in range(1, jmax + 1):
+        n, m = nollToZernike(j)
+        key = (n, abs(m))
+        if key not in radial:
+            # Horner's scheme in rho^2
+            kmax = (n - abs(m)) // 2
+            poly = np.full(x.shape, coefs[j, kmax])
+            for k in range(kmax - 1, -1, -1):
+                poly *= rho2
+                poly += coefs[j, k]
+            radial[key] = poly.astype(dtype)
+        if m == 0:
+            out[j] = radial[key]
+        elif m > 0:
+            out[j] = radial[key] * zpow[m].real
+        else:
+            out[j] = radial[key] * zpow[-m].imag
+    return out
+
+
+@lru_cache(maxsize=16)
+def gridBasis(jmax, nx, outRadius, inRadius, dtype=np.float64):
+    """
+    Evaluates the annular zernike polynomials on a square pupil grid.
+
+    Notes
+    -----
+    The grid spans [-outRadius, outRadius] with nx points in each dimension, matching the
+    wavefront images from aos.simulator.WavefrontSimulator. Results are cached; the returned
+    array is read-only.
+
+    Parameters
+    ----------
+    jmax: int
+        The maximum Noll index.
+    nx: int
+        The number of pixels in each dimension.
+    outRadius: float
+        The outer radius of the annulus.
+    inRadius: float
+        The inner radius of the annulus.
+    dtype: numpy.dtype
+        float32 or float64; defaults to float64.
+
+    Returns
+    -------
+    numpy.ndarray
+        A (jmax + 1, nx, nx) array of basis images.
+    """
+    space = np.linspace(-outRadius, outRadius, nx)
+    X, Y = np.meshgrid(space, space)
+    out = zernikeBasis(jmax, X, Y, outRadius, inRadius, dtype=dtype)
+    out.setflags(write=False)
+    return out
+
+
+def evaluate(coefs, x, y, outRadius=1.0, inRadius=0.0):
+    """
+    Evaluates a series of annular zernike polynomials on a set of points.
+
+    Parameters
+    ----------
+    coefs: numpy.ndarray
+        The zernike coefficients, indexed by the Noll (1976) convention starting at j=1.
+    x: numpy.ndarray
+        The x coordinates of the points.
+    y: numpy.ndarray
+        The y coordinates of the points; same shape as x.
+    outRadius: float
+        The outer radius of the annulus; defaults to 1.
+    inRadius: float
+        The inner radius of the annulus; defaults to 0.
+
+    Returns
+    -------
+    numpy.ndarray
+        The series evaluated at each point.
+    """
+    coefs = np.asarray(coefs)
+    basis = zernikeBasis(len(coefs) - 1, x, y, outRadius, inRadius)
+    return np.tensordot(coefs, basis, axes=1)
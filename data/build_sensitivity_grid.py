@@ -0,0 +1,26 @@
+"""
+This script builds the sensitivity grid used by aos.solver.SensitivitySolver away from the
+field center, data/sensitivity_grid_20dof.npy.
+
+The grid covers the focal plane, including the corner wavefront sensors, with 0.25 degree
+spacing. With --corners, it only covers the 4 corner wavefront sensors
+(SensitivityGrid.cornerAxes), which is enough for MultiFieldSensitivitySolver and
+aos.batch.SurveyRunner and takes 16 instead of 225 field positions. Traces are cached in
+data/cache, so an interrupted run can be restarted. Both need batoid and the mirror bending
+modes, data/M1M3_bending_modes.npy and data/M2_bending_modes.npy.
+"""
+import argparse
+import numpy as np
+from aos.sensitivity import SensitivityBuilder
+from aos.solver import SensitivitySolver, SensitivityGrid
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corners', action='store_true', help='only cover the corner wavefront sensors')
+    args = parser.parse_args()
+    if args.corners:
+        fieldx, fieldy = SensitivityGrid.cornerAxes()
+    else:
+        fieldx = fieldy = np.linspace(-1.75, 1.75, 15)
+    SensitivityBuilder().buildGrid(fieldx, fieldy).save(SensitivitySolver.gridPath)
+    print(SensitivitySolver.gridPath)
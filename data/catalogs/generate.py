@@ -1,12 +1,16 @@
 """
 This script generates the gaia catalogs.
+
+Catalogs that already exist are skipped, so an interrupted run can be restarted. Catalogs
+made before the wavefront sensors were projected and rotated with each pointing's rotation
+(see Survey.rotationColumn) must be deleted to be regenerated.
 """
-from time import time
 from aos.survey import Survey
-from aos.focal_plane import WavefrontSensors
-from aos.catalog import GaiaCatalog
+from aos.catalog import CatalogPipeline
 
-for obs, ra, dec in Survey().table['observationId', 'fieldRA', 'fieldDec']:
-    print(time())
-    ws = WavefrontSensors(ra, dec)
-    GaiaCatalog.launch_query(ws, f'gaia_catalog_{obs}.csv', mag_cutoff=25, verbose=False)
\ No newline at end of file
+if __name__ == '__main__':
+    table = Survey().table
+    columns = ['observationId', 'fieldRA', 'fieldDec', Survey.rotationColumn(table)]
+    results = CatalogPipeline(maxConcurrent=4, mag_cutoff=25).run(table[columns])
+    for obs, status in results.items():
+        print(obs, status)
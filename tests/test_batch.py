@@ -0,0 +1,60 @@
+import os
+import numpy as np
+from aos.batch import SurveyRunner
+from aos.sensitivity import SensitivityBuilder
+from aos.solver import SensitivityGrid
+from aos.survey import Survey
+from aos.telemetry import TelemetryLog
+
+
+def test_survey_runner(tmp_path):
+    # the observation keeps its rotation; stars are placed with the rotation of its catalog
+    observations = Survey().table[:1]
+    # a coarse grid spanning the wavefront sensors, traced at low resolution to keep the test fast
+    grid = SensitivityBuilder(nx=63, processes=1, cacheDir=str(tmp_path / 'cache')).buildGrid([-1.5, 1.5], [-1.5, 1.5])
+    runner = SurveyRunner(outputDir=str(tmp_path), iterations=2, grid=grid, processes=1)
+    observationId = int(observations['observationId'][0])
+
+    assert runner.run(observations) == {observationId: 'done'}
+    assert os.path.exists(runner.checkpoint(observationId))
+    assert runner.run(observations) == {observationId: 'skipped'}
+
+    results = SurveyRunner.results(runner.summarize())
+    assert len(results) == 1
+    assert results['observationId'][0] == observationId
+    assert results['rotation'][0] == observations['rotTelPos'][0]
+    assert results['metric'].shape == (1, 3)
+    assert np.all(np.isfinite(results['metric']))
+    available = np.isfinite(results['fields'][0, :, 0])
+    assert np.any(available)
+
+    telemetry = TelemetryLog.read(os.path.join(str(tmp_path), 'telemetry', f'{observationId}.tlm'))
+    assert len(telemetry) == 2 * np.sum(available)
+    np.testing.assert_array_equal(np.unique(telemetry['iteration']), [0, 1])
+    np.testing.assert_array_equal(np.unique(telemetry['sensor']), np.nonzero(available)[0])
+    np.testing.assert_allclose(telemetry['metric'][-1], results['metric'][0, -1])
+
+
+def _emptyGrid():
+    return SensitivityGrid(np.array([-2., 2.]), np.array([-2., 2.]), np.zeros((2, 2, 22, 20)), np.zeros((2, 2, 22)))
+
+
+def test_survey_runner_summarize(tmp_path):
+    runner = SurveyRunner(outputDir=str(tmp_path), iterations=1, grid=_emptyGrid())
+    os.makedirs(os.path.join(str(tmp_path), 'checkpoints'))
+    for observationId in [3, 1, 2]:
+        record = np.zeros((), dtype=runner.dtype)
+        record['observationId'] = observationId
+        record['metric'] = [2., 1.]
+        np.save(runner.checkpoint(observationId), record)
+
+    results = SurveyRunner.results(runner.summarize())
+    np.testing.assert_array_equal(results['observationId'], [1, 2, 3])
+    np.testing.assert_array_equal(results['metric'][:, 1], 1.)
+    assert runner.run(Survey().table[:0]) == dict()
+
+    # a new summary replaces the old one and leaves no temporary directories behind
+    os.remove(runner.checkpoint(2))
+    results = SurveyRunner.results(runner.summarize())
+    np.testing.assert_array_equal(results['observationId'], [1, 3])
+    assert sorted(os.listdir(str(tmp_path))) == ['checkpoints', 'results']
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from aos.benchmark import BenchmarkSuite, main
+
+
+def test_benchmark_suite(tmp_path):
+    suite = BenchmarkSuite(repeat=2, minTime=0.001)
+    results = suite.run(['evaluate', 'solve[batch'])
+    assert set(results['benchmarks']) == {'evaluate', 'solve[batch=1000]'}
+    result = results['benchmarks']['evaluate']
+    assert 0 < result['min'] <= result['median']
+    assert result['repeat'] == 2
+    assert 'numpy' in results['meta']
+
+    path = str(tmp_path / 'results.json')
+    BenchmarkSuite.write(results, path)
+    assert BenchmarkSuite.read(path) == results
+
+
+def test_benchmark_compare():
+    baseline = {'benchmarks': {'a': {'median': 1.0}, 'b': {'median': 1.0}, 'c': {'median': 1.0},
+                               'd': {'skipped': 'no batoid'}}}
+    results = {'benchmarks': {'a': {'median': 1.5}, 'b': {'median': 1.1}, 'c': {'median': 0.5},
+                              'd': {'median': 1.0}, 'e': {'median': 1.0}}}
+    comparison = BenchmarkSuite.compare(results, baseline, tolerance=0.2)
+    assert {name: c['status'] for name, c in comparison.items()} == {
+        'a': 'regression', 'b': 'ok', 'c': 'improvement', 'd': 'missing', 'e': 'missing'}
+    np.testing.assert_allclose(comparison['a']['ratio'], 1.5)
+
+
+def test_benchmark_main(tmp_path):
+    path = str(tmp_path / 'results.json')
+    assert main(['--output', path, '--repeat', '1', 'evaluate']) == 0
+
+    baseline = BenchmarkSuite.read(path)
+    baseline['benchmarks']['evaluate']['median'] /= 100
+    BenchmarkSuite.write(baseline, str(tmp_path / 'baseline.json'))
+    assert main(['--output', path, '--repeat', '1', '--baseline', str(tmp_path / 'baseline.json'), 'evaluate']) == 1
+
+
+def test_benchmark_skipped():
+    def missing():
+        raise ImportError('no batoid')
+
+    suite = BenchmarkSuite(repeat=1, minTime=0)
+    suite.cases = {'missing': missing, 'evaluate': suite.cases['evaluate']}
+    results = suite.run()['benchmarks']
+    assert results['missing'] == {'skipped': 'no batoid'}
+    assert results['evaluate']['number'] == 1
+
+
+def test_benchmark_batoid_cases():
+    pytest.importorskip('batoid')
+    from aos.telescope import BendingTelescope
+    # the cases bend their own mirrors, not the defaults shared by BendingTelescope.nominal
+    shared = BendingTelescope.nominal().m2res.surfResidual.copy()
+    suite = BenchmarkSuite(repeat=1, minTime=0)
+    results = suite.run(['nx=63', 'nphot=10000', 'estimate', 'solve', 'update', 'catalog', 'closedLoop'])
+    assert len(results['benchmarks']) == 8
+    for result in results['benchmarks'].values():
+        assert 0 < result['min'] <= result['median']
+    np.testing.assert_array_equal(BendingTelescope.nominal().m2res.surfResidual, shared)
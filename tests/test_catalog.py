@@ -1,7 +1,12 @@
 import os
+import numpy as np
+from collections import OrderedDict
 from numpy.testing import assert_raises
-from aos.catalog import GaiaCatalog
-from aos.focal_plane import WavefrontSensors
+from astropy.table import Table
+from aos import catDir
+from aos.catalog import GaiaCatalog, CatalogPipeline, CatalogBackend, SQLiteBackend
+from aos.focal_plane import WavefrontSensors, Chip
+
 
 def test_gaia_launch_query():
     ws = WavefrontSensors()
@@ -14,7 +19,187 @@ def test_gaia_launch_query():
     GaiaCatalog.launch_query(ws, 'test.csv', test=True)
     assert True
 
+
 def test_gaia_catalog():
     gc = GaiaCatalog()
     for c in {'source_id', 'ra', 'dec', 'teff_val', 'phot_g_mean_mag', 'phot_bp_mean_mag', 'phot_rp_mean_mag', 'focal', 'lsst_r_mag'}:
-        assert c in gc.table.columns
\ No newline at end of file
+        assert c in gc.table.columns
+    assert gc.rotation == 0
+
+
+def test_gaia_catalog_columnar(tmp_path, monkeypatch):
+    monkeypatch.setattr(GaiaCatalog, 'columnarDir', str(tmp_path))
+    gc = GaiaCatalog()
+    assert os.path.exists(os.path.join(str(tmp_path), 'gaia_catalog_19436', 'ra.npy'))
+
+    ra = gc['ra']
+    assert not ra.data.flags.writeable
+    assert set(gc._columns) == {'ra'}
+
+    ref = Table.read(os.path.join(catDir, 'gaia_catalog_19436.csv'))
+    for name in ref.colnames:
+        np.testing.assert_array_equal(gc.table[name], ref[name])
+    np.testing.assert_array_equal(gc['teff_val'].mask, ref['teff_val'].mask)
+
+    # second load reuses the cache
+    assert GaiaCatalog().names == ref.colnames
+
+    # a stale cache is replaced while open memory maps stay readable
+    os.utime(gc.path, (0, 0))
+    assert GaiaCatalog().names == ref.colnames
+    np.testing.assert_array_equal(ra, ref['ra'])
+    assert os.listdir(str(tmp_path)) == ['gaia_catalog_19436']
+
+
+def test_gaia_catalog_spatial_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(GaiaCatalog, 'columnarDir', str(tmp_path))
+    monkeypatch.setattr(GaiaCatalog, '_indices', OrderedDict())
+    gc = GaiaCatalog()
+    # the shipped catalogs were queried with the chip corners offset by the pointing of
+    # observation 19436 in data/survey.csv, without projection or rotation
+    names, corners, focals = WavefrontSensors.geometry()
+    chips = [Chip(name, corners[i] + [37.9606155841983, -28.435341804705], focals[i]) for i, name in enumerate(names)]
+    focal = np.asarray(gc['focal'])
+    total = 0
+    for chip in chips:
+        mask = gc.onChip(chip)
+        np.testing.assert_array_equal(mask, chip.contains(gc['ra'], gc['dec']))
+        assert np.all(focal[mask] == chip.focal)
+        total += np.sum(mask)
+    assert total == len(focal)
+    assert GaiaCatalog(19436).index is gc.index
+
+    # the tree is persisted with its version and reused by other processes
+    path = os.path.join(gc.path, 'index.pickle')
+    assert os.path.exists(path)
+    tree = gc.index
+    GaiaCatalog._indices.clear()
+    loaded = GaiaCatalog(19436).index
+    assert loaded is not tree
+    np.testing.assert_array_equal(loaded.data, tree.data)
+    GaiaCatalog._indices.clear()
+    monkeypatch.setattr(GaiaCatalog, 'indexVersion', GaiaCatalog.indexVersion + 1)
+    with open(path, 'rb') as r:
+        stale = r.read()
+    GaiaCatalog(19436).index
+    with open(path, 'rb') as r:
+        assert r.read() != stale
+
+    dist, ind = gc.nearestNeighbours()
+    ra, dec = np.asarray(gc['ra']), np.asarray(gc['dec'])
+    assert ind[0, 0] != 0
+    assert 0 in gc.queryRadius(ra[ind[0, 0]], dec[ind[0, 0]], dist[0, 0] * 1.01)
+
+    radius = 10 / 3600
+    isolated = gc.isolated(radius)
+    assert np.array_equal(isolated, dist[:, 0] > radius)
+    assert np.all(gc.isolated(radius, magnitudeGap=2) >= isolated)
+
+    # only the most recently used trees are kept
+    monkeypatch.setattr(GaiaCatalog, 'indexCacheSize', 1)
+    GaiaCatalog(129928).index
+    assert list(GaiaCatalog._indices) == [129928]
+
+
+def test_gaia_catalog_on_chip_ra_wrap(tmp_path, monkeypatch):
+    # move the sources so that one chip of observation 19436 straddles ra=0
+    ref = Table.read(os.path.join(catDir, 'gaia_catalog_19436.csv'))
+    shift = 1.25 - 37.9606155841983
+    ref['ra'] = (ref['ra'] + shift) % 360
+    ref.write(str(tmp_path / 'gaia_catalog_19436.csv'))
+    monkeypatch.setattr('aos.catalog.catDir', str(tmp_path))
+    monkeypatch.setattr(GaiaCatalog, 'columnarDir', str(tmp_path / 'columnar'))
+    monkeypatch.setattr(GaiaCatalog, '_indices', OrderedDict())
+    gc = GaiaCatalog()
+
+    names, corners, focals = WavefrontSensors.geometry()
+    offset = [37.9606155841983 + shift, -28.435341804705]
+    corners = corners + offset
+    corners[..., 0] %= 360
+    chips = [Chip(name, corners[i], focals[i]) for i, name in enumerate(names)]
+    straddling = [chip for chip in chips if np.ptp(chip.corners[:, 0]) > 180]
+    assert straddling
+    for chip in straddling:
+        mask = gc.onChip(chip)
+        assert np.sum(mask) > 0
+        np.testing.assert_array_equal(mask, chip.contains(gc['ra'], gc['dec']))
+
+
+def test_catalog_pipeline(tmp_path):
+    ref = Table.read(os.path.join(catDir, 'gaia_catalog_19436.csv'))
+    db = str(tmp_path / 'gaia.db')
+    SQLiteBackend.write(ref, db)
+    pipeline = CatalogPipeline(SQLiteBackend(db), outputDir=str(tmp_path), maxConcurrent=2)
+    observations = [(19436, 37.9606155841983, -28.435341804705), (1, 180, 0)]
+
+    assert pipeline.run(observations) == {19436: 'done', 1: 'done'}
+    out = Table.read(pipeline.path(19436))
+    ws = WavefrontSensors(37.9606155841983, -28.435341804705)
+    onChips = {focal: np.any([chip.contains(ref['ra'], ref['dec']) for chip in chips], axis=0)
+               for focal, chips in [('intra', ws.intras), ('extra', ws.extras)]}
+    assert len(out) == np.sum(onChips['intra'] | onChips['extra'])
+    assert np.sum(out['focal'] == 'intra') == np.sum(onChips['intra'])
+    expected = ref['lsst_r_mag'][onChips['intra'] | onChips['extra']]
+    np.testing.assert_allclose(np.sort(out['lsst_r_mag']), np.sort(expected))
+    assert len(Table.read(pipeline.path(1))) == 0
+
+    assert pipeline.run(observations) == {19436: 'skipped', 1: 'skipped'}
+
+    # the chips are rotated with the focal plane
+    assert pipeline.run([(2, 37.9606155841983, -28.435341804705, 2)]) == {2: 'done'}
+    ws = WavefrontSensors(37.9606155841983, -28.435341804705, 2)
+    onChip = np.any([chip.contains(ref['ra'], ref['dec']) for chip in ws.intras + ws.extras], axis=0)
+    rotated = Table.read(pipeline.path(2))
+    assert len(rotated) == np.sum(onChip)
+    assert set(rotated['source_id']) != set(out['source_id'])
+    assert np.all(rotated['rotation'] == 2)
+
+
+def test_sqlite_backend_ra_wrap(tmp_path):
+    ref = Table.read(os.path.join(catDir, 'gaia_catalog_19436.csv'))
+    # move the sources so that an intra-focal chip of a pointing at ra=358.75 straddles ra=0
+    ref['ra'] = (ref['ra'] - 37.9606155841983 + 358.75) % 360
+    db = str(tmp_path / 'gaia.db')
+    SQLiteBackend.write(ref, db)
+    ws = WavefrontSensors(358.75, -28.435341804705)
+    assert np.ptp(ws.intras[2].corners[:, 0]) > 180
+
+    out = SQLiteBackend(db).query(ws.intras, 25)
+    onChip = np.any([chip.contains(ref['ra'], ref['dec']) for chip in ws.intras], axis=0)
+    assert np.sum(ws.intras[2].contains(ref['ra'], ref['dec'])) > 0
+    assert len(out) == np.sum(onChip)
+    assert np.any(out['ra'] > 359) and np.any(out['ra'] < 1)
+
+
+class FlakyBackend(CatalogBackend):
+    def __init__(self, failures):
+        self.failures = failures
+
+    def query(self, chips, mag_cutoff):
+        if self.failures > 0:
+            self.failures -= 1
+            raise IOError('timeout')
+        return Table(names=CatalogBackend.columns, dtype=['i8'] + ['f8'] * 6)
+
+
+def test_catalog_pipeline_retries(tmp_path):
+    pipeline = CatalogPipeline(FlakyBackend(2), outputDir=str(tmp_path), retries=2, backoff=0)
+    assert pipeline.run([(1, 0, 0)]) == {1: 'done'}
+    pipeline = CatalogPipeline(FlakyBackend(5), outputDir=str(tmp_path), retries=1, backoff=0)
+    assert pipeline.run([(2, 0, 0)]) == {2: 'failed'}
+    assert not os.path.exists(pipeline.path(2))
+    with open(pipeline.path(2).replace('.csv', '.err')) as f:
+        assert 'timeout' in f.read()
+
+
+def test_gaia_catalog_field_angles():
+    gc = GaiaCatalog()
+    fx, fy = gc.fieldAngles()
+    assert fx is gc.fieldAngles()[0]
+    # the cache belongs to the instance
+    other = GaiaCatalog().fieldAngles()[0]
+    assert other is not fx
+    np.testing.assert_array_equal(other, fx)
+    # wavefront sensors are in the corners of the 3.5 degree field
+    r = np.hypot(fx, fy)
+    assert np.all((r > 1) & (r < 2))
@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
-from aos.metric import SumOfSquares
-from aos.control import Controller, GainController
+from aos.metric import Metric, SumOfSquares
+from aos.control import Controller, GainController, ModelPredictiveController
 from aos.state import BendingState
 
 
@@ -25,3 +25,64 @@ def test_gain_controller():
 
     np.testing.assert_array_almost_equal(xprime.array, (x.array * (1 - gain)))
     np.testing.assert_array_almost_equal(xdelta.array, (-x.array * gain))
+
+
+class ShiftedSquares(Metric):
+    def evaluate(self, x):
+        return np.sum((x - 1) ** 2)
+
+    def gradient(self, x):
+        return 2 * (x - 1)
+
+
+def test_gain_controller_numerical():
+    controller = GainController(ShiftedSquares())
+    x = BendingState()
+    xprime, xdelta = controller.nextState(x)
+    np.testing.assert_allclose(xprime.array, 1, atol=1e-6)
+
+    xprime, xdelta = controller.nextState(xprime)
+    np.testing.assert_allclose(xdelta.array, 0, atol=1e-6)
+
+
+def test_gain_controller_closed_form():
+    controller = GainController(SumOfSquares())
+    np.testing.assert_array_equal(controller.optimum(BendingState.LENGTH), 0)
+    assert BendingState.LENGTH in controller._closedForm
+
+
+class QuadraticShift(Metric):
+    def evaluate(self, x):
+        return np.sum((x - 1) ** 2)
+
+    def quadraticForm(self, length):
+        return np.eye(length), -2 * np.ones(length), length
+
+
+def test_model_predictive_controller():
+    with pytest.raises(ValueError):
+        ModelPredictiveController(ShiftedSquares())
+
+    x = BendingState()
+    controller = ModelPredictiveController(QuadraticShift(), horizon=2, effort=1, limits=None)
+    xprime, xdelta = controller.nextState(x)
+
+    # cost (x1-1)^2 + (x2-1)^2 + (x1-x0)^2 + (x2-x1)^2 per degree of freedom
+    M = np.array([[3, -1], [-1, 2]])
+    ref = np.linalg.solve(M, [1, 1])[0]
+    np.testing.assert_allclose(xprime.array, ref)
+    np.testing.assert_allclose(xdelta.array, ref)
+
+    limited = ModelPredictiveController(QuadraticShift(), horizon=2, effort=1, limits=0.5)
+    for _ in range(3):
+        xprime, xdelta = limited.nextState(xprime)
+        np.testing.assert_allclose(xprime.array, 0.5, atol=1e-6)
+
+    # hexapod travel and bending amplitudes bound the plan by default
+    bounded = ModelPredictiveController(QuadraticShift(), horizon=2, effort=1)
+    np.testing.assert_array_equal(bounded.limits, BendingState.LIMITS)
+    xprime, _ = bounded.nextState(x)
+    np.testing.assert_allclose(xprime.array, BendingState.LIMITS, atol=1e-12)
+
+    with pytest.warns(RuntimeWarning):
+        ModelPredictiveController(QuadraticShift(), horizon=2, effort=1, limits=0.5, maxIter=1).nextState(x)
@@ -1,5 +1,61 @@
+import numpy as np
+from numpy.testing import assert_raises, assert_allclose
 from aos.donut import DonutExtractor
 
 
 def test_donut_extractor():
 	extractor = DonutExtractor()
+
+
+def _image(extractor, centers, shape=(1000, 1200)):
+	np.random.seed(0)
+	image = np.random.normal(1000, 10, shape)
+	template = extractor.template(-1.5e-3) > 0
+	half = extractor.crop // 2
+	for x, y in centers:
+		padded = np.zeros((shape[0] + 2 * half, shape[1] + 2 * half))
+		padded[y:y + 2 * half, x:x + 2 * half] = 200 * template
+		image += padded[half:-half, half:-half]
+	return image
+
+
+def test_donut_extractor_extract():
+	extractor = DonutExtractor()
+	# isolated, blended pair, clipped by the edge
+	image = _image(extractor, [(300, 400), (700, 300), (780, 340), (1180, 600)])
+	stamps, centers, sources = extractor.extract(image)
+
+	assert stamps.shape == (1, 192, 192)
+	assert stamps.flags.c_contiguous
+	# the template is centered between pixels
+	assert_allclose(centers, [[299.5, 399.5]], atol=0.2)
+	np.testing.assert_array_equal(sources, [-1])
+	assert np.median(stamps[0]) < 5
+
+
+def test_donut_extractor_catalog():
+	extractor = DonutExtractor()
+	image = _image(extractor, [(300, 400), (700, 500)])
+	positions = np.array([[705, 505], [50, 50], [305, 405]])
+	stamps, centers, sources = extractor.extract(image, positions=positions)
+	np.testing.assert_array_equal(sources, [2, 0])
+	assert_allclose(centers, [[299.5, 399.5], [699.5, 499.5]], atol=0.2)
+
+	# a catalog neighbour of similar brightness blends, a much fainter one does not
+	positions = np.array([[300, 400], [700, 500], [340, 420]])
+	_, _, sources = extractor.extract(image, positions=positions, magnitudes=[15, 15, 15.5])
+	np.testing.assert_array_equal(sources, [1])
+	_, _, sources = extractor.extract(image, positions=positions, magnitudes=[15, 15, 20])
+	np.testing.assert_array_equal(sources, [0, 1])
+
+
+def test_donut_extractor_template():
+	extractor = DonutExtractor()
+	template = extractor.template(-1.5e-3, (1.2, 0.3))
+	assert extractor.template(-1.5e-3) is template
+	assert not template.flags.writeable
+	assert_allclose(np.sum(template), 0, atol=1e-9)
+	assert_allclose(np.linalg.norm(template), 1)
+
+	with assert_raises(ValueError):
+		DonutExtractor(crop=191)
@@ -1,6 +1,7 @@
 import numpy as np
 from numpy.testing import assert_raises, assert_allclose
-from aos.focal_plane import Chip, WavefrontSensors
+from aos.focal_plane import Chip, WavefrontSensors, FocalPlane
+from aos.projection import Pointing
 
 def test_chip():
     valid_array = np.array([[1,1],[1,1],[1,1],[1,1]])
@@ -31,8 +32,89 @@ def test_wavefront_translation():
     assert ws2.ra == 1
     assert ws2.dec == 2
 
+    # corners are the same field angles deprojected around each pointing
+    pointing = Pointing(ws2.ra, ws2.dec)
     for i in range(4):
-        assert_allclose(ws1.intras[i].corners[:,0], ws2.intras[i].corners[:,0] - ws2.ra)
-        assert_allclose(ws1.intras[i].corners[:,1], ws2.intras[i].corners[:,1] - ws2.dec)
-        assert_allclose(ws1.extras[i].corners[:,0], ws2.extras[i].corners[:,0] - ws2.ra)
-        assert_allclose(ws1.extras[i].corners[:,1], ws2.extras[i].corners[:,1] - ws2.dec)
\ No newline at end of file
+        for chip1, chip2 in [(ws1.intras[i], ws2.intras[i]), (ws1.extras[i], ws2.extras[i])]:
+            fieldx, fieldy = Pointing(0, 0).toField(chip1.corners[:,0], chip1.corners[:,1])
+            assert_allclose(chip2.corners, np.stack(pointing.toSky(fieldx, fieldy), axis=1))
+
+
+def test_chip_contains():
+    chip = Chip('name', np.array([[359.5, -1], [359.5, 1], [0.5, 1], [0.5, -1]]), 'intra')
+    ra = np.array([0, 359.9, 0.4, 1, 0])
+    dec = np.array([0, 0.5, -0.5, 0, 2])
+    np.testing.assert_array_equal(chip.contains(ra, dec), [True, True, True, False, False])
+
+
+def test_wavefront_sensors_geometry():
+    names, corners, focal = WavefrontSensors.geometry()
+    assert corners.shape == (8, 4, 2)
+    assert not corners.flags.writeable
+    assert WavefrontSensors.geometry()[1] is corners
+    assert sorted(focal) == ['extra'] * 4 + ['intra'] * 4
+
+    ws = WavefrontSensors(ra=1, dec=2)
+    assert ws.corners.shape == (8, 4, 2)
+    for i, name in enumerate(names):
+        assert_allclose(ws.chips[name].corners, ws.corners[i])
+
+
+def test_wavefront_sensors_rotation():
+    _, corners, _ = WavefrontSensors.geometry()
+    # far from the equator the ra offsets grow by 1 / cos(dec)
+    for ra, dec, rotation in [(10, 0, 30), (200, -44, 75), (350, -80, 300)]:
+        ws = WavefrontSensors(ra=ra, dec=dec, rotation=rotation)
+        fieldx, fieldy = Pointing(ra, dec, rotation).toField(ws.corners[..., 0], ws.corners[..., 1])
+        assert_allclose(fieldx, corners[..., 0], atol=1e-10)
+        assert_allclose(fieldy, corners[..., 1], atol=1e-10)
+
+
+def test_wavefront_sensors_batch():
+    ra = np.array([0, 10, 200])
+    dec = np.array([0, -30, 45])
+    rotation = np.array([0, 90, 300])
+    batch = WavefrontSensors.batch(ra, dec, rotation)
+    assert len(batch) == 3
+    for i, ws in enumerate(batch):
+        single = WavefrontSensors(ra[i], dec[i], rotation[i])
+        assert ws.rotation == rotation[i]
+        assert_allclose(ws.corners, single.corners)
+        assert_allclose(ws.intras[2].corners, single.intras[2].corners)
+    assert WavefrontSensors.transform(ra, dec, rotation).shape == (3, 8, 4, 2)
+
+
+def test_focal_plane():
+    fp = FocalPlane()
+    assert np.sum(fp.science) == 189
+    assert len(fp.names) == 197
+    assert fp.names.index('R:2,2 S:1,1') >= 0
+    assert_allclose(fp.centers[fp.names.index('R:2,2 S:1,1')], [0, 0])
+    assert_allclose(fp.shape[fp.science], [FocalPlane.SENSOR_PIXELS] * 189)
+
+
+def test_focal_plane_lookup():
+    fp = FocalPlane()
+    center = fp.names.index('R:2,2 S:1,1')
+    chip, px, py = fp.lookup([0, 0.05, 0, 3], [0, -0.05, 0.115, 0])
+    assert_allclose(chip, [center, center, -1, -1])
+    assert_allclose(px[:2], [2000, 2000 + 0.05 / FocalPlane.PIXEL_SCALE])
+    assert_allclose(py[:2], [2036, 2036 - 0.05 / FocalPlane.PIXEL_SCALE])
+    assert np.all(np.isnan(px[2:]))
+
+    # matches a brute force search over chips
+    np.random.seed(0)
+    x, y = np.random.uniform(-2, 2, (2, 100000))
+    chip, px, py = fp.lookup(x, y)
+    expected = np.full(len(x), -1)
+    for i in range(len(fp.names) - 1, -1, -1):
+        inside = (x >= fp.lower[i, 0]) & (x < fp.upper[i, 0]) & (y >= fp.lower[i, 1]) & (y < fp.upper[i, 1])
+        expected[inside] = i
+    np.testing.assert_array_equal(chip, expected)
+    assert np.all((px[chip >= 0] >= 0) & (px[chip >= 0] < fp.shape[chip[chip >= 0], 0] + 1))
+
+    # wavefront sensor corners map to their chips
+    names, corners, _ = WavefrontSensors.geometry()
+    for name in WavefrontSensors.intraNames:
+        cx, cy = np.mean(corners[names.index(name)], axis=0)
+        assert fp.names[fp.lookup(cx, cy)[0]] == name
@@ -1,6 +1,8 @@
 import numpy as np
-from aos.metric import SumOfSquares
-from aos.state import BendingState
+from aos.metric import SumOfSquares, StrehlLoss
+from aos.control import GainController
+from aos.solver import SensitivitySolver
+from aos.state import BendingState, StateArray
 
 
 def test_sum_of_squares():
@@ -9,3 +11,39 @@ def test_sum_of_squares():
     tm = SumOfSquares()
     ref = np.sum(np.arange(BendingState.LENGTH) ** 2)
     assert tm.evaluate(x) == ref
+
+
+def test_sum_of_squares_derivatives():
+    x = np.arange(BendingState.LENGTH, dtype=float)
+    tm = SumOfSquares()
+    assert tm.hasGradient and tm.hasHessian
+
+    np.testing.assert_allclose(tm.gradient(BendingState(x)), 2 * x)
+    np.testing.assert_allclose(tm.hessian(x), 2 * np.eye(BendingState.LENGTH))
+
+    Q, b, c = tm.quadraticForm(BendingState.LENGTH)
+    assert np.isclose(np.dot(x, np.dot(Q, x)) + np.dot(b, x) + c, tm.evaluate(x))
+
+
+def test_strehl_loss():
+    solver = SensitivitySolver()
+    loss = StrehlLoss(alpha=1)
+    x = np.random.normal(size=BendingState.LENGTH) * 1e-7
+    y = solver.y0 + np.dot(solver.A, x)
+
+    assert np.isclose(loss.evaluate(BendingState(x)), np.sum(y[3:] ** 2))
+    assert np.isclose(loss.c, np.sum(solver.y0[3:] ** 2))
+
+    batch = np.array([x, 2 * x, np.zeros(BendingState.LENGTH)])
+    np.testing.assert_allclose(loss.evaluate(batch), [loss.evaluate(xi) for xi in batch])
+    np.testing.assert_allclose(loss.evaluate(StateArray(batch)), loss.evaluate(batch))
+
+    eps = 1e-10
+    dx = np.zeros(BendingState.LENGTH)
+    dx[3] = eps
+    numerical = (loss.evaluate(x + dx) - loss.evaluate(x - dx)) / (2 * eps)
+    assert np.isclose(loss.gradient(x)[3], numerical, rtol=1e-4)
+
+    controller = GainController(loss)
+    xprime, _ = controller.nextState(BendingState(x))
+    assert loss.evaluate(xprime) <= loss.evaluate(x)
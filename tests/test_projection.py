@@ -0,0 +1,52 @@
+import numpy as np
+from aos.projection import Pointing
+
+
+def test_center():
+    p = Pointing(37.96, -28.44, rotation=30)
+    fx, fy = p.toField(37.96, -28.44)
+    np.testing.assert_allclose([fx, fy], 0, atol=1e-12)
+
+
+def test_small_offsets():
+    p = Pointing(10, 60)
+    fx, fy = p.toField(10.01, 60)
+    # east offsets shrink with cos(dec)
+    assert np.isclose(fx, 0.01 * np.cos(np.deg2rad(60)), rtol=1e-4)
+    assert abs(fy) < 1e-5
+    fx, fy = p.toField(10, 60.01)
+    assert np.isclose(fy, 0.01, rtol=1e-4)
+
+    rotated = Pointing(10, 60, rotation=90)
+    rx, ry = rotated.toField(10, 60.01)
+    np.testing.assert_allclose([rx, ry], [fy, -fx], atol=1e-12)
+
+
+def test_roundtrip():
+    np.random.seed(0)
+    p = Pointing(359.5, -80, rotation=123)
+    fx = np.random.uniform(-2, 2, 1000)
+    fy = np.random.uniform(-2, 2, 1000)
+    ra, dec = p.toSky(fx, fy)
+    assert np.all((ra >= 0) & (ra < 360))
+    fx2, fy2 = p.toField(ra, dec)
+    np.testing.assert_allclose(fx2, fx, atol=1e-10)
+    np.testing.assert_allclose(fy2, fy, atol=1e-10)
+
+
+def test_behind():
+    fx, fy = Pointing(0, 0).toField(180, 0)
+    assert np.isnan(fx) and np.isnan(fy)
+
+
+def test_deproject_broadcasts():
+    ra = np.array([10, 200, 350])
+    dec = np.array([0, -44, -80])
+    rotation = np.array([30, 75, 300])
+    fx, fy = np.array([[-1.2, 0.3], [1.1, -0.7]]), np.array([[1.2, 0.5], [-1.1, 0.2]])
+    outRa, outDec = Pointing.deproject(ra[:, None, None], dec[:, None, None], rotation[:, None, None], fx, fy)
+    assert outRa.shape == (3, 2, 2)
+    for i in range(3):
+        expected = Pointing(ra[i], dec[i], rotation[i]).toSky(fx, fy)
+        np.testing.assert_allclose(outRa[i], expected[0])
+        np.testing.assert_allclose(outDec[i], expected[1])
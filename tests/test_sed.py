@@ -1,5 +1,6 @@
 import numpy as np
-from aos.sed import Blackbody, Monochromatic, Bandpass
+import pytest
+from aos.sed import Blackbody, Monochromatic, Bandpass, BlackbodySampler, quadrature
 
 def test_bandpass_static_methods():
     bp = Bandpass.u()
@@ -35,4 +36,80 @@ def test_blackbody_init():
     assert np.all(wvs >= bbd.bandpass.low)
 
     # wien's displacement law
-    assert np.isclose(np.sum(bbd.spec[bbd.wavelengths < bbd.wavelength]), 0.5, atol=0.1)
\ No newline at end of file
+    assert np.isclose(np.sum(bbd.spec[bbd.wavelengths < bbd.wavelength]), 0.5, atol=0.1)
+
+
+def test_bandpass_registry(monkeypatch):
+    # an empty registry for this test only, counting the files read
+    monkeypatch.setattr(Bandpass, '_registry', dict())
+    load = np.load
+    loaded = []
+
+    def counting(path, *args, **kwargs):
+        loaded.append(path)
+        return load(path, *args, **kwargs)
+
+    monkeypatch.setattr(np, 'load', counting)
+    bp = Bandpass.r()
+    assert bp is Bandpass.band('r')
+    assert len(loaded) == 1
+    assert not bp.bandpass.flags.writeable
+    assert Blackbody(temperature=6000).bandpass is Bandpass.g()
+    assert len(loaded) == 2
+    assert set(Bandpass._registry) == {'r', 'g'}
+
+
+def test_blackbody_sampler():
+    np.random.seed(0)
+    sampler = BlackbodySampler(band='g')
+    temps = sampler.temperatures[[100, 300]]
+    wvs, offsets = sampler.sample(temps, [2e5, 1e5])
+
+    assert len(offsets) == 3
+    assert offsets[-1] == len(wvs)
+    for i, temp in enumerate(temps):
+        bbd = Blackbody(temperature=temp, bandpass=Bandpass.g())
+        assert offsets[i + 1] - offsets[i] == int([2e5, 1e5][i] * bbd.bp_factor)
+        star = wvs[offsets[i]:offsets[i + 1]]
+        ref_wvs, ref_spec = bbd.spectrum()
+        hist = np.array([np.sum(star == w) for w in ref_wvs]) / len(star)
+        np.testing.assert_allclose(hist, ref_spec, atol=5e-3)
+
+    assert BlackbodySampler(band='g')._prob is sampler._prob
+
+    with pytest.raises(ValueError):
+        sampler.sample([np.nan], 10)
+    with pytest.raises(ValueError):
+        sampler.sample([1000.], 10)
+
+    # chunks split stars without changing the counts or the distribution
+    np.random.seed(0)
+    chunked = BlackbodySampler(band='g', chunkSize=1000)
+    small, smallOffsets = chunked.sample(temps, [2e5, 1e5])
+    np.testing.assert_array_equal(smallOffsets, offsets)
+    for i in range(2):
+        star = small[offsets[i]:offsets[i + 1]]
+        ref = wvs[offsets[i]:offsets[i + 1]]
+        hist = np.array([np.sum(star == w) for w in Bandpass.g().wavelengths]) / len(star)
+        refHist = np.array([np.sum(ref == w) for w in Bandpass.g().wavelengths]) / len(ref)
+        np.testing.assert_allclose(hist, refHist, atol=1e-2)
+
+
+def test_quadrature():
+    temp = np.geomspace(2000., 50000., 64)[20]
+    nodes, weights = quadrature('r', temp, order=3)
+    bbd = Blackbody(temperature=temp, bandpass=Bandpass.r())
+    wvs = bbd.wavelengths * 1e6
+    p = bbd.bp_spec / bbd.bp_factor
+
+    assert len(nodes) == 3
+    assert np.all((nodes >= bbd.bandpass.low) & (nodes <= bbd.bandpass.high))
+    # exact up to degree 2 * order - 1
+    for degree in range(6):
+        np.testing.assert_allclose(np.sum(weights * (nodes * 1e6) ** degree), np.sum(p * wvs ** degree))
+
+    assert quadrature('r', temp * 1.001, order=3)[0] is nodes
+    assert not nodes.flags.writeable
+
+    with pytest.raises(ValueError):
+        quadrature('r', temp, order=0)
@@ -0,0 +1,36 @@
+import os
+import pytest
+import numpy as np
+from aos.sensitivity import SensitivityBuilder
+
+
+def test_sensitivity_builder_cache(tmp_path):
+    builder = SensitivityBuilder(dofs=['camz', 'm2b3'], nx=31, processes=1, cacheDir=str(tmp_path))
+    A, y0 = builder.build()
+
+    assert A.shape == (22, 2)
+    assert y0.shape == (22,)
+    assert os.path.exists(os.path.join(str(tmp_path), 'sensitivity_{}.npz'.format(builder.key((0, 0)))))
+
+    A2, y02 = builder.build()
+    np.testing.assert_array_equal(A, A2)
+    np.testing.assert_array_equal(y0, y02)
+
+
+def test_sensitivity_builder_key():
+    builder = SensitivityBuilder()
+    assert builder.key((0, 0)) == SensitivityBuilder().key((0, 0))
+    assert builder.key((0, 0)) != builder.key((1, 0))
+    assert builder.key((0, 0)) != SensitivityBuilder(step=1e-6).key((0, 0))
+
+
+def test_sensitivity_builder_steps():
+    builder = SensitivityBuilder(dofs=['camx', 'camz', 'camrx', 'm2ry', 'm1m3b1', 'm2b5'])
+    arcsecond = np.pi / 180 / 3600
+    np.testing.assert_allclose(builder.step, [500e-6, 100e-6, 60 * arcsecond, 40 * arcsecond, 500e-9, 200e-9])
+    np.testing.assert_array_equal(SensitivityBuilder(dofs=['camz', 'm2b3'], step=1e-7).step, [1e-7, 1e-7])
+
+    with pytest.raises(ValueError):
+        SensitivityBuilder(dofs=['camz', 'm2b3'], step=[1e-7])
+    with pytest.raises(ValueError):
+        SensitivityBuilder(dofs=['camz', 'm2b3'], step=[1e-7, 0])
@@ -32,6 +32,18 @@ def test_wavefront_simulator():
     np.testing.assert_array_equal(wavefront.shape, [255, 255])
 
 
+def test_polychromatic_wavefront_simulator():
+    tel = BendingTelescope.nominal()
+    sim = WavefrontSimulator(band='g', temperature=6000, order=3)
+    wavelengths, weights = sim.wavelengths()
+    wavefront = sim.simulateWavefront(tel.optic, 1.0, 0.5)
+
+    mono = [WavefrontSimulator(wavelength=wavelength).simulateWavefront(tel.optic, 1.0, 0.5)
+            for wavelength in wavelengths]
+    np.testing.assert_allclose(wavefront, np.tensordot(weights, mono, axes=1))
+    np.testing.assert_array_equal(wavefront.shape, [255, 255])
+
+
 def test_even_wavefront_raises():
     with pytest.raises(ValueError):
         WavefrontSimulator(nx=250)
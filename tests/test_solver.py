@@ -1,6 +1,8 @@
 import pytest
 import numpy as np
-from aos.solver import Solver, SensitivitySolver
+from aos.solver import Solver, SensitivitySolver, SensitivityGrid, MultiFieldSensitivitySolver, KalmanSolver
+from aos.state import BendingState
+from aos.focal_plane import WavefrontSensors
 
 def test_abstract_solver():
     with pytest.raises(TypeError):
@@ -15,3 +17,151 @@ def test_sensitivity_solver_nominal():
     ref = np.zeros(20)
 
     np.testing.assert_allclose(xest.array, ref)
+
+
+def _linear_grid():
+    fieldx = np.linspace(-1.5, 1.5, 7)
+    fieldy = np.linspace(-1.5, 1.5, 5)
+    base = np.random.RandomState(0).normal(size=(22, 20))
+    FY, FX = np.meshgrid(fieldy, fieldx, indexing='ij')
+    A = base + FX[:, :, None, None] * 0.1 + FY[:, :, None, None] * 0.2
+    y0 = FX[:, :, None] * np.arange(22) - FY[:, :, None]
+    return SensitivityGrid(fieldx, fieldy, A, y0), base
+
+
+def test_sensitivity_grid_roundtrip(tmp_path):
+    grid, base = _linear_grid()
+    path = str(tmp_path / 'grid.npy')
+    grid.save(path)
+    loaded = SensitivityGrid.load(path)
+    assert isinstance(loaded.A, np.memmap)
+
+    A, y0 = loaded.interpolate(0.3, -0.7)
+    np.testing.assert_allclose(A, base + 0.3 * 0.1 - 0.7 * 0.2)
+    np.testing.assert_allclose(y0, 0.3 * np.arange(22) + 0.7)
+
+    with pytest.raises(ValueError):
+        loaded.interpolate(2, 0)
+
+
+def test_sensitivity_solver_corner_sensors():
+    grid, _ = _linear_grid()
+    solver = SensitivitySolver(grid=grid, cacheSize=2)
+    names, corners, _ = WavefrontSensors.geometry()
+    for name in WavefrontSensors.intraNames:
+        fieldx, fieldy = np.mean(corners[names.index(name)], axis=0)
+        A, _, y0 = solver.model((fieldx, fieldy))
+        x = np.random.normal(size=20) * 1e-6
+        y = np.zeros(23)
+        y[1:] = y0 + np.dot(A, x)
+        xest = solver.solve(y, field=(fieldx, fieldy))
+        np.testing.assert_allclose(xest.array, x, atol=1e-12)
+    assert len(solver._cache) == 2
+
+
+def test_sensitivity_grid_corner_axes():
+    fieldx, fieldy = SensitivityGrid.cornerAxes()
+    _, corners, _ = WavefrontSensors.geometry()
+    # every corner sensor lies within an outer cell of the grid
+    for k, axis in enumerate([fieldx, fieldy]):
+        assert np.all((np.abs(corners[..., k]) >= axis[2]) & (np.abs(corners[..., k]) <= axis[3]))
+        np.testing.assert_array_equal(axis[:2], -axis[:1:-1])
+
+    base = np.random.RandomState(1).normal(size=(22, 20))
+    A = np.broadcast_to(base, (4, 4, 22, 20)) + fieldx[None, :, None, None] * 0.1
+    grid = SensitivityGrid(fieldx, fieldy, A, np.zeros((4, 4, 22)))
+    solver = MultiFieldSensitivitySolver(grid=grid)
+    x = np.random.normal(size=20) * 1e-6
+    y = np.zeros((4, 23))
+    y[:, 1:] = solver.y0 + np.dot(solver.A, x)
+    np.testing.assert_allclose(solver.solve(y).array, x, atol=1e-12)
+
+    with pytest.raises(ValueError):
+        SensitivityGrid(fieldx[:1], fieldy, A[:, :1], np.zeros((4, 1, 22)))
+
+
+def test_sensitivity_solver_regularization():
+    solver = SensitivitySolver()
+    np.testing.assert_allclose(solver.Ainv, np.linalg.pinv(solver.A, rcond=1e-4), atol=1e-8)
+
+    solver.setRegularization('tikhonov', 0)
+    np.testing.assert_allclose(solver.Ainv, np.linalg.pinv(solver.A, rcond=1e-15), rtol=1e-6)
+
+    solver.setRegularization('tikhonov', 1e-2)
+    assert np.linalg.norm(solver.Ainv) < np.linalg.norm(np.linalg.pinv(solver.A))
+
+    with pytest.raises(ValueError):
+        solver.setRegularization('ridge', 1e-2)
+
+
+def test_sensitivity_solver_batch():
+    solver = SensitivitySolver()
+    y = np.random.normal(size=(5, len(solver.y0) + 1)) * 1e-7
+    xs = solver.solve(y)
+    arr = solver.solve(y, asArray=True)
+
+    assert len(xs) == 5
+    assert arr.shape == (5, 20)
+    for i in range(5):
+        np.testing.assert_allclose(solver.solve(y[i]).array, arr[i])
+        np.testing.assert_allclose(xs[i].array, arr[i])
+
+
+def test_multi_field_solver():
+    grid, _ = _linear_grid()
+    weights = np.array([1, 2, 3, 4])
+    solver = MultiFieldSensitivitySolver(weights=weights, grid=grid)
+    assert solver.A.shape == (4, 22, 20)
+
+    x = np.random.normal(size=20) * 1e-6
+    y = np.zeros((4, 23))
+    y[:, 1:] = solver.y0 + np.dot(solver.A, x)
+    np.testing.assert_allclose(solver.solve(y).array, x, atol=1e-12)
+
+    # inverse for the remaining sensors matches restacking them
+    y[2] = np.nan
+    np.testing.assert_allclose(solver.solve(y).array, x, atol=1e-12)
+    keep = [0, 1, 3]
+    block = (solver.A[keep] * np.sqrt(weights[keep])[:, None, None]).reshape(-1, 20)
+    inv = solver.inverse([True, True, False, True])
+    np.testing.assert_allclose(inv[:, keep].reshape(20, 66), np.linalg.pinv(block) * np.repeat(np.sqrt(weights[keep]), 22), rtol=1e-6, atol=1e-12)
+    assert np.all(inv[:, 2] == 0)
+    assert solver.inverse([True, True, False, True]) is inv
+    for keep in [[1, 2], [3]]:
+        available = np.isin(np.arange(4), keep)
+        block = (solver.A[keep] * np.sqrt(weights[keep])[:, None, None]).reshape(-1, 20)
+        inv = solver.inverse(available)[:, keep].reshape(20, -1)
+        np.testing.assert_allclose(inv, np.linalg.pinv(block) * np.repeat(np.sqrt(weights[keep]), 22), rtol=1e-6, atol=1e-12)
+
+    batch = np.array([y, y])
+    batch[0, 2, 1:] = solver.y0[2] + np.dot(solver.A[2], x)
+    arr = solver.solve(batch, asArray=True)
+    assert arr.shape == (2, 20)
+    np.testing.assert_allclose(arr, [x, x], atol=1e-12)
+
+    with pytest.raises(ValueError):
+        solver.solve(np.full((4, 23), np.nan))
+
+
+def test_kalman_solver():
+    solver = SensitivitySolver()
+    kalman = KalmanSolver(solver, priorSigma=1e-6, measurementSigma=1e-10, processSigma=1e-8)
+    x = np.zeros(20)
+    x[17] = 1e-7
+    y = np.zeros(23)
+    y[1:] = solver.y0 + np.dot(solver.A, x)
+
+    trace = np.trace(kalman.P)
+    xest = kalman.solve(y)
+    assert np.trace(kalman.P) < trace
+    np.testing.assert_allclose(np.dot(solver.A, xest.array), np.dot(solver.A, x), atol=1e-9)
+
+    xdelta = BendingState(-xest.array)
+    P = kalman.P.copy()
+    kalman.predict(xdelta)
+    np.testing.assert_allclose(kalman.x, 0)
+    np.testing.assert_allclose(np.diag(kalman.P), np.diag(P) + 1e-16)
+
+    y[1] = np.nan
+    kalman.solve(y)
+    assert np.all(np.isfinite(kalman.x))
@@ -0,0 +1,61 @@
+import os
+import pytest
+import numpy as np
+from aos.stamps import StampStore
+
+
+def test_stamp_store(tmp_path):
+    path = str(tmp_path / 'stamps')
+    np.random.seed(0)
+    stamps = np.random.uniform(0, 100, (10, 8, 8))
+
+    with StampStore(path, crop=8, chunkSize=4) as store:
+        store.append(stamps[0], observation=1, chip='R:0,0 S:2,2,A', field=(1.2, -1.1), focal='intra', magnitude=15)
+        store.append(stamps[1:], observation=np.arange(2, 11), focal='extra')
+        assert len(store) == 10
+
+        np.testing.assert_allclose(store[0], stamps[0], rtol=1e-6)
+        np.testing.assert_allclose(store[-1], stamps[-1], rtol=1e-6)
+        np.testing.assert_allclose(store[[9, 2, 5]], stamps[[9, 2, 5]], rtol=1e-6)
+        np.testing.assert_allclose(store[3:9], stamps[3:9], rtol=1e-6)
+        assert isinstance(store[4:6], np.memmap)
+        assert store[0].dtype == np.float32
+
+        meta = store.metadata()
+        np.testing.assert_array_equal(meta['observation'], np.arange(1, 11))
+        assert meta[0]['chip'] == 'R:0,0 S:2,2,A'
+        np.testing.assert_allclose(meta[0]['field'], [1.2, -1.1])
+        assert store.metadata(5)['focal'] == 'extra'
+        assert np.isnan(meta[1]['magnitude'])
+
+        with pytest.raises(IndexError):
+            store[10]
+        with pytest.raises(ValueError):
+            store.append(np.zeros((9, 9)))
+
+    reader = StampStore(path, crop=8, chunkSize=4, readonly=True)
+    assert len(reader) == 10
+    np.testing.assert_allclose(reader[7], stamps[7], rtol=1e-6)
+    with pytest.raises(ValueError):
+        reader.append(stamps[0])
+
+    with StampStore(path, crop=8, chunkSize=4) as store:
+        store.append(stamps[:3])
+    assert len(reader) == 10
+    reader.refresh()
+    np.testing.assert_allclose(reader[12], stamps[2], rtol=1e-6)
+
+    os.remove(os.path.join(path, 'stamps_00000.npy'))
+    with pytest.raises(IndexError):
+        reader[0]
+    assert not os.path.exists(os.path.join(path, 'stamps_00000.npy'))
+
+    with pytest.raises(ValueError):
+        StampStore(path, crop=16)
+
+
+def test_stamp_store_uint16(tmp_path):
+    store = StampStore(str(tmp_path / 'stamps'), crop=4, dtype=np.uint16)
+    store.append(np.array([[[-1, 0.4, 0.6, 70000]] * 4]))
+    np.testing.assert_array_equal(store[0][0], [0, 0, 1, 65535])
+    assert store[0].dtype == np.uint16
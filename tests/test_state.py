@@ -1,5 +1,6 @@
 import numpy as np
-from aos.state import BendingState, ZernikeState
+import pytest
+from aos.state import State, BendingState, ZernikeState, StateArray
 
 
 def test_bending_state_dictionary():
@@ -50,3 +51,43 @@ def test_zernike_state_properties():
     np.testing.assert_allclose(state.m2hex, arr[5:10])
     np.testing.assert_allclose(state.m1m3zer, zer(arr[10:28]))
     np.testing.assert_allclose(state.m2zer, zer(arr[28:46]))
+
+
+def test_state_map_shared():
+    assert BendingState().stateMap is BendingState.stateMap
+    assert 'camx' in ZernikeState.stateMap
+    assert 'm2b1' not in State.stateMap
+
+
+def test_state_array():
+    arr = np.arange(3 * BendingState.LENGTH, dtype=float).reshape(3, BendingState.LENGTH)
+    states = StateArray(arr)
+
+    assert len(states) == 3
+    np.testing.assert_allclose(states['m2b3'], arr[:, 17])
+    np.testing.assert_allclose(states.camhex, arr[:, :5])
+    np.testing.assert_allclose(states.m2hex, arr[:, 5:10])
+    np.testing.assert_allclose(states.m1m3modes, arr[:, 10:15])
+    np.testing.assert_allclose(states.m2modes, arr[:, 15:20])
+
+    states['camx'] = -1
+    assert states[1]['camx'] == -1
+    states[1]['camy'] = -2
+    assert arr[1, 1] == -2
+
+    roundtrip = StateArray.fromStates(states.toStates())
+    np.testing.assert_array_equal(roundtrip.array, states.array)
+    assert isinstance(states[0], BendingState)
+    assert len(states[1:]) == 2
+
+    with pytest.raises(AttributeError):
+        states.m2zer
+    with pytest.raises(ValueError):
+        StateArray(arr, ZernikeState)
+
+
+def test_zernike_state_array():
+    states = StateArray.zeros(4, ZernikeState)
+    states['m2zer6'] = 1
+    assert np.all(states.m2zer[:, 6] == 1)
+    assert isinstance(states[0], ZernikeState)
@@ -1,6 +1,77 @@
+import sqlite3
+import pytest
 import numpy as np
-from aos.survey import Survey
+from aos.survey import Survey, OpSimDatabase
+
 
 def test_survey_init():
     surv = Survey()
-    assert np.all(surv.table['filter'] == 'r')
\ No newline at end of file
+    assert np.all(surv.table['filter'] == 'r')
+
+
+def test_survey_pointing():
+    surv = Survey()
+    p = surv.pointing(19436)
+    assert np.isclose(p.ra, 37.9606155841983)
+    assert np.isclose(p.rotation, 328.045985772852)
+
+    surv.table['rotSkyPos'] = surv.table['rotTelPos'] + 10
+    assert Survey.rotationColumn(surv.table) == 'rotSkyPos'
+    assert np.isclose(surv.pointing(19436).rotation, 338.045985772852)
+
+
+def _opsim(path):
+    table = Survey().table
+    columns = Survey.columns + ['observationStartMJD']
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE SummaryAllProps ({})'.format(', '.join(columns)))
+        rows = [tuple(v.item() for v in row) + (59853. + i, ) for i, row in enumerate(table.iterrows(*Survey.columns))]
+        rows[0] = rows[0][:3] + ('g',) + rows[0][4:]
+        connection.executemany('INSERT INTO SummaryAllProps VALUES ({})'.format(', '.join('?' * len(columns))), rows)
+    connection.close()
+    return table
+
+
+def test_opsim_database(tmp_path):
+    path = str(tmp_path / 'opsim.db')
+    table = _opsim(path)
+
+    # characters with a meaning in URIs
+    special = str(tmp_path / 'run?1#2%20.db')
+    _opsim(special)
+    with OpSimDatabase(special) as db:
+        assert db.count() == len(table)
+
+    with OpSimDatabase(path) as db:
+        assert db.table == 'SummaryAllProps'
+        assert db.count() == len(table)
+        assert db.count(band='r') == len(table) - 1
+
+        chunks = list(db.iterate(chunkSize=20, band='r'))
+        assert [len(chunk) for chunk in chunks[:-1]] == [20] * (len(chunks) - 1)
+        assert sum(len(chunk) for chunk in chunks) == len(table) - 1
+        assert chunks[0].colnames == Survey.columns
+        assert np.all(np.diff(np.concatenate([chunk['observationId'] for chunk in chunks])) > 0)
+
+        out = db.query(minAltitude=60, start=59853 + 10, end=59853 + 30, columns=['observationId', 'altitude'])
+        assert out.colnames == ['observationId', 'altitude']
+        expected = table['altitude'][10:30] >= 60
+        assert len(out) == np.sum(expected)
+        assert np.all(out['altitude'] >= 60)
+
+        assert len(db.query(band='u')) == 0
+        with pytest.raises(ValueError):
+            db.query(columns=['observationId', 'airmass'])
+
+
+def test_survey_from_opsim(tmp_path):
+    path = str(tmp_path / 'opsim.db')
+    _opsim(path)
+    surv = Survey.fromOpSim(path, band='r')
+    assert np.all(surv.table['filter'] == 'r')
+    p = surv.pointing(19436)
+    assert np.isclose(p.rotation, 328.045985772852)
+
+    sqlite3.connect(str(tmp_path / 'empty.db')).close()
+    with pytest.raises(ValueError):
+        OpSimDatabase(str(tmp_path / 'empty.db'))
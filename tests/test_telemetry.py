@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+from aos.state import BendingState
+from aos.telemetry import TelemetryLog
+
+
+def test_telemetry_log(tmp_path):
+    path = str(tmp_path / 'run.tlm')
+    log = TelemetryLog(path)
+    x = BendingState()
+    x['m2b3'] = 1e-6
+    log.append(0, x=x, xest=x, xdelta=-x.array, zernikes=np.ones(23), metric=1.5, solve=1e-3)
+    log.append(0, sensor=1)
+
+    # readable while the run is still going
+    records = TelemetryLog.read(path)
+    assert len(records) == len(log) == 2
+    assert records['x'][0, 17] == 1e-6
+    assert records['xdelta'][0, 17] == -1e-6
+    assert records['metric'][0] == 1.5
+    assert records['timings']['solve'][0] == 1e-3
+    assert np.isnan(records['timings']['simulate'][0])
+    assert np.all(np.isnan(records['xest'][1]))
+
+    with pytest.raises(ValueError):
+        log.append(1, warp=1)
+    log.close()
+
+    # partial trailing record is discarded when reopening
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 10)
+    with TelemetryLog(path) as log:
+        assert len(log) == 2
+        log.append(1, sensor=0)
+    records = TelemetryLog.read(path)
+    np.testing.assert_array_equal(records['iteration'], [0, 0, 1])
+
+    for kwargs in [{'nZern': 11}, {'length': 10}, {'timings': ('simulate',)}]:
+        with pytest.raises(ValueError):
+            TelemetryLog(path, **kwargs)
+
+
+def test_telemetry_log_invalid(tmp_path):
+    path = str(tmp_path / 'bad.tlm')
+    with open(path, 'w') as f:
+        f.write('not a log')
+    with pytest.raises(ValueError):
+        TelemetryLog(path)
@@ -38,6 +38,9 @@ def test_camx():
     bcamx = btel.optic.itemDict['LSST.LSSTCamera'].coordSys.origin[0]
 
     assert bcamx == bstate['camx']
+    btel.update(bstate)
+    assert btel.state['camx'] == 2 * bstate['camx']
+    assert bstate['camx'] == 1e-6
 
     zstate = ZernikeState()
     zstate['camx'] = 1e-6
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from galsim.zernike import zernikeBasis as galsimBasis, noll_to_zern
+from aos.zernike import nollToZernike, annularCoefficients, zernikeBasis, gridBasis, evaluate
+
+
+def test_noll_to_zernike():
+    for j in range(1, 67):
+        assert nollToZernike(j) == noll_to_zern(j)
+
+    with pytest.raises(ValueError):
+        nollToZernike(0)
+
+
+def test_basis_against_galsim():
+    np.random.seed(0)
+    x = np.random.uniform(-4.18, 4.18, 1000)
+    y = np.random.uniform(-4.18, 4.18, 1000)
+    for inRadius in [0, 2.558]:
+        ref = galsimBasis(45, x, y, R_outer=4.18, R_inner=inRadius)
+        basis = zernikeBasis(45, x, y, 4.18, inRadius)
+        np.testing.assert_allclose(basis, ref, atol=1e-9)
+
+        pupil = (np.hypot(x, y) >= inRadius) & (np.hypot(x, y) <= 4.18)
+        basis32 = zernikeBasis(45, x[pupil], y[pupil], 4.18, inRadius, dtype=np.float32)
+        assert basis32.dtype == np.float32
+        np.testing.assert_allclose(basis32, basis[:, pupil], rtol=0, atol=2e-5)
+
+
+def test_caches():
+    assert annularCoefficients(22, 0.5) is annularCoefficients(22, 0.5)
+    basis = gridBasis(22, 31, 4.18, 2.558)
+    assert basis is gridBasis(22, 31, 4.18, 2.558)
+    assert basis.shape == (23, 31, 31)
+    assert not basis.flags.writeable
+
+
+def test_evaluate():
+    coefs = np.zeros(12)
+    coefs[4] = 1
+    x = np.array([0, 0.5, 1])
+    y = np.zeros(3)
+    np.testing.assert_allclose(evaluate(coefs, x, y), np.sqrt(3) * (2 * x ** 2 - 1))